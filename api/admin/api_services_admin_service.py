@@ -1,6 +1,7 @@
 from typing import Dict, List
 from discord.ext import commands
-from database import get_connection
+from database import get_db
+from ext.product_manager import ProductManagerService
 from datetime import datetime, timedelta
 import bcrypt
 import logging
@@ -10,21 +11,17 @@ logger = logging.getLogger(__name__)
 class AdminService:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.product_manager = ProductManagerService(bot)
 
     async def verify_admin(self, username: str, password: str) -> bool:
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Get admin credentials
-            cursor.execute("""
+            result = await get_db().fetchone("""
                 SELECT password_hash
                 FROM admins
                 WHERE username = ? AND is_active = 1
             """, (username,))
             
-            result = cursor.fetchone()
             if not result:
                 return False
                 
@@ -37,41 +34,32 @@ class AdminService:
         except Exception as e:
             logger.error(f"Error verifying admin: {e}")
             return False
-        finally:
-            if conn:
-                conn.close()
 
     async def get_dashboard_stats(self) -> Dict:
-        conn = None
-        try:
-            conn = get_connection()
+        def _stats(conn):
             cursor = conn.cursor()
             
             # Get total users
             cursor.execute("SELECT COUNT(*) as count FROM users")
             total_users = cursor.fetchone()['count']
             
-            # Get total stock
-            cursor.execute("SELECT COUNT(*) as count FROM stock WHERE status = 'available'")
-            total_stock = cursor.fetchone()['count']
-            
-            # Get today's sales
+            # Get today's sales; created_at ranges use idx_transactions_type_created
             today = datetime.utcnow().date()
             cursor.execute("""
                 SELECT COUNT(*) as count
                 FROM transactions
-                WHERE DATE(created_at) = ?
-                AND type = 'PURCHASE'
-            """, (today.isoformat(),))
+                WHERE type = 'PURCHASE'
+                AND created_at >= ? AND created_at < ?
+            """, (today.isoformat(), (today + timedelta(days=1)).isoformat()))
             today_sales = cursor.fetchone()['count']
             
-            # Get total revenue
+            # Get total revenue: purchases minus refunds
             cursor.execute("""
-                SELECT SUM(total_price) as total
+                SELECT -COALESCE(SUM(amount_delta), 0) as total
                 FROM transactions
-                WHERE type = 'PURCHASE'
+                WHERE type IN ('PURCHASE', 'REFUND')
             """)
-            total_revenue = cursor.fetchone()['total'] or 0
+            total_revenue = cursor.fetchone()['total']
             
             # Get recent transactions
             cursor.execute("""
@@ -82,35 +70,37 @@ class AdminService:
             """)
             recent_transactions = cursor.fetchall()
             
-            # Get chart data (last 7 days)
+            # Get chart data (last 7 days) in one range scan
+            first_day = today - timedelta(days=6)
+            cursor.execute("""
+                SELECT substr(created_at, 1, 10) as day, COUNT(*) as count
+                FROM transactions
+                WHERE type = 'PURCHASE'
+                AND created_at >= ? AND created_at < ?
+                GROUP BY day
+            """, (first_day.isoformat(), (today + timedelta(days=1)).isoformat()))
+            counts = {row['day']: row['count'] for row in cursor.fetchall()}
             labels = []
             data = []
-            for i in range(6, -1, -1):
-                date = (today - timedelta(days=i))
-                labels.append(date.strftime("%Y-%m-%d"))
-                
-                cursor.execute("""
-                    SELECT COUNT(*) as count
-                    FROM transactions
-                    WHERE DATE(created_at) = ?
-                    AND type = 'PURCHASE'
-                """, (date.isoformat(),))
-                count = cursor.fetchone()['count']
-                data.append(count)
+            for i in range(7):
+                date = (first_day + timedelta(days=i)).isoformat()
+                labels.append(date)
+                data.append(counts.get(date, 0))
             
             return {
                 "total_users": total_users,
-                "total_stock": total_stock,
                 "today_sales": today_sales,
                 "total_revenue": total_revenue,
                 "recent_transactions": recent_transactions,
                 "chart_labels": labels,
                 "chart_data": data
             }
+
+        try:
+            stats = await get_db().read(_stats)
+            stats["total_stock"] = sum((await self.product_manager.get_stock_counts()).values())
+            return stats
             
         except Exception as e:
             logger.error(f"Error getting dashboard stats: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
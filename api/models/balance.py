@@ -4,6 +4,7 @@ from typing import Optional
 
 class BalanceResponse(BaseModel):
     growid: str
+    balance: int  # total in WL
     balance_wl: int
     balance_dl: int
     balance_bgl: int
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class StockItem(BaseModel):
     id: int
@@ -12,4 +12,17 @@ class StockResponse(BaseModel):
     name: str
     price: int
     available: int
-    items: list[StockItem]
\ No newline at end of file
+    items: list[StockItem]
+
+class StockHistoryItem(BaseModel):
+    id: int
+    content: str
+    status: str
+    added_by: str
+    buyer_id: Optional[str] = None
+    added_at: datetime
+    updated_at: datetime
+
+class StockHistoryPage(BaseModel):
+    items: List[StockHistoryItem]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page; None on the last
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionCreate(BaseModel):
     growid: str
@@ -15,4 +15,14 @@ class TransactionResponse(BaseModel):
     details: str
     old_balance: str
     new_balance: str
-    created_at: datetime
\ No newline at end of file
+    amount_delta: Optional[int] = None  # WL, negative for debits
+    balance_after: Optional[int] = None  # WL
+    product_code: Optional[str] = None
+    quantity: Optional[int] = None
+    order_id: Optional[int] = None
+    related_growid: Optional[str] = None
+    created_at: datetime
+
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page; None on the last
@@ -1,4 +1,10 @@
+import asyncio
+
 from fastapi import APIRouter
+from database import get_pool, get_db
+from ext.message_scheduler import MessageScheduler
+from utils.balance_cache import get_balance_cache
+from utils.lock_manager import get_lock_stats
 
 # Inisialisasi router utama
 router = APIRouter()
@@ -7,12 +13,24 @@ router = APIRouter()
 from .routes.balance import router as balance_router
 from .routes.stock import router as stock_router 
 from .routes.transactions import router as transactions_router
+from .routes.routes_analytics import router as analytics_router
 
 # Include sub-routers
 router.include_router(balance_router, prefix="/balance", tags=["Balance"])
 router.include_router(stock_router, prefix="/stock", tags=["Stock"])
 router.include_router(transactions_router, prefix="/transactions", tags=["Transactions"])
+router.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
 
 @router.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    # Probe koneksi idle di thread lain; yang mati dibuang dari pool
+    pool = get_pool()
+    connections = await asyncio.to_thread(pool.health_check)
+    return {
+        "status": "ok",
+        "database": {**pool.get_stats(), "connections": connections},
+        "writer": get_db().get_writer_stats(),
+        "balance_cache": get_balance_cache().get_stats(),
+        "locks": get_lock_stats(),
+        "messages": MessageScheduler._instance.get_stats() if MessageScheduler._instance else None
+    }
\ No newline at end of file
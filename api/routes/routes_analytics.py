@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Optional
+from ext.trx import TransactionManager
+from ..dependencies import get_bot
+
+router = APIRouter()
+
+def _analytics(bot):
+    handler = getattr(bot, 'command_handler', None)
+    if handler is None:
+        raise HTTPException(status_code=503, detail="Command analytics not available")
+    return handler.analytics
+
+@router.get("/commands", response_model=List[Dict])
+async def get_command_usage(hours: int = 24, command: Optional[str] = None, bot=Depends(get_bot)):
+    return await _analytics(bot).get_usage(hours, command)
+
+@router.get("/commands/timeline", response_model=List[Dict])
+async def get_command_timeline(hours: int = 24, command: Optional[str] = None, bot=Depends(get_bot)):
+    return await _analytics(bot).get_timeline(hours, command)
+
+@router.get("/commands/errors", response_model=List[Dict])
+async def get_command_errors(limit: int = 20, command: Optional[str] = None, bot=Depends(get_bot)):
+    return await _analytics(bot).get_errors(min(limit, 100), command)
+
+@router.get("/sales", response_model=List[Dict])
+async def get_sales(hours: int = 24, product_code: Optional[str] = None, bot=Depends(get_bot)):
+    return await TransactionManager(bot).get_sales_report(hours, product_code)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
-from typing import List
-from ..models.stock import StockResponse, StockItem
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from ..models.stock import StockResponse, StockItem, StockHistoryPage
 from ..services.stock_service import StockService
 from ..dependencies import get_bot
 
@@ -17,4 +17,12 @@ async def get_stock(product_code: str, bot=Depends(get_bot)):
     stock = await service.get_stock(product_code)
     if not stock:
         raise HTTPException(status_code=404, detail="Product not found")
-    return stock
\ No newline at end of file
+    return stock
+
+@router.get("/{product_code}/history", response_model=StockHistoryPage)
+async def get_stock_history(product_code: str, limit: int = 20, cursor: Optional[str] = None, bot=Depends(get_bot)):
+    service = StockService(bot)
+    try:
+        return await service.get_stock_history(product_code, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends
-from typing import List
-from ..models.transaction import TransactionResponse, TransactionCreate
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from ..models.transaction import TransactionPage, TransactionCreate
 from ..services.transaction_service import TransactionService
 from ..dependencies import get_bot
 
 router = APIRouter()
 
-@router.get("/", response_model=List[TransactionResponse])
-async def get_transactions(limit: int = 10, bot=Depends(get_bot)):
+@router.get("/", response_model=TransactionPage)
+async def get_transactions(limit: int = 10, cursor: Optional[str] = None, bot=Depends(get_bot)):
     service = TransactionService(bot)
-    return await service.get_recent_transactions(limit)
+    try:
+        return await service.get_recent_transactions(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/{growid}", response_model=List[TransactionResponse])
-async def get_user_transactions(growid: str, bot=Depends(get_bot)):
+@router.get("/{growid}", response_model=TransactionPage)
+async def get_user_transactions(growid: str, limit: int = 50, cursor: Optional[str] = None, bot=Depends(get_bot)):
     service = TransactionService(bot)
-    return await service.get_user_transactions(growid)
\ No newline at end of file
+    try:
+        return await service.get_user_transactions(growid, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
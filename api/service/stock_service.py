@@ -1,7 +1,10 @@
 from typing import List, Optional, Dict
 from discord.ext import commands
-from database import get_connection
-from ..models.stock import StockResponse, StockItem
+from database import get_db
+from ext.product_manager import ProductManagerService
+from ext.constants import MAX_TRANSACTION_HISTORY
+from utils.pagination import fetch_page
+from ..models.stock import StockResponse, StockItem, StockHistoryItem, StockHistoryPage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,20 +12,16 @@ logger = logging.getLogger(__name__)
 class StockService:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.product_manager = ProductManagerService(bot)
     
     async def get_all_stock(self) -> List[StockResponse]:
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Get all products with their stock count
-            cursor.execute("""
+            results = await get_db().fetchall("""
                 SELECT 
                     p.code,
                     p.name,
                     p.price,
-                    COUNT(CASE WHEN s.status = 'available' THEN 1 END) as available,
                     GROUP_CONCAT(
                         CASE WHEN s.status = 'available' 
                         THEN json_object('id', s.id, 'content', s.content, 'status', s.status)
@@ -34,7 +33,7 @@ class StockService:
                 ORDER BY p.code
             """)
             
-            results = cursor.fetchall()
+            counts = await self.product_manager.get_stock_counts()
             stock_list = []
             
             for row in results:
@@ -50,7 +49,7 @@ class StockService:
                     code=row['code'],
                     name=row['name'],
                     price=row['price'],
-                    available=row['available'],
+                    available=counts.get(row['code'], 0),
                     items=items
                 ))
             
@@ -59,23 +58,15 @@ class StockService:
         except Exception as e:
             logger.error(f"Error getting all stock: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
     
     async def get_stock(self, product_code: str) -> Optional[StockResponse]:
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Get product details and available stock
-            cursor.execute("""
+            row = await get_db().fetchone("""
                 SELECT 
                     p.code,
                     p.name,
                     p.price,
-                    COUNT(CASE WHEN s.status = 'available' THEN 1 END) as available,
                     GROUP_CONCAT(
                         CASE WHEN s.status = 'available' 
                         THEN json_object('id', s.id, 'content', s.content, 'status', s.status)
@@ -87,7 +78,6 @@ class StockService:
                 GROUP BY p.code, p.name, p.price
             """, (product_code,))
             
-            row = cursor.fetchone()
             if not row:
                 return None
             
@@ -103,13 +93,33 @@ class StockService:
                 code=row['code'],
                 name=row['name'],
                 price=row['price'],
-                available=row['available'],
+                available=await self.product_manager.get_stock_count(row['code']),
                 items=items
             )
             
         except Exception as e:
             logger.error(f"Error getting stock for {product_code}: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+    
+    async def get_stock_history(self, product_code: str, limit: int = 20,
+                                cursor: Optional[str] = None) -> StockHistoryPage:
+        """Stock rows of product_code, newest first; raises ValueError for an invalid cursor"""
+        try:
+            page = await fetch_page(
+                """SELECT id, content, status, added_by, buyer_id, added_at, updated_at
+                   FROM stock""",
+                "product_code = ?",
+                (product_code,),
+                limit,
+                cursor,
+                sort_column="added_at",
+                max_limit=MAX_TRANSACTION_HISTORY
+            )
+            return StockHistoryPage(
+                items=[StockHistoryItem(**row) for row in page.items],
+                next_cursor=page.next_cursor
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting stock history for {product_code}: {e}")
+            raise
@@ -1,129 +1,96 @@
-from typing import List, Optional
+from typing import Optional
 from discord.ext import commands
-from database import get_connection
-from ..models.transaction import TransactionResponse, TransactionCreate
+from database import get_db
+from ext.constants import Balance, MAX_TRANSACTION_HISTORY
+from utils.pagination import fetch_page
+from ..models.transaction import TransactionResponse, TransactionCreate, TransactionPage
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+TRANSACTION_COLUMNS = """id, growid, type, details, old_balance, new_balance, amount_delta, balance_after,
+                product_code, quantity, order_id, related_growid, created_at"""
+
+def _to_response(row) -> TransactionResponse:
+    return TransactionResponse(
+        **{key: row[key] for key in row.keys() if key != 'created_at'},
+        created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
+    )
+
 class TransactionService:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
     
-    async def get_recent_transactions(self, limit: int = 10) -> List[TransactionResponse]:
-        conn = None
+    async def get_recent_transactions(self, limit: int = 10, cursor: Optional[str] = None) -> TransactionPage:
+        """Newest transactions first; raises ValueError for an invalid cursor"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, growid, type, details, old_balance, new_balance, created_at
-                FROM transactions
-                ORDER BY created_at DESC
-                LIMIT ?
-            """, (limit,))
-            
-            results = cursor.fetchall()
-            transactions = []
-            
-            for row in results:
-                transactions.append(TransactionResponse(
-                    id=row['id'],
-                    growid=row['growid'],
-                    type=row['type'],
-                    details=row['details'],
-                    old_balance=row['old_balance'],
-                    new_balance=row['new_balance'],
-                    created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
-                ))
-            
-            return transactions
+            page = await fetch_page(
+                f"SELECT {TRANSACTION_COLUMNS} FROM transactions",
+                limit=limit,
+                cursor=cursor,
+                max_limit=MAX_TRANSACTION_HISTORY
+            )
+            return TransactionPage(items=[_to_response(row) for row in page.items], next_cursor=page.next_cursor)
             
         except Exception as e:
             logger.error(f"Error getting recent transactions: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
     
-    async def get_user_transactions(self, growid: str) -> List[TransactionResponse]:
-        conn = None
+    async def get_user_transactions(self, growid: str, limit: int = MAX_TRANSACTION_HISTORY,
+                                    cursor: Optional[str] = None) -> TransactionPage:
+        """growid's transactions newest first; raises ValueError for an invalid cursor"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, growid, type, details, old_balance, new_balance, created_at
-                FROM transactions
-                WHERE growid = ? COLLATE binary
-                ORDER BY created_at DESC
-                LIMIT 50
-            """, (growid,))
-            
-            results = cursor.fetchall()
-            transactions = []
-            
-            for row in results:
-                transactions.append(TransactionResponse(
-                    id=row['id'],
-                    growid=row['growid'],
-                    type=row['type'],
-                    details=row['details'],
-                    old_balance=row['old_balance'],
-                    new_balance=row['new_balance'],
-                    created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
-                ))
-            
-            return transactions
+            page = await fetch_page(
+                f"SELECT {TRANSACTION_COLUMNS} FROM transactions",
+                "growid = ? COLLATE binary",
+                (growid,),
+                limit,
+                cursor,
+                max_limit=MAX_TRANSACTION_HISTORY
+            )
+            return TransactionPage(items=[_to_response(row) for row in page.items], next_cursor=page.next_cursor)
             
         except Exception as e:
             logger.error(f"Error getting transactions for {growid}: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
     
     async def create_transaction(self, transaction: TransactionCreate) -> TransactionResponse:
-        conn = None
-        try:
-            conn = get_connection()
+        def _create(conn):
             cursor = conn.cursor()
             
-            # Begin transaction
-            conn.execute("BEGIN TRANSACTION")
-            
             # Get current balance
             cursor.execute("""
-                SELECT balance_wl, balance_dl, balance_bgl
+                SELECT balance
                 FROM users
                 WHERE growid = ? COLLATE binary
-                FOR UPDATE
             """, (transaction.growid,))
             
             result = cursor.fetchone()
             if not result:
                 raise ValueError(f"GrowID {transaction.growid} not found")
             
-            old_balance = f"{result['balance_wl']}|{result['balance_dl']}|{result['balance_bgl']}"
+            old_balance = Balance(result['balance']).format()
             
             # Insert transaction
             cursor.execute("""
                 INSERT INTO transactions (
-                    growid, type, details, old_balance, new_balance, items_count
-                ) VALUES (?, ?, ?, ?, ?, ?)
+                    growid, type, details, old_balance, new_balance, items_count, amount_delta, balance_after
+                ) VALUES (?, ?, ?, ?, ?, ?, 0, ?)
             """, (
                 transaction.growid,
                 transaction.type,
                 transaction.details,
                 old_balance,
                 old_balance,  # New balance will be updated by other services
-                1
+                1,
+                result['balance']
             ))
             
-            transaction_id = cursor.lastrowid
-            
-            conn.commit()
+            return cursor.lastrowid, old_balance
+
+        try:
+            transaction_id, old_balance = await get_db().write(_create)
             logger.info(f"Created transaction for {transaction.growid}: {transaction.type}")
             
             # Return created transaction
@@ -138,10 +105,5 @@ class TransactionService:
             )
             
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Error creating transaction for {transaction.growid}: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
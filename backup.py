@@ -0,0 +1,243 @@
+"""Online, compressed backups of shop.db.
+
+create_backup() copies the live database with sqlite3's backup API a few
+pages per step, pausing between steps so the writer is never held off for
+long, checks the copy and gzips it into BACKUP_DIR. Writes during an
+incremental copy restart it; after BACKUP_MAX_RESTARTS restarts the copy
+is taken in one step, which in WAL mode still only needs a read snapshot.
+All functions here block and are meant to run in a worker thread.
+
+Usage: python backup.py create | list | verify [FILE] | restore FILE
+Restore is offline only: stop the bot first. The current database is
+backed up before it is overwritten.
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import database
+from migrations import MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = 'backups'
+BACKUP_PREFIX = 'shop_'
+BACKUP_SUFFIX = '.db.gz'
+BACKUP_KEEP = 14  # newest backups kept on disk
+BACKUP_INTERVAL_HOURS = 6
+BACKUP_PAGES_PER_STEP = 1024  # 4MB per step at the default page size
+BACKUP_STEP_PAUSE = 0.005  # seconds between steps, lets queued writes commit
+BACKUP_MAX_RESTARTS = 5
+COPY_CHUNK_SIZE = 1024 * 1024
+VERIFY_TABLES = ['users', 'user_growid', 'products', 'stock', 'transactions']
+
+class _CopyRestarted(Exception):
+    pass
+
+def _copy_database(src: sqlite3.Connection, dst: sqlite3.Connection) -> int:
+    """Copy src into dst; returns the number of restarts caused by concurrent writes"""
+    restarts = 0
+    while True:
+        state = {'remaining': None}
+
+        def _progress(status, remaining, total):
+            # remaining naik berarti sumber berubah dan SQLite mulai ulang dari awal
+            if state['remaining'] is not None and remaining > state['remaining']:
+                raise _CopyRestarted()
+            state['remaining'] = remaining
+            time.sleep(BACKUP_STEP_PAUSE)
+
+        if restarts >= BACKUP_MAX_RESTARTS:
+            src.backup(dst, pages=-1)
+            return restarts
+        try:
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=_progress)
+            return restarts
+        except _CopyRestarted:
+            restarts += 1
+
+def _gzip_file(src_path: str, dst_path: str):
+    partial = f"{dst_path}.partial"
+    with open(src_path, 'rb') as src, gzip.open(partial, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    os.replace(partial, dst_path)
+
+def _gunzip_file(src_path: str, dst_path: str):
+    with gzip.open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+def _check_database(path: str) -> Dict:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        integrity = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in VERIFY_TABLES
+        }
+    finally:
+        conn.close()
+    return {
+        'ok': integrity == ['ok'] and version is not None and version <= MIGRATIONS[-1].version,
+        'integrity': integrity[:5],
+        'schema_version': version,
+        'counts': counts
+    }
+
+def create_backup(backup_dir: str = BACKUP_DIR) -> Dict:
+    """Back up the live database to a verified .db.gz; returns its details"""
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.monotonic()
+    name = f"{BACKUP_PREFIX}{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}{BACKUP_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    fd, raw_path = tempfile.mkstemp(prefix='.backup_', suffix='.db', dir=backup_dir)
+    os.close(fd)
+
+    try:
+        src = database.get_connection()
+        dst = sqlite3.connect(raw_path)
+        try:
+            restarts = _copy_database(src, dst)
+            # Salinan berdiri sendiri, tanpa file -wal di sebelahnya
+            dst.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dst.close()
+            src.close()
+
+        check = _check_database(raw_path)
+        if not check['ok']:
+            raise RuntimeError(f"Backup failed verification: {check['integrity']}")
+        db_size = os.path.getsize(raw_path)
+        _gzip_file(raw_path, path)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    result = {
+        'name': name,
+        'path': path,
+        'size': os.path.getsize(path),
+        'db_size': db_size,
+        'restarts': restarts,
+        'elapsed': time.monotonic() - started,
+        'counts': check['counts']
+    }
+    logger.info(
+        f"Backup {name} created: {db_size:,} -> {result['size']:,} bytes "
+        f"in {result['elapsed']:.1f}s ({restarts} restarts)"
+    )
+    return result
+
+def list_backups(backup_dir: str = BACKUP_DIR) -> List[str]:
+    """Backup paths, newest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [
+        name for name in os.listdir(backup_dir)
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+    ]
+    # Timestamp di nama file bisa diurutkan sebagai string
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+def prune_backups(backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[str]:
+    """Delete all but the newest keep backups; returns the deleted paths"""
+    removed = list_backups(backup_dir)[keep:]
+    for path in removed:
+        os.remove(path)
+        logger.info(f"Pruned backup {os.path.basename(path)}")
+    return removed
+
+def resolve_backup(name: Optional[str] = None, backup_dir: str = BACKUP_DIR) -> str:
+    """Path of the named backup, or of the newest one when name is None"""
+    if name is None:
+        backups = list_backups(backup_dir)
+        if not backups:
+            raise FileNotFoundError("No backups found")
+        return backups[0]
+    path = name if os.path.dirname(name) else os.path.join(backup_dir, name)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Backup {name} not found")
+    return path
+
+def verify_backup(path: str) -> Dict:
+    """Decompress a backup to a scratch file and check integrity, schema version and row counts"""
+    fd, raw_path = tempfile.mkstemp(prefix='.verify_', suffix='.db', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        _gunzip_file(path, raw_path)
+        return {'name': os.path.basename(path), **_check_database(raw_path)}
+    finally:
+        os.remove(raw_path)
+
+def restore_backup(path: str, backup_dir: str = BACKUP_DIR) -> Dict:
+    """Replace the database with a verified backup. Offline only: stop the bot first.
+
+    The current database is backed up first, so a restore can be undone.
+    """
+    fd, raw_path = tempfile.mkstemp(prefix='.restore_', suffix='.db', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        _gunzip_file(path, raw_path)
+        check = _check_database(raw_path)
+        if not check['ok']:
+            raise RuntimeError(f"Refusing to restore {path}: {check['integrity']}")
+
+        safety = create_backup(backup_dir) if os.path.exists(database.DB_FILE) else None
+        src = sqlite3.connect(raw_path)
+        dst = database.get_connection()
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        os.remove(raw_path)
+
+    logger.info(f"Restored {os.path.basename(path)}" + (f" (previous state saved as {safety['name']})" if safety else ""))
+    return {'restored': os.path.basename(path), 'safety_backup': safety['name'] if safety else None, **check}
+
+def split_backup(path: str, part_size: int, out_dir: str) -> List[str]:
+    """Split a backup into part files of at most part_size bytes for upload"""
+    parts = []
+    with open(path, 'rb') as src:
+        while True:
+            part_path = os.path.join(out_dir, f"{os.path.basename(path)}.part{len(parts) + 1:03d}")
+            with open(part_path, 'wb') as dst:
+                written = 0
+                while written < part_size:
+                    chunk = src.read(min(COPY_CHUNK_SIZE, part_size - written))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    written += len(chunk)
+            if not written:
+                os.remove(part_path)
+                break
+            parts.append(part_path)
+    return parts
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'create'
+    if command == 'create':
+        print(create_backup())
+        prune_backups()
+    elif command == 'list':
+        for backup_path in list_backups():
+            print(f"{os.path.basename(backup_path)}\t{os.path.getsize(backup_path):,} bytes")
+    elif command == 'verify':
+        result = verify_backup(resolve_backup(sys.argv[2] if len(sys.argv) > 2 else None))
+        print(result)
+        sys.exit(0 if result['ok'] else 1)
+    elif command == 'restore' and len(sys.argv) > 2:
+        print(restore_backup(resolve_backup(sys.argv[2])))
+    else:
+        print(__doc__)
+        sys.exit(2)
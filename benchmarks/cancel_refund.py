@@ -0,0 +1,87 @@
+"""Regression check: cancelling one purchase refunds that order's product, not another.
+
+Seeds a buyer who buys two products (A twice, B once) through
+trx.claim_purchase, then cancels the B order with trx.refund_purchase.
+The REFUND row must carry B's product code and quantity, only B's row
+goes back on sale, A's rows stay sold and the balance rises by B's
+price. Exits with status 1 on any violation.
+
+Usage: python benchmarks/cancel_refund.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from ext.constants import STATUS_AVAILABLE, STATUS_SOLD  # noqa: E402
+from ext.trx import claim_purchase, refund_purchase  # noqa: E402
+
+PRICES = {'BENCH_A': 10, 'BENCH_B': 25}
+BALANCE = 1000
+
+def seed(conn):
+    conn.executemany(
+        "INSERT INTO products (code, name, price) VALUES (?, 'Bench Item', ?)",
+        list(PRICES.items())
+    )
+    conn.execute("INSERT INTO users (growid, balance) VALUES ('buyer', ?)", (BALANCE,))
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by) VALUES (?, ?, 'bench')",
+        [(code, f"{code}-item-{i}") for code in PRICES for i in range(5)]
+    )
+    conn.commit()
+
+def purchase(conn, product_code: str, quantity: int) -> int:
+    conn.execute("BEGIN")
+    order_id = claim_purchase(conn, 'buyer', product_code, quantity)['order_id']
+    conn.commit()
+    return order_id
+
+def main():
+    os.chdir(tempfile.mkdtemp(prefix="bench_refund_"))
+    database.setup_database()
+    conn = database.get_connection()
+    seed(conn)
+    errors = []
+
+    purchase(conn, 'BENCH_A', 2)
+    order_id = purchase(conn, 'BENCH_B', 1)
+    purchase(conn, 'BENCH_A', 1)
+    balance_before = conn.execute("SELECT balance FROM users WHERE growid = 'buyer'").fetchone()[0]
+
+    conn.execute("BEGIN")
+    (growid, entry), deltas = refund_purchase(conn, order_id, 'bench-admin')
+    conn.commit()
+
+    refund = conn.execute(
+        "SELECT product_code, quantity, amount_delta FROM transactions WHERE id = ?", (entry.transaction_id,)
+    ).fetchone()
+    if refund['product_code'] != 'BENCH_B' or refund['quantity'] != 1:
+        errors.append(f"REFUND row has product {refund['product_code']} x{refund['quantity']}, expected BENCH_B x1")
+    if refund['amount_delta'] != PRICES['BENCH_B'] or entry.new_balance != balance_before + PRICES['BENCH_B']:
+        errors.append(f"refunded {refund['amount_delta']} WL, expected {PRICES['BENCH_B']}")
+    if deltas != {'BENCH_B': 1}:
+        errors.append(f"stock deltas {deltas}, expected {{'BENCH_B': 1}}")
+
+    counts = {
+        (row['product_code'], row['status']): row['items']
+        for row in conn.execute(
+            "SELECT product_code, status, COUNT(*) as items FROM stock GROUP BY product_code, status"
+        )
+    }
+    expected = {('BENCH_A', STATUS_SOLD): 3, ('BENCH_A', STATUS_AVAILABLE): 2, ('BENCH_B', STATUS_AVAILABLE): 5}
+    if counts != expected:
+        errors.append(f"stock by product/status {counts}, expected {expected}")
+    conn.close()
+
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+    print(f"refund for order #{order_id}: {refund['product_code']} x{refund['quantity']}, +{refund['amount_delta']} WL")
+    print("OK")
+
+if __name__ == "__main__":
+    main()
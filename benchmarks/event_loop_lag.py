@@ -0,0 +1,138 @@
+"""Event loop lag under concurrent purchases: blocking sqlite3 vs the async facade.
+
+Runs the purchase transaction (product lookup, stock claim, balance debit,
+transaction insert) from many concurrent tasks, once directly on the event
+loop as the services used to and once through database.get_db(). A ticker
+task measures how late the loop wakes it up, which is what heartbeats,
+button callbacks and the live-stock loop experience.
+
+A background thread periodically holds the write lock to stand in for slow
+queries and WAL checkpoints.
+
+Usage: python benchmarks/event_loop_lag.py [--buyers 50] [--purchases 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+TICK = 0.005
+
+def seed(buyers: int, purchases: int):
+    conn = database.get_connection()
+    conn.execute("INSERT INTO products (code, name, price) VALUES ('BENCH', 'Bench Item', 10)")
+    conn.executemany(
+        "INSERT INTO users (growid, balance) VALUES (?, ?)",
+        [(f"buyer{i}", 1_000_000) for i in range(buyers)]
+    )
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by) VALUES ('BENCH', ?, 'bench')",
+        [(f"item-{i}",) for i in range(buyers * purchases * 2 + 10)]
+    )
+    conn.commit()
+    conn.close()
+
+def purchase(conn, growid: str):
+    cursor = conn.cursor()
+    cursor.execute("SELECT price, name FROM products WHERE code = 'BENCH'")
+    price = cursor.fetchone()['price']
+    cursor.execute("""
+        SELECT id FROM stock
+        WHERE product_code = 'BENCH' AND status = 'available'
+        ORDER BY added_at ASC LIMIT 1
+    """)
+    stock_id = cursor.fetchone()['id']
+    cursor.execute("SELECT balance FROM users WHERE growid = ?", (growid,))
+    balance = cursor.fetchone()['balance']
+    cursor.execute("UPDATE stock SET status = 'sold', buyer_id = ? WHERE id = ?", (growid, stock_id))
+    cursor.execute("UPDATE users SET balance = ? WHERE growid = ?", (balance - price, growid))
+    cursor.execute(
+        "INSERT INTO transactions (growid, type, details, items_count, total_price) VALUES (?, 'PURCHASE', 'bench', 1, ?)",
+        (growid, price)
+    )
+
+def hold_write_lock(stop: threading.Event, hold: float, every: float):
+    conn = database.get_connection()
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.commit()
+        time.sleep(every)
+    conn.close()
+
+async def ticker(samples: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        samples.append(loop.time() - start - TICK)
+
+async def run(mode: str, buyers: int, purchases: int) -> dict:
+    samples = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(samples, stop))
+    db = database.get_db()
+
+    async def buyer(i: int):
+        growid = f"buyer{i}"
+        for _ in range(purchases):
+            if mode == "blocking":
+                with database.db_connection() as conn:
+                    purchase(conn, growid)
+                    conn.commit()
+                await asyncio.sleep(0)
+            else:
+                await db.write(purchase, growid)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer(i) for i in range(buyers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+
+    samples.sort()
+    return {
+        'purchases/s': buyers * purchases / elapsed,
+        'lag p50 ms': statistics.median(samples) * 1000 if samples else 0.0,
+        'lag p99 ms': samples[int(len(samples) * 0.99) - 1] * 1000 if samples else 0.0,
+        'lag max ms': samples[-1] * 1000 if samples else 0.0,
+        'ticks': len(samples)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--purchases", type=int, default=20)
+    parser.add_argument("--hold-ms", type=float, default=50, help="write lock hold time of the contending thread")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_lag_")
+    os.chdir(workdir)
+    database.setup_database(include_online=True)
+    seed(args.buyers, args.purchases)
+    database.init_pool()
+
+    stop = threading.Event()
+    contender = threading.Thread(target=hold_write_lock, args=(stop, args.hold_ms / 1000, 0.2), daemon=True)
+    contender.start()
+    try:
+        for mode in ("blocking", "async"):
+            result = asyncio.run(run(mode, args.buyers, args.purchases))
+            print(f"{mode:>8}: " + ", ".join(
+                f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+            ))
+    finally:
+        stop.set()
+        contender.join()
+        database.close_pool()
+
+if __name__ == "__main__":
+    main()
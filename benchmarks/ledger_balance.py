@@ -0,0 +1,142 @@
+"""Purchase throughput with a three-column balance vs the single-integer ledger.
+
+Runs the same burst of concurrent purchases (stock claim, balance debit,
+transaction row) through database.WriteQueue twice on scratch databases:
+once debiting a legacy users table that stores balance_wl/dl/bgl (read the
+three columns, total and split them in Python, write all three back) and
+once through ext.ledger.post (one conditional UPDATE ... RETURNING on the
+integer balance). Both check the final balances against what was spent.
+
+Usage: python benchmarks/ledger_balance.py [--buyers 50] [--purchases 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from ext import ledger  # noqa: E402
+from ext.constants import TransactionError  # noqa: E402
+
+PRICE = 150
+BALANCE = 1_000_000
+
+def seed(buyers: int, purchases: int):
+    conn = database.get_connection()
+    conn.execute("INSERT INTO products (code, name, price) VALUES ('BENCH', 'Bench Item', ?)", (PRICE,))
+    conn.executemany(
+        "INSERT INTO users (growid, balance) VALUES (?, ?)",
+        [(f"buyer{i}", BALANCE) for i in range(buyers)]
+    )
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by) VALUES ('BENCH', ?, 'bench')",
+        [(f"item-{i}",) for i in range(buyers * purchases + 10)]
+    )
+    # Tabel saldo lama: tiga kolom, seperti sebelum migrasi 9
+    conn.execute("""
+        CREATE TABLE legacy_users (
+            growid TEXT PRIMARY KEY,
+            balance_wl INTEGER DEFAULT 0,
+            balance_dl INTEGER DEFAULT 0,
+            balance_bgl INTEGER DEFAULT 0,
+            balance_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO legacy_users (growid, balance_bgl) VALUES (?, ?)",
+        [(f"buyer{i}", BALANCE // 10000) for i in range(buyers)]
+    )
+    conn.commit()
+    conn.close()
+
+def claim_stock(cursor, growid: str):
+    cursor.execute("""
+        UPDATE stock SET status = 'sold', buyer_id = ?
+        WHERE id IN (SELECT id FROM stock WHERE product_code = 'BENCH' AND status = 'available'
+                     ORDER BY added_at ASC LIMIT 1) AND status = 'available'
+        RETURNING id
+    """, (growid,))
+    if not cursor.fetchone():
+        raise TransactionError("Insufficient stock")
+    cursor.execute("SELECT price FROM products WHERE code = 'BENCH'")
+    return cursor.fetchone()['price']
+
+def legacy_purchase(conn, growid: str):
+    cursor = conn.cursor()
+    price = claim_stock(cursor, growid)
+    cursor.execute(
+        "SELECT balance_wl, balance_dl, balance_bgl FROM legacy_users WHERE growid = ?", (growid,)
+    )
+    row = cursor.fetchone()
+    old_total = row['balance_wl'] + row['balance_dl'] * 100 + row['balance_bgl'] * 10000
+    if old_total < price:
+        raise TransactionError("Insufficient balance")
+    new_total = old_total - price
+    bgl, rest = divmod(new_total, 10000)
+    dl, wl = divmod(rest, 100)
+    cursor.execute("""
+        UPDATE legacy_users SET balance_wl = ?, balance_dl = ?, balance_bgl = ?,
+                                balance_version = balance_version + 1
+        WHERE growid = ?
+    """, (wl, dl, bgl, growid))
+    cursor.execute("""
+        INSERT INTO transactions (growid, type, details, old_balance, new_balance, items_count, total_price)
+        VALUES (?, 'PURCHASE', 'bench', ?, ?, 1, ?)
+    """, (growid, f"{old_total} WL", f"{new_total} WL", price))
+
+def ledger_purchase(conn, growid: str):
+    price = claim_stock(conn.cursor(), growid)
+    ledger.post(conn, growid, -price, 'PURCHASE', 'bench', total_price=price, quantity=1)
+
+async def burst(writer: database.WriteQueue, fn, buyers: int, purchases: int) -> float:
+    async def buyer(i: int):
+        for _ in range(purchases):
+            await asyncio.wrap_future(writer.submit(fn, (f"buyer{i}",)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer(i) for i in range(buyers)))
+    return buyers * purchases / (time.perf_counter() - started)
+
+def check(table: str, expression: str, purchases: int) -> int:
+    conn = database.get_connection()
+    wrong = conn.execute(
+        f"SELECT COUNT(*) FROM {table} WHERE {expression} != ?", (BALANCE - PRICE * purchases,)
+    ).fetchone()[0]
+    conn.close()
+    return wrong
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--purchases", type=int, default=20)
+    args = parser.parse_args()
+
+    runs = (
+        ("three columns", legacy_purchase, "legacy_users",
+         "balance_wl + balance_dl * 100 + balance_bgl * 10000"),
+        ("integer ledger", ledger_purchase, "users", "balance"),
+    )
+    for label, fn, table, expression in runs:
+        # Database terpisah per run agar ukuran tabel transactions sama
+        os.chdir(tempfile.mkdtemp(prefix="bench_ledger_"))
+        database.setup_database(include_online=True)
+        seed(args.buyers, args.purchases)
+
+        writer = database.WriteQueue()
+        try:
+            rate = asyncio.run(burst(writer, fn, args.buyers, args.purchases))
+            stats = writer.get_stats()
+        finally:
+            writer.close()
+        wrong = check(table, expression, args.purchases)
+        print(
+            f"{label:>15}: purchases/s={rate:.0f}, avg_batch={stats['avg_batch_size']:.1f}, "
+            f"failed={stats['failed_jobs']}, wrong_balances={wrong}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Purchase DM latency behind a burst of logs and announcements.
+
+Queues a burst of announcement DMs, log messages and board edits on the
+outbound scheduler, then trickles purchase DMs in while the burst drains.
+Sends are simulated with a fixed API latency. Reports how long buyer DMs
+waited compared with the burst, and how many board edits were coalesced.
+
+Usage: python benchmarks/message_scheduler.py [--burst 500] [--buyers 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ext.constants import LANE_BUYER, LANE_BROADCAST, LANE_LOG, LANE_BOARD  # noqa: E402
+from ext.message_scheduler import MessageScheduler  # noqa: E402
+
+API_LATENCY = 0.02
+
+async def fake_request():
+    await asyncio.sleep(API_LATENCY)
+    return time.monotonic()
+
+async def timed(scheduler: MessageScheduler, lane: int, route: str, **kwargs) -> float:
+    queued = time.monotonic()
+    await scheduler.send(lane, route, fake_request, **kwargs)
+    return time.monotonic() - queued
+
+async def run(burst: int, buyers: int) -> dict:
+    scheduler = MessageScheduler(None)
+    background = []
+    for i in range(burst):
+        background.append(asyncio.ensure_future(timed(scheduler, LANE_BROADCAST, f"dm:{i}")))
+        background.append(asyncio.ensure_future(timed(scheduler, LANE_LOG, f"channel:{i % 3}")))
+        background.append(asyncio.ensure_future(
+            timed(scheduler, LANE_BOARD, "channel:board", coalesce_key=f"board_edit:{i % 10}")
+        ))
+
+    buyer_waits = []
+    for i in range(buyers):
+        await asyncio.sleep(0.05)
+        buyer_waits.append(await timed(scheduler, LANE_BUYER, f"dm:buyer{i}"))
+
+    background_waits = await asyncio.gather(*background)
+    stats = scheduler.get_stats()
+    await scheduler.stop()
+    return {
+        'buyer p50 ms': statistics.median(buyer_waits) * 1000,
+        'buyer max ms': max(buyer_waits) * 1000,
+        'burst p50 ms': statistics.median(background_waits) * 1000,
+        'burst max ms': max(background_waits) * 1000,
+        'board edits sent': stats['lanes']['board']['sent'],
+        'board edits coalesced': stats['lanes']['board']['coalesced']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=500, help="announcements, logs and board edits each")
+    parser.add_argument("--buyers", type=int, default=20)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.burst, args.buyers))
+    print(", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Concurrency stress test for the conditional purchase engine (trx.claim_purchase).
+
+Seeds two products with limited stock and many buyers with limited
+balance. More purchase attempts than the stock can satisfy are fired at
+the first product from several worker processes, each with its own
+connection and no in-process locks, and at the second from a burst of
+concurrent coroutines through the async write queue.
+Afterwards it checks the ledger: every sold row belongs to exactly one
+purchase, per-buyer item and price totals match, and no balance is
+negative. Exits with status 1 on any violation.
+
+Usage: python benchmarks/purchase_stress.py [--stock 2000] [--buyers 200] [--processes 8]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from ext.constants import TransactionError  # noqa: E402
+from ext.trx import claim_purchase  # noqa: E402
+
+PRICE = 10
+BALANCE = 300  # enough for 30 items per buyer
+PRODUCTS = ('BENCH', 'BENCH2')
+
+def seed(stock: int, buyers: int):
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO products (code, name, price) VALUES (?, 'Bench Item', ?)",
+        [(code, PRICE) for code in PRODUCTS]
+    )
+    conn.executemany(
+        "INSERT INTO users (growid, balance) VALUES (?, ?)",
+        [(f"buyer{i}", BALANCE) for i in range(buyers)]
+    )
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by) VALUES (?, ?, 'bench')",
+        [(code, f"{code}-item-{i}") for code in PRODUCTS for i in range(stock)]
+    )
+    conn.commit()
+    conn.close()
+
+def worker(job: tuple) -> tuple:
+    seed_value, buyers, attempts = job
+    rng = random.Random(seed_value)
+    conn = database.get_connection()
+    ok = rejected = busy = 0
+    for _ in range(attempts):
+        try:
+            conn.execute("BEGIN")
+            claim_purchase(conn, f"buyer{rng.randrange(buyers)}", 'BENCH', rng.randint(1, 3))
+            conn.commit()
+            ok += 1
+        except TransactionError:
+            conn.rollback()
+            rejected += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            busy += 1
+    conn.close()
+    return ok, rejected, busy
+
+async def async_burst(buyers: int, attempts: int) -> tuple:
+    db = database.get_db()
+    ok = rejected = 0
+
+    async def attempt(i: int):
+        nonlocal ok, rejected
+        try:
+            await db.write(claim_purchase, f"buyer{i % buyers}", 'BENCH2', 1 + i % 3)
+            ok += 1
+        except TransactionError:
+            rejected += 1
+
+    await asyncio.gather(*(attempt(i) for i in range(attempts)))
+    return ok, rejected
+
+def check(stock: int) -> list:
+    conn = database.get_connection()
+    errors = []
+    sold = conn.execute("SELECT COUNT(*) FROM stock WHERE status = 'sold'").fetchone()[0]
+    bought = conn.execute(
+        "SELECT COALESCE(SUM(items_count), 0) FROM transactions WHERE type = 'PURCHASE'"
+    ).fetchone()[0]
+    if sold != bought:
+        errors.append(f"{sold} rows sold but {bought} items recorded")
+    for code in PRODUCTS:
+        sold_code = conn.execute(
+            "SELECT COUNT(*) FROM stock WHERE product_code = ? AND status = 'sold'", (code,)
+        ).fetchone()[0]
+        if sold_code > stock:
+            errors.append(f"{sold_code} {code} rows sold out of {stock}")
+
+    rows = conn.execute("""
+        SELECT u.growid, u.balance,
+               (SELECT COUNT(*) FROM stock s WHERE s.buyer_id = u.growid) as rows_owned,
+               (SELECT COALESCE(SUM(items_count), 0) FROM transactions t
+                WHERE t.growid = u.growid AND t.type = 'PURCHASE') as items,
+               (SELECT COALESCE(SUM(total_price), 0) FROM transactions t
+                WHERE t.growid = u.growid AND t.type = 'PURCHASE') as spent
+        FROM users u
+    """).fetchall()
+    for row in rows:
+        if row['balance'] < 0:
+            errors.append(f"{row['growid']} has negative balance {row['balance']}")
+        if row['rows_owned'] != row['items']:
+            errors.append(f"{row['growid']} owns {row['rows_owned']} rows but bought {row['items']}")
+        if BALANCE - row['balance'] != row['spent']:
+            errors.append(f"{row['growid']} spent {row['spent']} but balance moved {BALANCE - row['balance']}")
+    conn.close()
+    return errors, sold
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=400, help="purchase attempts per process")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_purchase_"))
+    database.setup_database(include_online=True)
+    seed(args.stock, args.buyers)
+
+    started = time.perf_counter()
+    jobs = [(i, args.buyers, args.attempts) for i in range(args.processes)]
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - started
+    ok, rejected, busy = (sum(r[i] for r in results) for i in range(3))
+    print(f"  processes: attempts/s={len(jobs) * args.attempts / elapsed:.0f}, "
+          f"ok={ok}, rejected={rejected}, busy={busy}")
+
+    database.init_pool()
+    try:
+        started = time.perf_counter()
+        ok, rejected = asyncio.run(async_burst(args.buyers, args.processes * args.attempts))
+        elapsed = time.perf_counter() - started
+        print(f"write queue: attempts/s={args.processes * args.attempts / elapsed:.0f}, "
+              f"ok={ok}, rejected={rejected}")
+    finally:
+        database.close_pool()
+
+    errors, sold = check(args.stock)
+    for error in errors[:20]:
+        print(f"VIOLATION {error}")
+    print(f"sold {sold}/{args.stock * len(PRODUCTS)}: " + ("OK" if not errors else f"{len(errors)} violation(s)"))
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
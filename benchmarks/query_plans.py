@@ -0,0 +1,59 @@
+"""Query plan audit for the stock hot path.
+
+Builds a fresh, fully migrated database, fills it with enough
+stock for the planner to care, runs database.audit_query_plans() and
+prints every plan. Exits with status 1 if a hot query scans a table or
+sorts through a temporary b-tree, so it can gate schema changes in CI.
+
+Usage: python benchmarks/query_plans.py [--products 50] [--stock 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+def seed(products: int, stock: int):
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO products (code, name, price) VALUES (?, ?, 10)",
+        [(f"P{i}", f"Product {i}") for i in range(products)]
+    )
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by, status) VALUES (?, ?, 'audit', ?)",
+        [(f"P{i % products}", f"item-{i}", 'sold' if i % 4 else 'available') for i in range(stock)]
+    )
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="audit_plans_"))
+    database.setup_database(include_online=True)
+    seed(args.products, args.stock)
+
+    conn = database.get_connection()
+    try:
+        for name, query, params in database.HOT_QUERIES:
+            print(name)
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+                print(f"    {row['detail']}")
+        problems = database.audit_query_plans(conn)
+    finally:
+        conn.close()
+
+    for name, detail in problems:
+        print(f"REGRESSION {name}: {detail}")
+    print("OK" if not problems else f"{len(problems)} regression(s)")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Command rate limiting at 10k active users: timestamp lists vs GCRA.
+
+Replays a stream of commands from many users and channels through the
+list-of-datetimes check AdvancedCommandHandler used to run and through
+utils.rate_limiter, reporting checks/s and the memory held by the limiter
+state afterwards. Both use config.json's default user limit, and the GCRA
+run is repeated with the channel limit added; the global limit is left
+out so every check does the per-user work.
+
+Usage: python benchmarks/rate_limiter.py [--users 10000] [--checks 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limiter import RateLimiter, acquire_all  # noqa: E402
+
+USER_LIMIT = (3, 5)
+CHANNEL_LIMIT = (10, 5)
+CHANNELS = 50
+
+class LegacyLimiter:
+    """The per-user timestamp lists from the old check_rate_limit"""
+
+    def __init__(self):
+        self.usage = {}
+
+    def check(self, user_id: int, now: datetime) -> bool:
+        key = str(user_id)
+        if key not in self.usage:
+            self.usage[key] = []
+        self.usage[key] = [t for t in self.usage[key] if (now - t).total_seconds() <= USER_LIMIT[1]]
+        if len(self.usage[key]) >= USER_LIMIT[0]:
+            return False
+        self.usage[key].append(now)
+        return True
+
+def workload(users: int, checks: int, rate: float):
+    """(user, channel, seconds since start) for checks arriving at rate per second"""
+    rng = random.Random(42)
+    return [(rng.randrange(users), rng.randrange(CHANNELS), i / rate) for i in range(checks)]
+
+def run_legacy(events) -> LegacyLimiter:
+    limiter = LegacyLimiter()
+    start = datetime.utcnow()
+    for user, _, offset in events:
+        limiter.check(user, start + timedelta(seconds=offset))
+    return limiter
+
+def run_gcra(events, with_channel: bool = False) -> RateLimiter:
+    user_limiter = RateLimiter(*USER_LIMIT)
+    channel_limiter = RateLimiter(*CHANNEL_LIMIT)
+    for user, channel, offset in events:
+        checks = [(user_limiter, user)]
+        if with_channel:
+            checks.append((channel_limiter, channel))
+        acquire_all(checks, offset)
+    return user_limiter
+
+def measure(run, events) -> tuple:
+    started = time.perf_counter()
+    run(events)
+    rate = len(events) / (time.perf_counter() - started)
+
+    # Ukur memori di run terpisah agar overhead tracemalloc tidak masuk ke throughput
+    tracemalloc.start()
+    state = run(events)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rate, memory, len(state.usage) if isinstance(state, LegacyLimiter) else len(state)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--rate", type=float, default=2_000, help="commands per second across all users")
+    args = parser.parse_args()
+
+    events = workload(args.users, args.checks, args.rate)
+    runs = (
+        ("timestamp lists", run_legacy),
+        ("gcra", run_gcra),
+        ("gcra + channel", lambda events: run_gcra(events, with_channel=True))
+    )
+    for label, run in runs:
+        rate, memory, keys = measure(run, events)
+        print(f"{label:>15}: checks/s={rate:,.0f}, state={memory / 1024:,.0f}KB, keys held={keys:,}")
+
+if __name__ == "__main__":
+    main()
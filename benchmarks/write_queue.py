@@ -0,0 +1,54 @@
+"""Write throughput of the single-writer queue: one commit per job vs group commit.
+
+Fires bursts of concurrent purchase transactions at database.WriteQueue,
+first with max_batch=1 (one COMMIT per mutation, what a plain writer
+thread does) and then with the default batch size, and reports throughput
+and batch statistics.
+
+Usage: python benchmarks/write_queue.py [--buyers 50] [--purchases 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from event_loop_lag import purchase, seed  # noqa: E402
+
+async def burst(writer: database.WriteQueue, buyers: int, purchases: int) -> float:
+    async def buyer(i: int):
+        for _ in range(purchases):
+            await asyncio.wrap_future(writer.submit(purchase, (f"buyer{i}",)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer(i) for i in range(buyers)))
+    return buyers * purchases / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--purchases", type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_writeq_"))
+    database.setup_database(include_online=True)
+    seed(args.buyers, args.purchases * 2)
+
+    for label, max_batch in (("commit per job", 1), ("group commit", database.WRITE_BATCH_SIZE)):
+        writer = database.WriteQueue(max_batch=max_batch)
+        try:
+            rate = asyncio.run(burst(writer, args.buyers, args.purchases))
+            stats = writer.get_stats()
+        finally:
+            writer.close()
+        print(
+            f"{label:>15}: purchases/s={rate:.0f}, batches={stats['batches']}, "
+            f"avg_batch={stats['avg_batch_size']:.1f}, failed={stats['failed_jobs']}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Regression check: a write batch that cannot start must fail its jobs, not strand them.
+
+Holds the SQLite write lock from a second connection, longer than the
+busy_timeout, while jobs are queued on database.WriteQueue. BEGIN
+IMMEDIATE then fails with "database is locked"; every queued job must
+resolve with that error instead of waiting forever. After the lock is
+released a new write must succeed. Exits with status 1 on any violation.
+
+Usage: python benchmarks/write_queue_lock.py [--jobs 20]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+BUSY_TIMEOUT = 5  # seconds, PRAGMA busy_timeout in database.get_connection()
+
+def insert_setting(conn, key: str):
+    conn.execute("INSERT INTO bot_settings (key, value) VALUES (?, 'x')", (key,))
+    return key
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_writelock_"))
+    database.setup_database()
+    errors = []
+
+    holder = database.get_connection()
+    holder.execute("BEGIN IMMEDIATE")
+    writer = database.WriteQueue()
+    try:
+        futures = [writer.submit(insert_setting, (f"locked-{i}",)) for i in range(args.jobs)]
+        done, pending = wait(futures, timeout=BUSY_TIMEOUT * 3)
+        if pending:
+            errors.append(f"{len(pending)} of {args.jobs} jobs never resolved while the lock was held")
+        for future in done:
+            if not isinstance(future.exception(), sqlite3.OperationalError):
+                errors.append(f"job resolved with {future.exception()!r} instead of 'database is locked'")
+                break
+        holder.rollback()
+
+        started = time.monotonic()
+        key = writer.submit(insert_setting, ("after-release",)).result(timeout=BUSY_TIMEOUT)
+        print(f"write after release: {key} in {(time.monotonic() - started) * 1000:.0f}ms")
+        stats = writer.get_stats()
+        print(f"failed_batches={stats['failed_batches']}, failed_jobs={stats['failed_jobs']}")
+    finally:
+        holder.close()
+        writer.close()
+
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
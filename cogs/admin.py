@@ -1,15 +1,29 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 from datetime import datetime, timedelta
-import json
 import asyncio
 from typing import Optional, List
 import io
+import os
+import codecs
+import tempfile
+import zlib
 import psutil
 import platform
-import aiohttp
-from database import get_connection
+from database import get_db, get_pool
+from utils.config import ConfigService, get_config
+from utils.balance_cache import get_balance_cache
+from utils.lock_manager import get_lock_stats
+from backup import (
+    BACKUP_INTERVAL_HOURS,
+    create_backup,
+    list_backups,
+    prune_backups,
+    resolve_backup,
+    split_backup,
+    verify_backup
+)
 import jwt
 from datetime import datetime, timedelta
 from ..config import API_SECRET_KEY
@@ -20,11 +34,20 @@ from ext.constants import (
     TRANSACTION_ADMIN_REMOVE,
     TRANSACTION_ADMIN_RESET,
     MAX_STOCK_FILE_SIZE,
-    VALID_STOCK_FORMATS
+    VALID_STOCK_FORMATS,
+    PROGRESS_UPDATE_INTERVAL,
+    STOCK_STREAM_CHUNK_SIZE,
+    STOCK_STREAM_BATCH_SIZE,
+    MAX_STOCK_STREAM_SIZE,
+    MAX_STOCK_LINE_LENGTH,
+    DEFAULT_PAGE_SIZE
 )
+from ext.message_scheduler import MessageScheduler
+from ext.broadcast import BroadcastService
 from ext.balance_manager import BalanceManagerService
 from ext.product_manager import ProductManagerService
 from ext.trx import TransactionManager
+from ext.paginator import PaginatedView
 
 
 
@@ -40,16 +63,13 @@ class AdminCog(commands.Cog, name="Admin"):
         self.balance_service = BalanceManagerService(bot)
         self.product_service = ProductManagerService(bot)
         self.trx_manager = TransactionManager(bot)
-        
-        # Load admin configuration
-        try:
-            with open('config.json') as f:
-                config = json.load(f)
-                self.admin_id = int(config['admin_id'])
-                self.logger.info(f"Admin ID loaded: {self.admin_id}")
-        except Exception as e:
-            self.logger.error(f"Failed to load admin_id: {e}")
-            raise
+        self.scheduler = MessageScheduler(bot)
+        self.broadcast = BroadcastService(bot)
+        self._backup_lock = asyncio.Lock()
+
+    @property
+    def admin_id(self) -> int:
+        return get_config().admin_id
 
     async def _check_admin(self, ctx) -> bool:
         """Check if user has admin permissions"""
@@ -59,23 +79,21 @@ class AdminCog(commands.Cog, name="Admin"):
             self.logger.warning(f"Unauthorized access attempt by {ctx.author} (ID: {ctx.author.id})")
         return is_admin
 
-    async def _process_stock_file(self, attachment) -> List[str]:
-        """Process uploaded stock file"""
-        if attachment.size > MAX_STOCK_FILE_SIZE:
-            raise ValueError(f"File too large! Maximum size is {MAX_STOCK_FILE_SIZE/1024:.0f}KB")
-            
-        file_ext = attachment.filename.split('.')[-1].lower()
-        if file_ext not in VALID_STOCK_FORMATS:
-            raise ValueError(f"Invalid file format! Supported formats: {', '.join(VALID_STOCK_FORMATS)}")
-            
-        content = await attachment.read()
-        text = content.decode('utf-8').strip()
-        
-        items = [line.strip() for line in text.split('\n') if line.strip()]
-        if not items:
-            raise ValueError("No valid items found in file!")
-            
-        return items
+    async def _track_progress(self, message, progress: dict):
+        """Edit a progress message at most once per PROGRESS_UPDATE_INTERVAL"""
+        last = None
+        while True:
+            await asyncio.sleep(PROGRESS_UPDATE_INTERVAL)
+            current = progress.get('processed', 0)
+            if current == last:
+                continue
+            last = current
+            total = progress.get('total')
+            text = f"⏳ Progress: {current}/{total} stock..." if total else f"⏳ Progress: {current} stock..."
+            try:
+                await message.edit(content=text)
+            except discord.HTTPException as e:
+                self.logger.warning(f"Failed to update progress message: {e}")
 
     async def _confirm_action(self, ctx, message: str, timeout: int = 30) -> bool:
         """Get confirmation for dangerous actions"""
@@ -125,15 +143,17 @@ class AdminCog(commands.Cog, name="Admin"):
                     "`resetuser <growid>`\nReset balance"
                 ],
                 "Transaction Management": [
-                    "`trxhistory <growid> [limit]`\nView transactions",
-                    "`stockhistory <code> [limit]`\nView stock history"
+                    "`trxhistory <growid> [per_page]`\nView transactions",
+                    "`stockhistory <code> [per_page]`\nView stock history"
                 ],
                 "System Management": [
                     "`systeminfo`\nShow bot system information",
+                    "`cmdstats [hours] [command]`\nCommand usage analytics",
+                    "`reloadconfig`\nReload config.json without restarting",
                     "`announcement <message>`\nSend announcement to all users",
                     "`maintenance <on/off>`\nToggle maintenance mode",
                     "`blacklist <add/remove> <growid>`\nManage blacklisted users",
-                    "`backup`\nCreate database backup"
+                    "`backup [create/list/verify] [name]`\nCreate, list or verify database backups"
                 ]
             }
 
@@ -196,7 +216,7 @@ class AdminCog(commands.Cog, name="Admin"):
     @commands.command(name="addstock")
     async def add_stock(self, ctx, code: str):
         """Add stock from file
-        Usage: !addstock <code> + file attachment
+        Usage: !addstock <code> + file attachment (.txt atau .txt.gz)
         File format: Satu stock per baris
         """
         if not await self._check_admin(ctx):
@@ -216,49 +236,38 @@ class AdminCog(commands.Cog, name="Admin"):
             
             # Proses file stock
             attachment = ctx.message.attachments[0]
-            
-            # Cek ukuran file
-            if attachment.size > 1024 * 1024:  # Max 1MB
-                await ctx.send("❌ File terlalu besar! Maksimal 1MB")
-                return
+            filename = attachment.filename.lower()
     
             # Cek ekstensi file
-            if not attachment.filename.endswith('.txt'):
-                await ctx.send("❌ File harus berformat .txt!")
+            if not filename.endswith(tuple(f".{ext}" for ext in VALID_STOCK_FORMATS)):
+                await ctx.send("❌ File harus berformat .txt atau .txt.gz!")
                 return
-    
-            # Baca konten file
-            content = await attachment.read()
-            text = content.decode('utf-8').strip()
             
-            # Split per baris dan bersihkan
-            items = [line.strip() for line in text.split('\n') if line.strip()]
+            # File besar atau terkompresi dibaca secara streaming per batch
+            streaming = filename.endswith('.gz') or attachment.size > MAX_STOCK_FILE_SIZE
             
-            if not items:
-                await ctx.send("❌ File kosong atau tidak ada stock valid!")
-                return
-    
-            # Progress message
-            progress_msg = await ctx.send(f"⏳ Menambahkan {len(items)} stock...")
+            # Progress message, diperbarui berkala dari counter import
+            progress = {'processed': 0, 'total': 0}
+            progress_msg = await ctx.send("⏳ Menambahkan stock...")
+            progress_task = asyncio.create_task(self._track_progress(progress_msg, progress))
+            report_file = tempfile.SpooledTemporaryFile(max_size=MAX_STOCK_FILE_SIZE, mode='w+', encoding='utf-8')
             
-            # Tambah stock dengan progress
-            added = 0
-            failed = 0
+            try:
+                if streaming:
+                    summary = await self._import_stock_stream(code, attachment, str(ctx.author.id), progress, report_file)
+                else:
+                    content = await attachment.read()
+                    lines = content.decode('utf-8').splitlines()
+                    report = await self.product_service.add_stock_bulk(code, lines, str(ctx.author.id), progress)
+                    summary = self._write_stock_report(report_file, report)
+            finally:
+                progress_task.cancel()
+                await progress_msg.delete()
             
-            for i, item in enumerate(items, 1):
-                try:
-                    await self.product_service.add_stock_item(code, item, str(ctx.author.id))
-                    added += 1
-                    
-                    # Update progress setiap 10 item
-                    if i % 10 == 0:
-                        await progress_msg.edit(content=f"⏳ Progress: {i}/{len(items)} stock...")
-                except Exception as e:
-                    self.logger.error(f"Failed to add stock item {item}: {e}")
-                    failed += 1
-    
-            # Hapus pesan progress
-            await progress_msg.delete()
+            if not summary['total']:
+                report_file.close()
+                await ctx.send("❌ File kosong atau tidak ada stock valid!")
+                return
             
             # Kirim hasil
             embed = discord.Embed(
@@ -267,16 +276,107 @@ class AdminCog(commands.Cog, name="Admin"):
                 timestamp=datetime.utcnow()
             )
             embed.add_field(name="Produk", value=f"{product['name']} ({code})", inline=False)
-            embed.add_field(name="Total Stock", value=len(items), inline=True)
-            embed.add_field(name="Berhasil", value=added, inline=True)
-            embed.add_field(name="Gagal", value=failed, inline=True)
+            embed.add_field(name="Total Stock", value=summary['total'], inline=True)
+            embed.add_field(name="Berhasil", value=summary['added'], inline=True)
+            embed.add_field(name="Duplikat", value=summary['duplicates'], inline=True)
+            embed.add_field(name="Gagal", value=summary['failed'], inline=True)
             
-            await ctx.send(embed=embed)
-            self.logger.info(f"Stock added for {code} by {ctx.author}: {added} success, {failed} failed")
+            # Laporan per baris untuk duplikat dan kegagalan
+            file = None
+            if summary['duplicates'] or summary['failed']:
+                report_file.seek(0)
+                file = discord.File(
+                    io.BytesIO(report_file.read().encode('utf-8')),
+                    filename=f"stock_report_{code}.txt"
+                )
+            report_file.close()
+            
+            await ctx.send(embed=embed, file=file)
+            self.logger.info(
+                f"Stock added for {code} by {ctx.author}: {summary['added']} success, "
+                f"{summary['duplicates']} duplicate, {summary['failed']} failed"
+            )
                 
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error adding stock: {e}")
+
+    def _write_stock_report(self, report_file, report: dict, summary: Optional[dict] = None) -> dict:
+        """Append per-line results of an import batch and fold its counts into summary"""
+        if summary is None:
+            summary = {'total': 0, 'added': 0, 'duplicates': 0, 'failed': 0}
+        for line_no, content in report['duplicates']:
+            report_file.write(f"Line {line_no}: DUPLICATE {content}\n")
+        for line_no, content, reason in report['failed']:
+            report_file.write(f"Line {line_no}: FAILED {content} ({reason})\n")
+        summary['total'] += report['total']
+        summary['added'] += report['added']
+        summary['duplicates'] += len(report['duplicates'])
+        summary['failed'] += len(report['failed'])
+        return summary
+
+    async def _import_stock_stream(self, code: str, attachment, added_by: str,
+                                   progress: dict, report_file) -> dict:
+        """Import a stock file batch by batch while it is being downloaded"""
+        summary = {'total': 0, 'added': 0, 'duplicates': 0, 'failed': 0}
+        batch = []
+        start_line = 1
+        
+        async def flush():
+            nonlocal batch, start_line
+            report = await self.product_service.add_stock_bulk(code, batch, added_by, start_line=start_line)
+            self._write_stock_report(report_file, report, summary)
+            start_line += len(batch)
+            progress['processed'] = start_line - 1
+            batch = []
+        
+        async for line in self._stream_stock_lines(attachment):
+            batch.append(line)
+            if len(batch) >= STOCK_STREAM_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+        
+        return summary
+
+    async def _stream_stock_lines(self, attachment):
+        """Yield lines of a .txt or .txt.gz attachment without holding the whole file"""
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if attachment.filename.lower().endswith('.gz') else None
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        received = 0
+        
+        def feed(data: bytes, final: bool = False) -> List[str]:
+            nonlocal pending, received
+            received += len(data)
+            if received > MAX_STOCK_STREAM_SIZE:
+                raise ValueError(f"File too large! Maximum size is {MAX_STOCK_STREAM_SIZE // (1024 * 1024)}MB")
+            pending += decoder.decode(data, final=final)
+            *lines, pending = pending.split('\n')
+            # Baris lengkap dalam satu chunk juga dicek, bukan hanya sisa yang belum selesai
+            if any(len(line) > MAX_STOCK_LINE_LENGTH for line in lines) or len(pending) > MAX_STOCK_LINE_LENGTH:
+                raise ValueError(f"Line too long! Maximum length is {MAX_STOCK_LINE_LENGTH} characters")
+            return lines
+        
+        # Session bersama milik bot, dibuat di setup_hook
+        async with self.bot.session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(STOCK_STREAM_CHUNK_SIZE):
+                if inflater is None:
+                    for line in feed(chunk):
+                        yield line
+                    continue
+                # Batasi output per langkah agar file gzip tidak meledak di memori
+                data = inflater.decompress(chunk, STOCK_STREAM_CHUNK_SIZE)
+                while data:
+                    for line in feed(data):
+                        yield line
+                    data = inflater.decompress(inflater.unconsumed_tail, STOCK_STREAM_CHUNK_SIZE)
+        
+        for line in feed(inflater.flush() if inflater else b'', final=True):
+            yield line
+        if pending:
+            yield pending
     
     @commands.command(name="addbal")
     async def add_balance(self, ctx, growid: str, amount: int):
@@ -319,35 +419,28 @@ class AdminCog(commands.Cog, name="Admin"):
             self.logger.error(f"Error adding balance: {e}")
     
     @commands.command(name="trxhistory")
-    async def transaction_history(self, ctx, growid: str, limit: int = 10):
-        """View transaction history for a user
-        Usage: !trxhistory <growid> [limit]
+    async def transaction_history(self, ctx, growid: str, per_page: int = DEFAULT_PAGE_SIZE):
+        """View transaction history for a user, page by page
+        Usage: !trxhistory <growid> [per_page]
         Example: !trxhistory STEVE 5
         """
         if not await self._check_admin(ctx):
             return
     
-        try:
-            # Gunakan get_transaction_history dari trx_manager
-            transactions = await self.trx_manager.get_transaction_history(growid, limit)
-            if not transactions:
-                await ctx.send(f"❌ No transactions found for {growid}")
-                return
-    
+        def render(page, number: int) -> discord.Embed:
             embed = discord.Embed(
                 title=f"📜 Transaction History - {growid}",
                 color=discord.Color.blue(),
                 timestamp=datetime.utcnow()
             )
-    
-            for trx in transactions:
+            for trx in page.items:
                 value = (
                     f"Type: {trx['type']}\n"
                     f"Details: {trx['details']}\n"
                     f"Old Balance: {trx['old_balance']}\n"
                     f"New Balance: {trx['new_balance']}\n"
                     f"Items: {trx['items_count']}\n"
-                    f"Price: {trx['total_price']:,} WL\n"
+                    f"Price: {trx['total_price'] or 0:,} WL\n"
                     f"Date: {trx['created_at']}"
                 )
                 embed.add_field(
@@ -355,13 +448,63 @@ class AdminCog(commands.Cog, name="Admin"):
                     value=value, 
                     inline=False
                 )
-    
-            embed.set_footer(text=f"Showing last {len(transactions)} transactions")
-            await ctx.send(embed=embed)
+            embed.set_footer(text=f"Page {number}" + ("" if page.next_cursor else " (last)"))
+            return embed
+
+        try:
+            view = PaginatedView(
+                ctx.author.id,
+                lambda cursor: self.trx_manager.get_transaction_history(growid, per_page, cursor),
+                render
+            )
+            if not await view.start(ctx):
+                await ctx.send(f"❌ No transactions found for {growid}")
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error getting transaction history: {e}")
+
+    @commands.command(name="stockhistory")
+    async def stock_history(self, ctx, code: str, per_page: int = DEFAULT_PAGE_SIZE):
+        """View stock rows of a product, newest first
+        Usage: !stockhistory <code> [per_page]
+        Example: !stockhistory DL1 10
+        """
+        if not await self._check_admin(ctx):
+            return
+
+        def render(page, number: int) -> discord.Embed:
+            embed = discord.Embed(
+                title=f"📦 Stock History - {code}",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            for item in page.items:
+                content = item['content'] if len(item['content']) <= 50 else item['content'][:47] + "..."
+                embed.add_field(
+                    name=f"Stock #{item['id']} · {item['status']}",
+                    value=(
+                        f"Content: `{content}`\n"
+                        f"Buyer: {item['buyer_id'] or '-'}\n"
+                        f"Added: {item['added_at']}"
+                    ),
+                    inline=False
+                )
+            embed.set_footer(text=f"Page {number}" + ("" if page.next_cursor else " (last)"))
+            return embed
+
+        try:
+            view = PaginatedView(
+                ctx.author.id,
+                lambda cursor: self.product_service.get_stock_history(code, per_page, cursor),
+                render
+            )
+            if not await view.start(ctx):
+                await ctx.send(f"❌ No stock found for {code}")
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error getting stock history: {e}")
     
     @commands.command(name='reducestock')
     async def reduce_stock(self, ctx, code: str, count: int):
@@ -529,7 +672,7 @@ class AdminCog(commands.Cog, name="Admin"):
     
             # Balance info
             balance_text = balance.format()  # Use format() from Balance class
-            total_wls = (balance.wl + (balance.dl * 100) + (balance.bgl * 10000))
+            total_wls = balance.total_wls
             embed.add_field(
                 name="Balance", 
                 value=f"{balance_text}\nTotal: {total_wls:,} WL", 
@@ -537,7 +680,7 @@ class AdminCog(commands.Cog, name="Admin"):
             )
     
             # Get transaction history using TransactionManager
-            transactions = await self.trx_manager.get_transaction_history(growid, 5)
+            transactions = (await self.trx_manager.get_transaction_history(growid, 5)).items
             if transactions:
                 trx_text = []
                 for trx in transactions:
@@ -695,6 +838,21 @@ class AdminCog(commands.Cog, name="Admin"):
         
 
         
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Resume broadcasts interrupted by a restart"""
+        try:
+            await self.broadcast.resume()
+        except Exception as e:
+            self.logger.error(f"Error resuming broadcasts: {e}")
+
+    async def cog_load(self):
+        self.scheduled_backup.start()
+
+    async def cog_unload(self):
+        self.scheduled_backup.cancel()
+        await self.broadcast.stop()
+
     @commands.command(name="systeminfo")
     async def system_info(self, ctx):
         """Show bot system information"""
@@ -734,12 +892,136 @@ class AdminCog(commands.Cog, name="Admin"):
             )
             embed.add_field(name="🤖 Bot", value=bot_stats, inline=False)
             
+            # Database Pool Stats
+            pool_stats = get_pool().get_stats()
+            writer_stats = get_db().get_writer_stats()
+            db_stats = (
+                f"Connections: {pool_stats['in_use']} in use / {pool_stats['open']} open (max {pool_stats['size']})\n"
+                f"Hit Rate: {pool_stats['hit_rate']:.1%} ({pool_stats['checkouts']:,} checkouts)\n"
+                f"Checkout: avg {pool_stats['avg_checkout_ms']:.2f}ms, max {pool_stats['max_checkout_ms']:.2f}ms\n"
+                f"Waits/Timeouts: {pool_stats['waits']}/{pool_stats['timeouts']}\n"
+                f"Writes: {writer_stats['jobs']:,} in {writer_stats['batches']:,} commits "
+                f"(avg batch {writer_stats['avg_batch_size']:.1f}, queued {writer_stats['queue_depth']})"
+            )
+            embed.add_field(name="🗄️ Database", value=db_stats, inline=False)
+            
+            # Balance Cache Stats
+            cache_stats = get_balance_cache().get_stats()
+            embed.add_field(
+                name="💰 Balance Cache",
+                value=(
+                    f"Entries: {cache_stats['size']:,} / {get_balance_cache().max_size:,}\n"
+                    f"Hit Rate: {cache_stats['hit_rate']:.1%} ({cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses)\n"
+                    f"Stale Reads Rejected: {cache_stats['stale']:,}, Evicted: {cache_stats['evicted']:,}, Expired: {cache_stats['expired']:,}"
+                ),
+                inline=False
+            )
+            
+            # Service Lock Stats
+            lock_stats = "\n".join(
+                f"{name.title()}: {stats['holders']} held, {stats['waiting']} waiting, "
+                f"{stats['contention_rate']:.1%} contended (wait avg {stats['avg_wait_ms']:.0f}ms, max {stats['max_wait_ms']:.0f}ms)"
+                for name, stats in get_lock_stats().items()
+            )
+            if lock_stats:
+                embed.add_field(name="🔒 Service Locks", value=lock_stats, inline=False)
+            
+            # Outbound Message Stats
+            scheduler_stats = self.scheduler.get_stats()
+            msg_stats = "\n".join(
+                f"{name.title()}: {lane['depth']} queued, {lane['sent']:,} sent, {lane['failed']} failed, "
+                f"{lane['coalesced']} coalesced (wait avg {lane['avg_wait_ms']:.0f}ms, max {lane['max_wait_ms']:.0f}ms)"
+                for name, lane in scheduler_stats['lanes'].items()
+            )
+            if getattr(self.bot, '_command_handler_ready', False):
+                log_stats = self.bot.command_handler.log_shipper.get_stats()
+                msg_stats += (
+                    f"\nCommand logs: {log_stats['shipped']:,} shipped in {log_stats['digests']:,} digests, "
+                    f"{log_stats['buffered']} buffered, {log_stats['dropped']:,} dropped"
+                )
+            embed.add_field(name="📨 Outbound Messages", value=msg_stats, inline=False)
+            
             await ctx.send(embed=embed)
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error getting system info: {e}")
 
+    @commands.command(name="reloadconfig")
+    async def reload_config(self, ctx):
+        """Reload config.json now instead of waiting for the file watcher"""
+        if not await self._check_admin(ctx):
+            return
+
+        service = ConfigService()
+        before = service.config
+        changed = await service.reload()
+        if service.config is before:
+            await ctx.send("❌ config.json is invalid, current config kept. Check the logs for details.")
+        elif not changed:
+            await ctx.send("✅ config.json reloaded, nothing changed.")
+        else:
+            await ctx.send(f"✅ config.json reloaded. Changed: {', '.join(changed)}")
+
+    @commands.command(name="cmdstats")
+    async def command_stats(self, ctx, hours: int = 24, command: Optional[str] = None):
+        """Show command usage over the last hours"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            analytics = self.bot.command_handler.analytics
+            # Di loop bot, jadi aman mem-flush dulu agar angka terbaru ikut
+            await analytics.flush()
+            usage = await analytics.get_usage(hours, command)
+
+            embed = discord.Embed(
+                title=f"📊 Command Usage ({command or 'all commands'}, last {hours}h)",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            if not usage:
+                embed.description = "No commands recorded in this period."
+            for item in usage[:15]:
+                embed.add_field(
+                    name=item['command'],
+                    value=(
+                        f"Uses: {item['uses']:,}\n"
+                        f"Errors: {item['errors']:,}\n"
+                        f"Users: ~{item['unique_users']:,}"
+                    ),
+                    inline=True
+                )
+
+            if command:
+                timeline = await analytics.get_timeline(hours, command)
+                if timeline:
+                    embed.add_field(
+                        name="Per Hour (UTC)",
+                        value="\n".join(
+                            f"`{row['hour'][5:13]}h` {row['uses']:,} uses, {row['errors']} errors"
+                            for row in timeline[-12:]
+                        ),
+                        inline=False
+                    )
+
+            recent = [e for e in analytics.recent_errors if not command or e['command'] == command][-5:]
+            if recent:
+                embed.add_field(
+                    name="Recent Errors",
+                    value="\n".join(
+                        f"`{e['time'].strftime('%m-%d %H:%M')}` {e['command']}: {e['type']} - {e['error'][:80]}"
+                        for e in reversed(recent)
+                    ),
+                    inline=False
+                )
+
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error getting command stats: {e}")
+
     @commands.command(name="announcement")
     async def announcement(self, ctx, *, message: str):
         """Send announcement to all users"""
@@ -752,15 +1034,7 @@ class AdminCog(commands.Cog, name="Admin"):
                 return
 
             # Get all users from database
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT DISTINCT discord_id FROM user_growid")
-                users = cursor.fetchall()
-            finally:
-                if conn:
-                    conn.close()
+            users = await get_db().fetchall("SELECT DISTINCT discord_id FROM user_growid")
 
             embed = discord.Embed(
                 title="📢 Announcement",
@@ -770,35 +1044,15 @@ class AdminCog(commands.Cog, name="Admin"):
             )
             embed.set_footer(text=f"Sent by {ctx.author}")
 
-            sent_count = 0
-            failed_count = 0
-
+            # Pengiriman berjalan di background dan dilanjutkan setelah restart
             progress_msg = await ctx.send("⏳ Sending announcement...")
-
-            for user_data in users:
-                try:
-                    user = await self.bot.fetch_user(int(user_data['discord_id']))
-                    if user:
-                        await user.send(embed=embed)
-                        sent_count += 1
-                        if sent_count % 10 == 0:
-                            await progress_msg.edit(content=f"⏳ Sending... ({sent_count}/{len(users)})")
-                except:
-                    failed_count += 1
-
-            await progress_msg.delete()
-            
-            result_embed = discord.Embed(
-                title="✅ Announcement Sent",
-                color=discord.Color.green(),
-                timestamp=datetime.utcnow()
+            await self.broadcast.create(
+                'announcement',
+                {'embed': embed.to_dict()},
+                [int(user['discord_id']) for user in users if str(user['discord_id']).isdigit()],
+                str(ctx.author),
+                progress_msg
             )
-            result_embed.add_field(name="Total Users", value=len(users), inline=True)
-            result_embed.add_field(name="Sent Successfully", value=sent_count, inline=True)
-            result_embed.add_field(name="Failed", value=failed_count, inline=True)
-            
-            await ctx.send(embed=result_embed)
-            self.logger.info(f"Announcement sent by {ctx.author}: {sent_count} success, {failed_count} failed")
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -817,18 +1071,10 @@ class AdminCog(commands.Cog, name="Admin"):
                 return
 
             # Update maintenance status in database
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
-                    ("maintenance_mode", "1" if mode == "on" else "0")
-                )
-                conn.commit()
-            finally:
-                if conn:
-                    conn.close()
+            await get_db().execute(
+                "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
+                ("maintenance_mode", "1" if mode == "on" else "0")
+            )
 
             embed = discord.Embed(
                 title="🔧 Maintenance Mode",
@@ -843,17 +1089,25 @@ class AdminCog(commands.Cog, name="Admin"):
 
             if mode == "on":
                 # Notify all online users
-                for guild in self.bot.guilds:
-                    for member in guild.members:
-                        if not member.bot and member.status != discord.Status.offline:
-                            try:
-                                await member.send(
-                                    "⚠️ The bot is entering maintenance mode. "
-                                    "Some features may be unavailable. "
-                                    "We'll notify you when service is restored."
-                                )
-                            except:
-                                continue
+                recipients = {
+                    member.id
+                    for guild in self.bot.guilds
+                    for member in guild.members
+                    if not member.bot and member.status != discord.Status.offline
+                }
+                if recipients:
+                    progress_msg = await ctx.send("⏳ Notifying online members...")
+                    await self.broadcast.create(
+                        'maintenance notice',
+                        {'content': (
+                            "⚠️ The bot is entering maintenance mode. "
+                            "Some features may be unavailable. "
+                            "We'll notify you when service is restored."
+                        )},
+                        recipients,
+                        str(ctx.author),
+                        progress_msg
+                    )
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -871,86 +1125,115 @@ class AdminCog(commands.Cog, name="Admin"):
                 await ctx.send("❌ Please specify 'add' or 'remove'")
                 return
 
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                if action == "add":
-                    # Check if user exists
-                    cursor.execute("SELECT growid FROM users WHERE growid = ?", (growid,))  # Removed ()
-                    if not cursor.fetchone():
-                        await ctx.send(f"❌ User {growid} not found!")
-                        return
-
-                    # Add to blacklist
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO blacklist (growid, added_by, added_at) VALUES (?, ?, ?)",
-                        (growid, str(ctx.author.id), datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))  # Removed ()
-                    )
-                else:
-                    # Remove from blacklist
-                    cursor.execute(
-                        "DELETE FROM blacklist WHERE growid = ?",
-                        (growid,)  # Removed ()
-                    )
-
-                conn.commit()
+            db = get_db()
+            if action == "add":
+                # Check if user exists
+                if not await db.fetchone("SELECT growid FROM users WHERE growid = ?", (growid,)):  # Removed ()
+                    await ctx.send(f"❌ User {growid} not found!")
+                    return
 
-                embed = discord.Embed(
-                    title="⛔ Blacklist Updated",
-                    description=f"User {growid} has been {'added to' if action == 'add' else 'removed from'} the blacklist.",  # Removed ()
-                    color=discord.Color.red() if action == 'add' else discord.Color.green(),
-                    timestamp=datetime.utcnow()
+                # Add to blacklist
+                await db.execute(
+                    "INSERT OR REPLACE INTO blacklist (growid, added_by, added_at) VALUES (?, ?, ?)",
+                    (growid, str(ctx.author.id), datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))  # Removed ()
                 )
-                embed.set_footer(text=f"Updated by {ctx.author}")
-                
-                await ctx.send(embed=embed)
-                self.logger.info(f"User {growid} {action}ed to blacklist by {ctx.author}")
-                
-            finally:
-                if conn:
-                    conn.close()
+            else:
+                # Remove from blacklist
+                await db.execute(
+                    "DELETE FROM blacklist WHERE growid = ?",
+                    (growid,)  # Removed ()
+                )
+
+            embed = discord.Embed(
+                title="⛔ Blacklist Updated",
+                description=f"User {growid} has been {'added to' if action == 'add' else 'removed from'} the blacklist.",  # Removed ()
+                color=discord.Color.red() if action == 'add' else discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+            embed.set_footer(text=f"Updated by {ctx.author}")
+            
+            await ctx.send(embed=embed)
+            self.logger.info(f"User {growid} {action}ed to blacklist by {ctx.author}")
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error updating blacklist: {e}")
 
+    async def _create_backup(self) -> dict:
+        """Back up and prune in a worker thread; one backup at a time"""
+        async with self._backup_lock:
+            result = await asyncio.to_thread(create_backup)
+            await asyncio.to_thread(prune_backups)
+            return result
+
+    @tasks.loop(hours=BACKUP_INTERVAL_HOURS)
+    async def scheduled_backup(self):
+        try:
+            await self._create_backup()
+        except Exception as e:
+            self.logger.error(f"Scheduled backup failed: {e}")
+
+    @scheduled_backup.before_loop
+    async def before_scheduled_backup(self):
+        await self.bot.wait_until_ready()
+
     @commands.command(name="backup")
-    async def backup(self, ctx):
-        """Create database backup"""
+    async def backup(self, ctx, action: str = "create", name: Optional[str] = None):
+        """Create, list or verify database backups"""
         if not await self._check_admin(ctx):
             return
 
         try:
-            # Create backup filename with timestamp
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"backup_{timestamp}.db"
-            
-            # Create backup
-            conn = None
-            try:
-                conn = get_connection()
-                # Create backup in memory
-                backup_data = io.BytesIO()
-                for line in conn.iterdump():
-                    backup_data.write(f'{line}\n'.encode('utf-8'))
-                backup_data.seek(0)
-                
-                # Send backup file
-                await ctx.send(
-                    "✅ Database backup created!",
-                    file=discord.File(backup_data, filename=backup_filename)
+            action = action.lower()
+            if action == "list":
+                backups = await asyncio.to_thread(list_backups)
+                lines = [f"`{os.path.basename(path)}` ({os.path.getsize(path) / 1024 / 1024:.1f}MB)" for path in backups]
+                await ctx.send("📦 Backups:\n" + "\n".join(lines) if lines else "❌ No backups found")
+                return
+
+            if action == "verify":
+                result = await asyncio.to_thread(lambda: verify_backup(resolve_backup(name)))
+                embed = discord.Embed(
+                    title=f"{'✅' if result['ok'] else '❌'} Backup {result['name']}",
+                    color=discord.Color.green() if result['ok'] else discord.Color.red(),
+                    timestamp=datetime.utcnow()
                 )
-                self.logger.info(f"Database backup created by {ctx.author}")
-                
-            finally:
-                if conn:
-                    conn.close()
-            
+                embed.add_field(name="Integrity", value="\n".join(result['integrity']), inline=False)
+                embed.add_field(name="Schema Version", value=result['schema_version'], inline=True)
+                embed.add_field(
+                    name="Rows",
+                    value="\n".join(f"{table}: {count:,}" for table, count in result['counts'].items()),
+                    inline=True
+                )
+                await ctx.send(embed=embed)
+                return
+
+            if action != "create":
+                await ctx.send("❌ Please specify 'create', 'list' or 'verify'")
+                return
+
+            progress_msg = await ctx.send("⏳ Creating backup...")
+            result = await self._create_backup()
+            await progress_msg.edit(content=(
+                f"✅ Database backup `{result['name']}` created: "
+                f"{result['db_size'] / 1024 / 1024:.1f}MB -> {result['size'] / 1024 / 1024:.1f}MB "
+                f"in {result['elapsed']:.1f}s"
+            ))
+
+            # Dipecah sesuai batas lampiran guild; gabungkan lagi dengan `cat name.part* > name`
+            limit = ctx.guild.filesize_limit if ctx.guild else 8 * 1024 * 1024
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                parts = await asyncio.to_thread(split_backup, result['path'], limit - 64 * 1024, tmp_dir)
+                for i, part in enumerate(parts, 1):
+                    await ctx.send(
+                        f"📦 Part {i}/{len(parts)}" if len(parts) > 1 else "📦 Backup file",
+                        file=discord.File(part, filename=os.path.basename(part) if len(parts) > 1 else result['name'])
+                    )
+            self.logger.info(f"Database backup {result['name']} created by {ctx.author} ({len(parts)} parts)")
+
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
-            self.logger.error(f"Error creating backup: {e}")
+            self.logger.error(f"Error in backup command: {e}")
 
 async def setup(bot):
     """Setup the Admin cog"""
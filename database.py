@@ -1,16 +1,40 @@
 import sqlite3
 import logging
+import asyncio
+import queue
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
+
+from migrations import MIGRATIONS
 
 logger = logging.getLogger(__name__)
 
+DB_FILE = 'shop.db'
+DEFAULT_POOL_SIZE = 5
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+POOL_CHECKOUT_TIMEOUT = 10  # seconds to wait for a free connection
+HEALTH_CHECK_INTERVAL = 30  # seconds a connection may sit idle before it is re-checked
+WRITE_BATCH_SIZE = 64  # max queued mutations folded into one transaction
+WRITE_BATCH_WINDOW = 0.002  # seconds the writer waits for more work before committing
+
 def get_connection(max_retries: int = 3, timeout: int = 5) -> sqlite3.Connection:
-    """Get SQLite database connection with retry mechanism"""
+    """Open a new SQLite database connection with retry mechanism.
+
+    Service code should borrow pooled connections through db_connection();
+    this is kept for one-off maintenance work (setup, verification, backups).
+    """
     for attempt in range(max_retries):
         try:
-            conn = sqlite3.connect('shop.db', timeout=timeout)
+            conn = sqlite3.connect(
+                DB_FILE,
+                timeout=timeout,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
             conn.row_factory = sqlite3.Row
             
             # Enable foreign keys and set pragmas
@@ -27,248 +51,523 @@ def get_connection(max_retries: int = 3, timeout: int = 5) -> sqlite3.Connection
             logger.warning(f"Database connection attempt {attempt + 1} failed, retrying... Error: {e}")
             time.sleep(0.1 * (attempt + 1))
 
-def setup_database():
-    """Initialize database tables"""
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Create users table first (parent table)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                growid TEXT PRIMARY KEY,
-                balance_wl INTEGER DEFAULT 0,
-                balance_dl INTEGER DEFAULT 0,
-                balance_bgl INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Create user_discord mapping table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_growid (
-                discord_id TEXT PRIMARY KEY,
-                growid TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
-            )
-        """)
-
-        # Create products table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                code TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                price INTEGER NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Create stock table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_code TEXT NOT NULL,
-                content TEXT NOT NULL UNIQUE,
-                status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
-                added_by TEXT NOT NULL,
-                buyer_id TEXT,
-                seller_id TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
-            )
-        """)
-
-        # Create transactions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                growid TEXT NOT NULL,
-                type TEXT NOT NULL,
-                details TEXT NOT NULL,
-                old_balance TEXT,
-                new_balance TEXT,
-                items_count INTEGER DEFAULT 0,
-                total_price INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
-            )
-        """)
-
-        # Create world_info table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS world_info (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                world TEXT NOT NULL,
-                owner TEXT NOT NULL,
-                bot TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Create bot_settings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bot_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to ``size`` and handed out one holder at a
+    time, so the connect + PRAGMA cost is paid once per connection instead of
+    once per query, and each connection's prepared statement cache stays warm.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, checkout_timeout: float = POOL_CHECKOUT_TIMEOUT):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'checkout_time_total': 0.0,
+            'checkout_time_max': 0.0
+        }
+
+    def _try_create(self) -> Optional[sqlite3.Connection]:
+        """Open a new connection if the pool still has room"""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return get_connection()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
 
-        # Create blacklist table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS blacklist (
-                growid TEXT PRIMARY KEY,
-                added_by TEXT NOT NULL,
-                reason TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
-            )
-        """)
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats['discarded'] += 1
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, waiting up to checkout_timeout if the pool is exhausted"""
+        if self._closed:
+            raise sqlite3.OperationalError("Connection pool is closed")
+
+        start = time.perf_counter()
+        deadline = start + self.checkout_timeout
+        reused = True
+        waited = False
+
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._try_create()
+                if conn is not None:
+                    reused = False
+                    break
+
+                waited = True
+                remaining = deadline - time.perf_counter()
+                try:
+                    conn, last_used = self._idle.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out after {self.checkout_timeout}s waiting for a database connection"
+                    )
+
+            # Connections that sat idle for a while get a cheap liveness probe
+            if time.monotonic() - last_used > HEALTH_CHECK_INTERVAL and not self._is_healthy(conn):
+                logger.warning("Discarding unhealthy pooled database connection")
+                self._discard(conn)
+                continue
+            break
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['hits' if reused else 'misses'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['checkout_time_total'] += elapsed
+            self._stats['checkout_time_max'] = max(self._stats['checkout_time_max'], elapsed)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        if self._closed:
+            self._discard(conn)
+            return
 
-        # Create admin_logs table (NEW)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                admin_id TEXT NOT NULL,
-                action TEXT NOT NULL,
-                target TEXT,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding pooled connection that failed to roll back: {e}")
+            self._discard(conn)
+            return
 
-        # Create role_permissions table (NEW)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS role_permissions (
-                role_id TEXT PRIMARY KEY,
-                permissions TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        self._idle.put((conn, time.monotonic()))
 
-        # Create user_activity table (NEW)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_activity (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                discord_id TEXT NOT NULL,
-                activity_type TEXT NOT NULL,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (discord_id) REFERENCES user_growid(discord_id)
-            )
-        """)
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block.
 
-        # Create cache_table (NEW)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache_table (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        Exceptions roll back the open transaction; callers still commit
+        explicitly, as with a plain sqlite3 connection.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self.release(conn)
+
+    def health_check(self) -> Dict:
+        """Probe every idle connection and drop the ones that no longer respond"""
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        healthy = 0
+        replaced = 0
+        for conn, last_used in checked:
+            if self._is_healthy(conn):
+                healthy += 1
+                self._idle.put((conn, last_used))
+            else:
+                replaced += 1
+                self._discard(conn)
+
+        return {'healthy': healthy, 'discarded': replaced}
+
+    def get_stats(self) -> Dict:
+        """Pool usage metrics (checkout latency in milliseconds)"""
+        with self._lock:
+            stats = dict(self._stats)
+            created = self._created
+
+        checkouts = stats['checkouts']
+        idle = self._idle.qsize()
+        return {
+            'size': self.size,
+            'open': created,
+            'idle': idle,
+            'in_use': created - idle,
+            'checkouts': checkouts,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / checkouts if checkouts else 0.0,
+            'waits': stats['waits'],
+            'timeouts': stats['timeouts'],
+            'discarded': stats['discarded'],
+            'avg_checkout_ms': (stats['checkout_time_total'] / checkouts * 1000) if checkouts else 0.0,
+            'max_checkout_ms': stats['checkout_time_max'] * 1000
+        }
+
+    def close(self):
+        """Close all idle connections; connections still in use are closed on release"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+class WriteQueue:
+    """Single writer thread that group-commits queued mutations.
+
+    Every write in the process goes through this queue, so mutations from
+    different services are applied one at a time in submission order and
+    never race each other for the SQLite write lock. Pending jobs are
+    collected into a batch and run inside one BEGIN IMMEDIATE ... COMMIT,
+    each wrapped in its own SAVEPOINT so a failing job is rolled back on its
+    own without affecting the rest of the batch. Results are only handed
+    back once the batch has been committed.
+    """
+
+    def __init__(self, max_batch: int = WRITE_BATCH_SIZE, batch_window: float = WRITE_BATCH_WINDOW):
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stopping = False
+        self._stats = {
+            'jobs': 0,
+            'failed_jobs': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'max_batch_seen': 0
+        }
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, args: tuple = ()) -> Future:
+        """Queue fn(conn, *args) and return a future for its result"""
+        if self._stopping:
+            raise sqlite3.OperationalError("Write queue is closed")
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def _collect(self) -> list:
+        """Block for the first job, then gather whatever arrives within the batch window"""
+        batch = []
+        item = self._queue.get()
+        if item is None:
+            self._stopping = True
+            return batch
+        batch.append(item)
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._commit_batch(batch)
+            if self._stopping and self._queue.empty():
+                break
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _commit_batch(self, batch: list):
+        outcomes = []
+        try:
+            if self._conn is None:
+                self._conn = get_connection()
+            conn = self._conn
+
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    outcomes.append(None)
+                    continue
+
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    result = fn(conn, *args)
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((True, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((False, e))
+            conn.commit()
+
+        except Exception as e:
+            # Nothing in this batch was applied; fail every job that is still waiting
+            logger.error(f"Write batch of {len(batch)} failed: {e}")
+            try:
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+            except sqlite3.Error:
+                self._conn = None
+            self._stats['batches'] += 1
+            self._stats['failed_batches'] += 1
+            self._stats['jobs'] += len(batch)
+            self._stats['failed_jobs'] += len(batch)
+            for _, _, future in batch:
+                # Job yang belum dimulai (BEGIN gagal, atau antre setelah statement gagal) juga harus selesai
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+
+        self._stats['batches'] += 1
+        self._stats['jobs'] += len(batch)
+        self._stats['max_batch_seen'] = max(self._stats['max_batch_seen'], len(batch))
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                self._stats['failed_jobs'] += 1
+                future.set_exception(value)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_batch_size'] = stats['jobs'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def close(self):
+        """Finish queued work, then stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._stopping = True
+
+class AsyncDatabase:
+    """Async facade that keeps blocking SQLite work off the event loop.
+
+    Reads run on a small thread pool backed by the connection pool. Writes go
+    through the single-writer WriteQueue, so writers never fight each other
+    for the SQLite write lock and a busy_timeout wait only ever blocks that
+    thread.
+
+    Work is passed in as a plain function taking the connection as its first
+    argument. Write functions must not commit or roll back: the queue owns
+    the transaction and may share it with other writes in the same batch.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+        self._readers = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="db-reader")
+        self._writer = WriteQueue()
+
+    def _run_read(self, fn: Callable, args: tuple):
+        with self._pool.connection() as conn:
+            return fn(conn, *args)
+
+    async def read(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) on a reader thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn, args)
+
+    async def write(self, fn: Callable, *args) -> Any:
+        """Queue fn(conn, *args) on the writer; returns once its batch is committed"""
+        return await asyncio.wrap_future(self._writer.submit(fn, args))
+
+    async def fetchone(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(query, params).fetchone())
+
+    async def fetchall(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(query, params).fetchall())
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        """Run a single write statement and return the affected row count"""
+        return await self.write(lambda conn: conn.execute(query, params).rowcount)
+
+    def get_writer_stats(self) -> Dict:
+        return self._writer.get_stats()
+
+    def close(self):
+        self._readers.shutdown(wait=True)
+        self._writer.close()
+
+_pool: Optional[ConnectionPool] = None
+_db: Optional[AsyncDatabase] = None
+_pool_lock = threading.Lock()
+
+def init_pool(size: int = DEFAULT_POOL_SIZE) -> ConnectionPool:
+    """Create (or replace) the shared connection pool and async facade"""
+    global _pool, _db
+    with _pool_lock:
+        if _db is not None:
+            _db.close()
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(size=size)
+        _db = AsyncDatabase(_pool)
+        logger.info(f"Database connection pool initialized (size={size})")
+        return _pool
+
+def get_pool() -> ConnectionPool:
+    """Get the shared connection pool, creating it with defaults on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def get_db() -> AsyncDatabase:
+    """Get the shared async database facade"""
+    global _db
+    if _db is None:
+        pool = get_pool()
+        with _pool_lock:
+            if _db is None:
+                _db = AsyncDatabase(pool)
+    return _db
+
+def db_connection():
+    """Context manager that borrows a connection from the shared pool"""
+    return get_pool().connection()
+
+def close_pool():
+    """Shut down the async facade and close the shared connection pool"""
+    global _pool, _db
+    with _pool_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def _applied_migrations(conn) -> set:
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not cursor.fetchone():
+        return set()
+    return {row['version'] for row in conn.execute("SELECT version FROM schema_version")}
+
+def _apply_migration(conn, migration):
+    started = time.monotonic()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        while migration.apply(conn) and migration.online:
+            pass
+        conn.execute(
+            "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+            (migration.version, migration.name)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Applied migration {migration.version} ({migration.name}) in {(time.monotonic() - started) * 1000:.0f}ms")
 
-        # Create triggers
-        triggers = [
-            ("""
-            CREATE TRIGGER IF NOT EXISTS update_users_timestamp 
-            AFTER UPDATE ON users
-            BEGIN
-                UPDATE users SET updated_at = CURRENT_TIMESTAMP
-                WHERE growid = NEW.growid;
-            END;
-            """),
-            ("""
-            CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
-            AFTER UPDATE ON products
-            BEGIN
-                UPDATE products SET updated_at = CURRENT_TIMESTAMP
-                WHERE code = NEW.code;
-            END;
-            """),
-            ("""
-            CREATE TRIGGER IF NOT EXISTS update_stock_timestamp 
-            AFTER UPDATE ON stock
-            BEGIN
-                UPDATE stock SET updated_at = CURRENT_TIMESTAMP
-                WHERE id = NEW.id;
-            END;
-            """),
-            ("""
-            CREATE TRIGGER IF NOT EXISTS update_bot_settings_timestamp 
-            AFTER UPDATE ON bot_settings
-            BEGIN
-                UPDATE bot_settings SET updated_at = CURRENT_TIMESTAMP
-                WHERE key = NEW.key;
-            END;
-            """),
-            # New trigger for role_permissions
-            ("""
-            CREATE TRIGGER IF NOT EXISTS update_role_permissions_timestamp 
-            AFTER UPDATE ON role_permissions
-            BEGIN
-                UPDATE role_permissions SET updated_at = CURRENT_TIMESTAMP
-                WHERE role_id = NEW.role_id;
-            END;
-            """)
-        ]
+def setup_database(include_online: bool = False):
+    """Bring the schema up to date by applying pending migrations.
 
-        for trigger in triggers:
-            cursor.execute(trigger)
-
-        # Create indexes
-        indexes = [
-            ("idx_user_growid_discord", "user_growid(discord_id)"),
-            ("idx_user_growid_growid", "user_growid(growid)"),
-            ("idx_stock_product_code", "stock(product_code)"),
-            ("idx_stock_status", "stock(status)"),
-            ("idx_stock_content", "stock(content)"),
-            ("idx_transactions_growid", "transactions(growid)"),
-            ("idx_transactions_created", "transactions(created_at)"),
-            ("idx_blacklist_growid", "blacklist(growid)"),
-            # New indexes
-            ("idx_admin_logs_admin", "admin_logs(admin_id)"),
-            ("idx_admin_logs_created", "admin_logs(created_at)"),
-            ("idx_user_activity_discord", "user_activity(discord_id)"),
-            ("idx_user_activity_type", "user_activity(activity_type)"),
-            ("idx_role_permissions_role", "role_permissions(role_id)"),
-            ("idx_cache_expires", "cache_table(expires_at)")
+    A restart with nothing new to apply costs one read of schema_version
+    and runs no DDL. Online migrations are left to run_online_migrations()
+    unless include_online is set (tooling and scratch databases).
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        applied = _applied_migrations(conn)
+        pending = [
+            m for m in MIGRATIONS
+            if m.version not in applied and (include_online or not m.online)
         ]
+        if not pending:
+            logger.info(f"Database schema is current (version {max(applied, default=0)})")
+            return
 
-        for idx_name, idx_cols in indexes:
-            cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_cols}")
-
-        # Insert default world info if not exists
-        cursor.execute("""
-            INSERT OR IGNORE INTO world_info (id, world, owner, bot)
-            VALUES (1, 'YOURWORLD', 'OWNER', 'BOT')
-        """)
-
-        # Insert default role permissions if not exists
-        cursor.execute("""
-            INSERT OR IGNORE INTO role_permissions (role_id, permissions)
-            VALUES ('admin', 'all')
-        """)
-
-        conn.commit()
+        for migration in pending:
+            _apply_migration(conn, migration)
         logger.info("Database setup completed successfully")
 
     except sqlite3.Error as e:
         logger.error(f"Database setup error: {e}")
-        if conn:
-            conn.rollback()
         raise
     finally:
         if conn:
             conn.close()
 
+async def run_online_migrations():
+    """Apply pending online migrations through the write queue, oldest first.
+
+    Stops at the first failure; the remaining migrations are retried on the
+    next start.
+    """
+    db = get_db()
+    applied = await db.read(_applied_migrations)
+    for migration in MIGRATIONS:
+        if not migration.online or migration.version in applied:
+            continue
+        started = time.monotonic()
+        try:
+            while await db.write(migration.apply):
+                pass
+            await db.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (migration.version, migration.name)
+            )
+        except Exception as e:
+            logger.error(f"Online migration {migration.version} ({migration.name}) failed: {e}")
+            return
+        logger.info(f"Applied online migration {migration.version} ({migration.name}) in {(time.monotonic() - started) * 1000:.0f}ms")
+
 def verify_database():
     """Verify database integrity and tables existence"""
     conn = None
@@ -280,7 +579,8 @@ def verify_database():
         tables = [
             'users', 'user_growid', 'products', 'stock', 
             'transactions', 'world_info', 'bot_settings', 'blacklist',
-            'admin_logs', 'role_permissions', 'user_activity', 'cache_table'
+            'admin_logs', 'role_permissions', 'user_activity', 'cache_table',
+            'admins', 'schema_version'
         ]
 
         missing_tables = []
@@ -293,6 +593,10 @@ def verify_database():
             logger.error(f"Missing tables: {', '.join(missing_tables)}")
             raise sqlite3.Error(f"Database verification failed: missing tables")
 
+        # Hot queries must stay on their indexes
+        for name, detail in audit_query_plans(conn):
+            logger.warning(f"Query plan regression in {name}: {detail}")
+
         # Check database integrity
         cursor.execute("PRAGMA integrity_check")
         if cursor.fetchone()['integrity_check'] != 'ok':
@@ -312,6 +616,71 @@ def verify_database():
         if conn:
             conn.close()
 
+# Queries on the purchase and live-stock paths, as issued by the services.
+# audit_query_plans() checks that none of them regress to a table scan.
+HOT_QUERIES = [
+    ("available stock (ProductManagerService.get_available_stock, reduce_stock)",
+     """SELECT id, content, added_at, added_by FROM stock
+        WHERE product_code = ? AND status = ? ORDER BY added_at ASC LIMIT ?""",
+     ('CODE', 'available', 1)),
+    ("stock count (ProductManagerService.get_stock_count, reduce_stock)",
+     "SELECT COUNT(*) as count FROM stock WHERE product_code = ? AND status = ?",
+     ('CODE', 'available')),
+    ("stock count index load (ProductManagerService._load_stock_counts)",
+     """SELECT p.code, COUNT(s.id) as count FROM products p
+        LEFT JOIN stock s ON s.product_code = p.code AND s.status = ? GROUP BY p.code""",
+     ('available',)),
+    ("stock import dedup (ProductManagerService._import_stock_chunk)",
+     "SELECT content FROM stock WHERE content IN (?, ?, ?)",
+     ('a', 'b', 'c')),
+    ("purchase stock claim (trx.claim_purchase)",
+     """UPDATE stock SET status = ?, buyer_id = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (SELECT id FROM stock WHERE product_code = ? AND status = ?
+                     ORDER BY added_at ASC LIMIT ?) AND status = ?
+        RETURNING id, content""",
+     ('sold', 'GROWID', 'CODE', 'available', 1, 'available')),
+    ("balance debit (ledger.post)",
+     """UPDATE users SET balance = balance + ?, balance_version = balance_version + 1
+        WHERE growid = ? COLLATE binary AND balance >= ?
+        RETURNING balance, balance_version""",
+     (-10, 'GROWID', 10)),
+    ("growid lookup (BalanceManagerService.get_growid)",
+     "SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary",
+     ('0',)),
+    ("transaction history page (TransactionManager.get_transaction_history)",
+     """SELECT * FROM transactions WHERE (growid = ? COLLATE binary) AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC LIMIT ?""",
+     ('GROWID', '2024-01-01 00:00:00', 1, 11)),
+    ("purchase history page (TransactionManager.get_user_purchases)",
+     """SELECT t.*, p.name as product_name FROM transactions t LEFT JOIN products p ON p.code = t.product_code
+        WHERE (t.growid = ? COLLATE binary AND t.type = 'PURCHASE') AND (t.created_at, t.id) < (?, ?)
+        ORDER BY t.created_at DESC, t.id DESC LIMIT ?""",
+     ('GROWID', '2024-01-01 00:00:00', 1, 11)),
+    ("stock history page (ProductManagerService.get_stock_history)",
+     """SELECT * FROM stock WHERE (product_code = ?) AND (added_at, id) < (?, ?)
+        ORDER BY added_at DESC, id DESC LIMIT ?""",
+     ('CODE', '2024-01-01 00:00:00', 1, 11)),
+    ("broadcast resume (BroadcastService.run)",
+     "SELECT discord_id FROM broadcast_recipients WHERE broadcast_id = ? AND status = ?",
+     (1, 'pending')),
+]
+
+def audit_query_plans(conn: sqlite3.Connection) -> List[tuple]:
+    """Run EXPLAIN QUERY PLAN over HOT_QUERIES.
+
+    Returns (query name, plan detail) for every step that scans a whole
+    table or sorts through a temporary b-tree; an empty list means all hot
+    queries are served by indexes.
+    """
+    problems = []
+    for name, query, params in HOT_QUERIES:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+            detail = row['detail']
+            table_scan = detail.startswith('SCAN ') and ' USING ' not in detail
+            if table_scan or 'USE TEMP B-TREE' in detail:
+                problems.append((name, detail))
+    return problems
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
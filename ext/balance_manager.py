@@ -1,14 +1,16 @@
 import logging
-import asyncio
-import time
 from typing import Optional, Dict, List
 from datetime import datetime
 
 import discord 
 from discord.ext import commands
 
-from .constants import Balance, TransactionError
-from database import get_connection
+from .constants import Balance, BALANCE_CACHE_SIZE
+from . import ledger
+from database import get_db
+from utils.lock_manager import get_lock_manager
+from utils.balance_cache import get_balance_cache
+from utils.expiring_map import ExpiringMap
 
 class BalanceManagerService:
     _instance = None
@@ -23,42 +25,29 @@ class BalanceManagerService:
         if not self.initialized:
             self.bot = bot
             self.logger = logging.getLogger("BalanceManagerService")
-            self._cache = {}
             self._cache_timeout = 30
-            self._locks = {}
+            self._growids = ExpiringMap(self._cache_timeout, max_size=BALANCE_CACHE_SIZE)
+            self.balances = get_balance_cache()
+            self._locks = get_lock_manager("balance")
             self.initialized = True
 
-    async def _get_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
-
     async def get_growid(self, discord_id: str) -> Optional[str]:
         cache_key = f"growid_{discord_id}"
         
-        if cache_key in self._cache:
-            cached_data = self._cache[cache_key]
-            if time.time() - cached_data['timestamp'] < self._cache_timeout:
-                return cached_data['value']
-            else:
-                del self._cache[cache_key]
-
-        async with await self._get_lock(cache_key):
+        growid = self._growids.get(cache_key)
+        if growid is not None:
+            return growid
+
+        async with self._locks.acquire(cache_key):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
+                result = await get_db().fetchone(
                     "SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary",
                     (str(discord_id),)
                 )
-                result = cursor.fetchone()
                 
                 if result:
                     growid = result['growid']
-                    self._cache[cache_key] = {
-                        'value': growid,
-                        'timestamp': time.time()
-                    }
+                    self._growids.set(cache_key, growid)
                     self.logger.info(f"Found GrowID for Discord ID {discord_id}: {growid}")
                     return growid
                 return None
@@ -66,375 +55,215 @@ class BalanceManagerService:
             except Exception as e:
                 self.logger.error(f"Error getting GrowID: {e}")
                 return None
-            finally:
-                if conn:
-                    conn.close()
 
     async def register_user(self, discord_id: str, growid: str) -> bool:
-        async with await self._get_lock(f"register_{discord_id}"):
-            conn = None
+        def _register(conn):
+            cursor = conn.cursor()
+            
+            # Check if GrowID already exists (case-sensitive)
+            cursor.execute("""
+                SELECT growid FROM users 
+                WHERE growid = ? COLLATE binary
+            """, (growid,))
+            
+            existing = cursor.fetchone()
+            if existing and existing['growid'] != growid:
+                raise ValueError(f"GrowID already exists with different case: {existing['growid']}")
+            
+            # Create user if not exists
+            cursor.execute(
+                "INSERT OR IGNORE INTO users (growid) VALUES (?)",
+                (growid,)
+            )
+            
+            # Link Discord ID to GrowID
+            cursor.execute(
+                "INSERT OR REPLACE INTO user_growid (discord_id, growid) VALUES (?, ?)",
+                (str(discord_id), growid)
+            )
+
+        async with self._locks.acquire(f"register_{discord_id}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check if GrowID already exists (case-sensitive)
-                cursor.execute("""
-                    SELECT growid FROM users 
-                    WHERE growid = ? COLLATE binary
-                """, (growid,))
-                
-                existing = cursor.fetchone()
-                if existing and existing['growid'] != growid:
-                    raise ValueError(f"GrowID already exists with different case: {existing['growid']}")
-                
-                # Begin transaction
-                conn.execute("BEGIN TRANSACTION")
-                
-                # Create user if not exists
-                cursor.execute(
-                    "INSERT OR IGNORE INTO users (growid) VALUES (?)",
-                    (growid,)
-                )
-                
-                # Link Discord ID to GrowID
-                cursor.execute(
-                    "INSERT OR REPLACE INTO user_growid (discord_id, growid) VALUES (?, ?)",
-                    (str(discord_id), growid)
-                )
-                
-                conn.commit()
+                await get_db().write(_register)
                 self.logger.info(f"Registered Discord user {discord_id} with GrowID {growid}")
                 
                 # Update cache
-                cache_key = f"growid_{discord_id}"
-                self._cache[cache_key] = {
-                    'value': growid,
-                    'timestamp': time.time()
-                }
+                self._growids.set(f"growid_{discord_id}", growid)
                 
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error registering user: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
 
     async def update_user_growid(self, discord_id: str, new_growid: str) -> bool:
-        async with await self._get_lock(f"update_growid_{discord_id}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
+        def _update(conn):
+            cursor = conn.cursor()
+            
+            # Get old GrowID
+            cursor.execute(
+                "SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary",
+                (str(discord_id),)
+            )
+            result = cursor.fetchone()
+            old_growid = result['growid'] if result else None
+            if not old_growid:
+                return None
+            
+            # Get old balance
+            cursor.execute(
+                """
+                SELECT balance, balance_version 
+                FROM users 
+                WHERE growid = ? COLLATE binary
+                """,
+                (old_growid,)
+            )
+            old_balance = cursor.fetchone()
+            
+            if old_balance:
+                # Insert or update new GrowID with old balance
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO users 
+                    (growid, balance, balance_version) 
+                    VALUES (?, ?, ?)
+                    """,
+                    (new_growid, old_balance['balance'], old_balance['balance_version'] + 1)
+                )
                 
-                # Get old GrowID
+                # Update user_growid mapping
                 cursor.execute(
-                    "SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary",
-                    (str(discord_id),)
+                    "UPDATE user_growid SET growid = ? WHERE discord_id = ?",
+                    (new_growid, str(discord_id))
                 )
-                result = cursor.fetchone()
-                old_growid = result['growid'] if result else None
                 
-                if old_growid:
-                    # Begin transaction
-                    conn.execute("BEGIN TRANSACTION")
-                    
-                    # Get old balance
-                    cursor.execute(
-                        """
-                        SELECT balance_wl, balance_dl, balance_bgl 
-                        FROM users 
-                        WHERE growid = ? COLLATE binary
-                        """,
-                        (old_growid,)
+                # Record transaction for history
+                cursor.execute(
+                    """
+                    INSERT INTO transactions 
+                    (growid, type, details, old_balance, new_balance, amount_delta, balance_after, related_growid) 
+                    VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+                    """,
+                    (
+                        new_growid,
+                        'GROWID_CHANGE',
+                        f"Changed from {old_growid}",
+                        Balance(old_balance['balance']).format(),
+                        Balance(old_balance['balance']).format(),
+                        old_balance['balance'],
+                        old_growid
                     )
-                    old_balance = cursor.fetchone()
-                    
-                    if old_balance:
-                        # Insert or update new GrowID with old balance
-                        cursor.execute(
-                            """
-                            INSERT OR REPLACE INTO users 
-                            (growid, balance_wl, balance_dl, balance_bgl) 
-                            VALUES (?, ?, ?, ?)
-                            """,
-                            (
-                                new_growid, 
-                                old_balance['balance_wl'],
-                                old_balance['balance_dl'],
-                                old_balance['balance_bgl']
-                            )
-                        )
-                        
-                        # Update user_growid mapping
-                        cursor.execute(
-                            "UPDATE user_growid SET growid = ? WHERE discord_id = ?",
-                            (new_growid, str(discord_id))
-                        )
-                        
-                        # Record transaction for history
-                        cursor.execute(
-                            """
-                            INSERT INTO transactions 
-                            (growid, type, details, old_balance, new_balance) 
-                            VALUES (?, ?, ?, ?, ?)
-                            """,
-                            (
-                                new_growid,
-                                'GROWID_CHANGE',
-                                f"Changed from {old_growid}",
-                                f"{old_balance['balance_wl']} WL",
-                                f"{old_balance['balance_wl']} WL"
-                            )
-                        )
-                        
-                        # Remove old GrowID data
-                        cursor.execute(
-                            "DELETE FROM users WHERE growid = ?",
-                            (old_growid,)
-                        )
-                        
-                    conn.commit()
-                    
+                )
+                
+                # Remove old GrowID data
+                cursor.execute(
+                    "DELETE FROM users WHERE growid = ?",
+                    (old_growid,)
+                )
+
+            return old_growid
+
+        async with self._locks.acquire(f"update_growid_{discord_id}"):
+            try:
+                old_growid = await get_db().write(_update)
+                
+                if old_growid:
                     # Update cache
-                    self._cache.pop(f"balance_{old_growid}", None)
-                    self._cache.pop(f"balance_{new_growid}", None)
-                    self._cache.pop(f"growid_{discord_id}", None)
+                    self.balances.invalidate(old_growid)
+                    self.balances.invalidate(new_growid)
+                    self._growids.pop(f"growid_{discord_id}")
                     
                     self.logger.info(f"Updated GrowID for {discord_id}: {old_growid} -> {new_growid}")
                     return True
-                else:
-                    # If no existing GrowID, just register as new
-                    return await self.register_user(discord_id, new_growid)
+
+                # If no existing GrowID, just register as new
+                return await self.register_user(discord_id, new_growid)
 
             except Exception as e:
                 self.logger.error(f"Error updating GrowID: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
 
     async def get_balance(self, growid: str) -> Optional[Balance]:
-        cache_key = f"balance_{growid}"
-        
-        if cache_key in self._cache:
-            cached_data = self._cache[cache_key]
-            if time.time() - cached_data['timestamp'] < self._cache_timeout:
-                return cached_data['value']
-            else:
-                del self._cache[cache_key]
-
-        async with await self._get_lock(cache_key):
+        balance = self.balances.get(growid)
+        if balance is not None:
+            return balance
+
+        async with self._locks.acquire(f"balance_{growid}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
+                result = await get_db().fetchone(
                     """
-                    SELECT balance_wl, balance_dl, balance_bgl 
+                    SELECT balance, balance_version 
                     FROM users 
                     WHERE growid = ? COLLATE binary
                     """,
                     (growid,)
                 )
-                result = cursor.fetchone()
                 
                 if result:
-                    balance = Balance(
-                        result['balance_wl'],
-                        result['balance_dl'],
-                        result['balance_bgl']
-                    )
-                    self._cache[cache_key] = {
-                        'value': balance,
-                        'timestamp': time.time()
-                    }
+                    balance = Balance(result['balance'])
+                    # Ditolak jika write-through versi lebih baru masuk selama query
+                    self.balances.put(growid, balance, result['balance_version'])
                     return balance
                 return None
 
             except Exception as e:
                 self.logger.error(f"Error getting balance: {e}")
                 return None
-            finally:
-                if conn:
-                    conn.close()
 
     async def update_balance(self, growid: str, wl: int = 0, dl: int = 0, bgl: int = 0,
-                           details: str = "", transaction_type: str = "") -> Optional[Balance]:
-        async with await self._get_lock(f"balance_{growid}"):
-            conn = None
+                           details: str = "", transaction_type: str = "") -> Balance:
+        """Credit (or debit, if negative) the given amount; raises TransactionError if it cannot apply"""
+        amount = Balance(wl, dl, bgl).total_wls
+
+        async with self._locks.acquire(f"balance_{growid}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
+                entry = await get_db().write(ledger.post, growid, amount, transaction_type, details)
+                new_balance = Balance(entry.new_balance)
                 
-                # Get current balance
-                cursor.execute(
-                    """
-                    SELECT balance_wl, balance_dl, balance_bgl 
-                    FROM users 
-                    WHERE growid = ? COLLATE binary
-                    """,
-                    (growid,)
-                )
-                current = cursor.fetchone()
+                # Write-through
+                self.balances.put(growid, new_balance, entry.version)
                 
-                if not current:
-                    raise TransactionError(f"User {growid} not found")
-                
-                old_balance = Balance(
-                    current['balance_wl'],
-                    current['balance_dl'],
-                    current['balance_bgl']
-                )
-                
-                # Calculate new balance
-                new_wl = max(0, current['balance_wl'] + wl)
-                new_dl = max(0, current['balance_dl'] + dl)
-                new_bgl = max(0, current['balance_bgl'] + bgl)
-                
-                # Update balance
-                cursor.execute(
-                    """
-                    UPDATE users 
-                    SET balance_wl = ?, balance_dl = ?, balance_bgl = ? 
-                    WHERE growid = ? COLLATE binary
-                    """,
-                    (new_wl, new_dl, new_bgl, growid)
-                )
-                
-                # Record transaction
-                new_balance = Balance(new_wl, new_dl, new_bgl)
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance) 
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (
-                        growid,
-                        transaction_type,
-                        details,
-                        old_balance.format(),
-                        new_balance.format()
-                    )
-                )
-                
-                conn.commit()
-                
-                # Update cache
-                cache_key = f"balance_{growid}"
-                self._cache[cache_key] = {
-                    'value': new_balance,
-                    'timestamp': time.time()
-                }
-                
-                self.logger.info(f"Updated balance for {growid}: {old_balance.format()} -> {new_balance.format()}")
+                self.logger.info(f"Updated balance for {growid}: {Balance(entry.old_balance).format()} -> {new_balance.format()}")
                 return new_balance
 
             except Exception as e:
                 self.logger.error(f"Error updating balance: {e}")
-                if conn:
-                    conn.rollback()
-                return None
-            finally:
-                if conn:
-                    conn.close()
+                raise
 
     async def transfer_balance(self, from_growid: str, to_growid: str, amount: int) -> bool:
-        async with await self._get_lock(f"transfer_{from_growid}_{to_growid}"):
-            conn = None
+        if amount <= 0:
+            raise ValueError("Transfer amount must be positive")
+
+        def _transfer(conn):
+            # Debit gagal (saldo kurang) atau penerima tidak ada membatalkan keduanya
+            return [
+                ledger.post(conn, from_growid, -amount, 'TRANSFER_OUT', f"Transfer to {to_growid}",
+                            related_growid=to_growid),
+                ledger.post(conn, to_growid, amount, 'TRANSFER_IN', f"Transfer from {from_growid}",
+                            related_growid=from_growid)
+            ]
+
+        # Kedua saldo dikunci berurutan, sama dengan lock update_balance
+        async with self._locks.acquire(f"balance_{from_growid}", f"balance_{to_growid}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check sender balance
-                cursor.execute(
-                    "SELECT balance_wl FROM users WHERE growid = ?",
-                    (from_growid,)
-                )
-                sender = cursor.fetchone()
-                if not sender or sender['balance_wl'] < amount:
-                    raise ValueError("Insufficient balance")
-                
-                # Check receiver exists
-                cursor.execute(
-                    "SELECT balance_wl FROM users WHERE growid = ?",
-                    (to_growid,)
-                )
-                receiver = cursor.fetchone()
-                if not receiver:
-                    raise ValueError(f"Receiver {to_growid} not found")
-                
-                # Update balances
-                cursor.execute(
-                    "UPDATE users SET balance_wl = balance_wl - ? WHERE growid = ?",
-                    (amount, from_growid)
-                )
-                
-                cursor.execute(
-                    "UPDATE users SET balance_wl = balance_wl + ? WHERE growid = ?",
-                    (amount, to_growid)
-                )
-                
-                # Record transactions
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, related_growid)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        from_growid,
-                        'TRANSFER_OUT',
-                        f"Transfer to {to_growid}",
-                        f"{sender['balance_wl']} WL",
-                        f"{sender['balance_wl'] - amount} WL",
-                        to_growid
-                    )
-                )
-                
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, related_growid)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        to_growid,
-                        'TRANSFER_IN',
-                        f"Transfer from {from_growid}",
-                        f"{receiver['balance_wl']} WL",
-                        f"{receiver['balance_wl'] + amount} WL",
-                        from_growid
-                    )
-                )
-                
-                conn.commit()
+                entries = await get_db().write(_transfer)
                 
-                # Invalidate cache
-                self._cache.pop(f"balance_{from_growid}", None)
-                self._cache.pop(f"balance_{to_growid}", None)
+                # Write-through
+                for entry in entries:
+                    self.balances.put(entry.growid, Balance(entry.new_balance), entry.version)
                 
                 self.logger.info(f"Transfer completed: {from_growid} -> {to_growid}, Amount: {amount} WL")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error transferring balance: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def cleanup(self):
         """Cleanup resources"""
-        self._cache.clear()
-        self._locks.clear()
+        self._growids.clear()
+        self.balances.clear()
 
 class BalanceManagerCog(commands.Cog):
     def __init__(self, bot):
@@ -0,0 +1,275 @@
+import logging
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional
+
+import discord
+
+from .constants import (
+    LANE_BROADCAST,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_CHECKPOINT_SIZE,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_USER_CACHE_SIZE
+)
+from .message_scheduler import MessageScheduler
+from database import get_db
+
+class BroadcastService:
+    """Sends one message to many users by DM, resumably.
+
+    A broadcast and its full recipient list are stored before the first DM.
+    BROADCAST_CONCURRENCY workers then send to the pending recipients
+    through the scheduler's broadcast lane, which paces them under the rate
+    limits and behind buyer DMs. Results are checkpointed every
+    BROADCAST_CHECKPOINT_SIZE deliveries and on every progress tick, so
+    after a restart resume() carries on with the recipients not yet
+    recorded; only DMs sent since the last checkpoint can be sent twice.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("BroadcastService")
+            self.scheduler = MessageScheduler(bot)
+            self._users = OrderedDict()  # discord_id -> User dari fetch_user
+            self._tasks: Dict[int, asyncio.Task] = {}
+            self.initialized = True
+
+    async def create(self, kind: str, payload: Dict, recipients: Iterable[int], created_by: str,
+                     progress_message: discord.Message) -> int:
+        """Store a broadcast and start sending it.
+
+        payload holds 'content' and/or 'embed' (an Embed.to_dict()), so the
+        message can be rebuilt after a restart. progress_message is edited
+        with live throughput and ETA, then with the final result.
+        """
+        recipient_ids = sorted({int(discord_id) for discord_id in recipients})
+
+        def _create(conn):
+            cursor = conn.execute("""
+                INSERT INTO broadcasts (kind, payload, created_by, channel_id, progress_message_id, total)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                kind, json.dumps(payload), created_by,
+                progress_message.channel.id, progress_message.id, len(recipient_ids)
+            ))
+            broadcast_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO broadcast_recipients (broadcast_id, discord_id) VALUES (?, ?)",
+                ((broadcast_id, discord_id) for discord_id in recipient_ids)
+            )
+            return broadcast_id
+
+        broadcast_id = await get_db().write(_create)
+        self.logger.info(f"Broadcast #{broadcast_id} ({kind}) created by {created_by} for {len(recipient_ids)} users")
+        self.start(broadcast_id, progress_message)
+        return broadcast_id
+
+    def start(self, broadcast_id: int, progress_message: Optional[discord.Message] = None):
+        task = self._tasks.get(broadcast_id)
+        if task is None or task.done():
+            self._tasks[broadcast_id] = asyncio.create_task(self.run(broadcast_id, progress_message))
+
+    async def resume(self):
+        """Restart broadcasts interrupted by a shutdown; safe to call repeatedly"""
+        rows = await get_db().fetchall("SELECT id FROM broadcasts WHERE status = 'running'")
+        for row in rows:
+            if row['id'] not in self._tasks or self._tasks[row['id']].done():
+                self.logger.info(f"Resuming broadcast #{row['id']}")
+                self.start(row['id'])
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    async def run(self, broadcast_id: int, progress_message: Optional[discord.Message] = None):
+        try:
+            row = await get_db().fetchone("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,))
+            if not row or row['status'] != 'running':
+                return
+
+            message = self._build_message(json.loads(row['payload']))
+            pending = await get_db().fetchall(
+                "SELECT discord_id FROM broadcast_recipients WHERE broadcast_id = ? AND status = 'pending'",
+                (broadcast_id,)
+            )
+            if progress_message is None:
+                progress_message = await self._find_progress_message(row)
+
+            state = {
+                'kind': row['kind'],
+                'total': row['total'],
+                'sent': row['sent'],
+                'failed': row['failed'],
+                'remaining': len(pending),
+                'started': time.monotonic(),
+                'done_this_run': 0,
+                'results': []
+            }
+            recipients = iter([r['discord_id'] for r in pending])
+            reporter = asyncio.create_task(self._report(broadcast_id, state, progress_message))
+            try:
+                await asyncio.gather(*(
+                    self._worker(broadcast_id, recipients, message, state)
+                    for _ in range(BROADCAST_CONCURRENCY)
+                ))
+            finally:
+                reporter.cancel()
+                # Juga saat shutdown: simpan hasil yang sudah terkirim sebelum berhenti
+                await self._checkpoint(broadcast_id, state)
+
+            await get_db().execute(
+                "UPDATE broadcasts SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (broadcast_id,)
+            )
+            await self._show_progress(progress_message, state, finished=True)
+            self.logger.info(
+                f"Broadcast #{broadcast_id} finished: {state['sent']} sent, {state['failed']} failed"
+            )
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error running broadcast #{broadcast_id}: {e}")
+
+    async def _worker(self, broadcast_id: int, recipients: Iterator[int], message: Dict, state: Dict):
+        # Iterator dibagi antar worker; tiap recipient diambil tepat satu worker
+        for discord_id in recipients:
+            try:
+                user = await self._get_user(discord_id)
+                await self.scheduler.send(LANE_BROADCAST, f"dm:{discord_id}", lambda: user.send(**message))
+                status, error = 'sent', None
+            except Exception as e:
+                status, error = 'failed', str(e)
+
+            state[status] += 1
+            state['remaining'] -= 1
+            state['done_this_run'] += 1
+            state['results'].append((status, error, broadcast_id, discord_id))
+            if len(state['results']) >= BROADCAST_CHECKPOINT_SIZE:
+                await self._checkpoint(broadcast_id, state)
+
+    async def _get_user(self, discord_id: int) -> discord.User:
+        user = self.bot.get_user(discord_id) or self._users.get(discord_id)
+        if user is None:
+            user = await self.scheduler.send(
+                LANE_BROADCAST, f"dm:{discord_id}", lambda: self.bot.fetch_user(discord_id)
+            )
+            self._users[discord_id] = user
+            if len(self._users) > BROADCAST_USER_CACHE_SIZE:
+                self._users.popitem(last=False)
+        return user
+
+    async def _checkpoint(self, broadcast_id: int, state: Dict):
+        results, state['results'] = state['results'], []
+        if not results:
+            return
+        sent = sum(1 for result in results if result[0] == 'sent')
+
+        def _save(conn):
+            conn.executemany("""
+                UPDATE broadcast_recipients SET status = ?, error = ?
+                WHERE broadcast_id = ? AND discord_id = ?
+            """, results)
+            conn.execute(
+                "UPDATE broadcasts SET sent = sent + ?, failed = failed + ? WHERE id = ?",
+                (sent, len(results) - sent, broadcast_id)
+            )
+
+        await get_db().write(_save)
+
+    async def _report(self, broadcast_id: int, state: Dict, progress_message: Optional[discord.Message]):
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            try:
+                await self._checkpoint(broadcast_id, state)
+                await self._show_progress(progress_message, state)
+            except Exception as e:
+                self.logger.warning(f"Error reporting broadcast #{broadcast_id} progress: {e}")
+
+    async def _show_progress(self, progress_message: Optional[discord.Message], state: Dict, finished: bool = False):
+        if progress_message is None:
+            return
+
+        done = state['sent'] + state['failed']
+        if finished:
+            embed = discord.Embed(
+                title=f"✅ {state['kind'].title()} Sent",
+                color=discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(name="Total Users", value=state['total'], inline=True)
+            embed.add_field(name="Sent Successfully", value=state['sent'], inline=True)
+            embed.add_field(name="Failed", value=state['failed'], inline=True)
+        else:
+            elapsed = time.monotonic() - state['started']
+            rate = state['done_this_run'] / elapsed if elapsed > 0 else 0.0
+            eta = str(timedelta(seconds=int(state['remaining'] / rate))) if rate else "-"
+            embed = discord.Embed(
+                title=f"⏳ Sending {state['kind'].title()}",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(
+                name="Progress",
+                value=f"{done:,}/{state['total']:,} ({done / state['total']:.0%})" if state['total'] else "0/0",
+                inline=True
+            )
+            embed.add_field(name="Sent / Failed", value=f"{state['sent']:,} / {state['failed']:,}", inline=True)
+            embed.add_field(name="Rate", value=f"{rate:.1f} msg/s", inline=True)
+            embed.add_field(name="ETA", value=eta, inline=True)
+
+        try:
+            await self.scheduler.send(
+                LANE_BROADCAST, f"channel:{progress_message.channel.id}",
+                lambda: progress_message.edit(content=None, embed=embed),
+                coalesce_key=f"broadcast_progress:{progress_message.id}"
+            )
+        except discord.NotFound:
+            self.logger.info(f"Broadcast progress message {progress_message.id} was deleted")
+
+    async def _find_progress_message(self, row) -> Optional[discord.Message]:
+        """Re-attach to the progress message of a resumed broadcast, or post a new one"""
+        channel = self.bot.get_channel(row['channel_id']) if row['channel_id'] else None
+        if channel is None:
+            return None
+        try:
+            return await channel.fetch_message(row['progress_message_id'])
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            self.logger.warning(f"Cannot fetch progress message of broadcast #{row['id']}: {e}")
+            return None
+
+        try:
+            message = await channel.send(f"⏳ Resuming broadcast #{row['id']}...")
+        except discord.HTTPException as e:
+            self.logger.warning(f"Cannot post progress message of broadcast #{row['id']}: {e}")
+            return None
+        await get_db().execute(
+            "UPDATE broadcasts SET progress_message_id = ? WHERE id = ?",
+            (message.id, row['id'])
+        )
+        return message
+
+    @staticmethod
+    def _build_message(payload: Dict) -> Dict:
+        message = {}
+        if payload.get('content'):
+            message['content'] = payload['content']
+        if payload.get('embed'):
+            message['embed'] = discord.Embed.from_dict(payload['embed'])
+        return message
@@ -4,10 +4,19 @@ from collections import namedtuple
 # Timeouts and Intervals
 COOLDOWN_SECONDS = 3
 UPDATE_INTERVAL = 55  # seconds
+LIVE_STOCK_DEBOUNCE = 3  # seconds to coalesce stock-change events before editing
+STOCK_RECONCILE_INTERVAL = 300  # seconds between stock count index re-syncs
 CACHE_TIMEOUT = 60
 PAGE_TIMEOUT = 60  # seconds
 ADMIN_CONFIRM_TIMEOUT = 30  # seconds
 
+# Live Stock Board
+STOCK_BOARD_TITLE = "🏪 Store Stock Status"
+LIVE_STOCK_FIELDS_PER_MESSAGE = 20  # Discord allows 25 fields per embed
+LIVE_STOCK_EMBED_CHAR_LIMIT = 5500  # Discord allows 6000 characters per embed
+LIVE_STOCK_MAX_MESSAGES = 50  # bot messages scanned when adopting an existing board
+MAX_EMBED_FIELD_VALUE = 1024
+
 # Database Status
 STATUS_AVAILABLE = 'available'
 STATUS_SOLD = 'sold'
@@ -32,14 +41,18 @@ CURRENCY_RATES = {
 }
 
 # File Limits and Settings
-MAX_STOCK_FILE_SIZE = 1024 * 1024  # 1MB
-VALID_STOCK_FORMATS = ['txt']
+MAX_STOCK_FILE_SIZE = 1024 * 1024  # 1MB, larger uploads are streamed
+MAX_STOCK_STREAM_SIZE = 256 * 1024 * 1024  # 256MB decompressed
+MAX_STOCK_LINE_LENGTH = 4096
+STOCK_STREAM_CHUNK_SIZE = 64 * 1024  # bytes per network/decompress step
+STOCK_STREAM_BATCH_SIZE = 5000  # lines per import transaction when streaming
+VALID_STOCK_FORMATS = ['txt', 'txt.gz']
 MAX_FILE_SIZES = {
-    'stock': 1024 * 1024,  # 1MB
     'backup': 10 * 1024 * 1024  # 10MB
 }
+STOCK_IMPORT_CHUNK_SIZE = 500  # rows per executemany, below SQLite's variable limit
+PROGRESS_UPDATE_INTERVAL = 2  # seconds between progress message edits
 ALLOWED_FILE_TYPES = {
-    'stock': ['txt'],
     'backup': ['db', 'sqlite', 'backup']
 }
 
@@ -95,10 +108,62 @@ MESSAGES = {
     'PROCESSING': "⏳ Processing... Please wait..."
 }
 
+# Balance Cache
+BALANCE_CACHE_SIZE = 10_000  # growids kept; least recently used are evicted
+BALANCE_CACHE_MAX_AGE = 600  # seconds; only matters for writes made outside the bot
+
+# Config
+CONFIG_FILE = 'config.json'
+CONFIG_WATCH_INTERVAL = 5  # seconds between config.json change checks
+
 # Database Settings
 DB_FILE = 'shop.db'
 DB_BACKUP_DIR = 'backups'
 
+# Outbox Delivery
+OUTBOX_BATCH_SIZE = 20  # due messages fetched per delivery pass
+OUTBOX_POLL_INTERVAL = 5  # seconds the worker sleeps when nothing is due
+OUTBOX_RETRY_BASE = 5  # seconds before the first retry, doubled per attempt
+OUTBOX_RETRY_MAX = 600  # cap on the retry delay
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETENTION_DAYS = 7  # delivered messages older than this are pruned
+
+# Outbound Message Scheduler
+# Lanes in priority order: a sendable job in a lower lane always goes first
+LANE_BUYER = 0  # purchase DMs and other buyer-facing replies
+LANE_BROADCAST = 1  # announcements and maintenance notices
+LANE_LOG = 2  # purchase, donation and command log channels
+LANE_BOARD = 3  # live stock board edits
+SCHEDULER_LANE_NAMES = ['buyer', 'broadcast', 'log', 'board']
+SCHEDULER_GLOBAL_RATE = 45  # requests/s across all routes, under Discord's 50/s
+SCHEDULER_ROUTE_RATE = 1.0  # requests/s per channel or DM route
+SCHEDULER_ROUTE_BURST = 5  # route bucket capacity
+SCHEDULER_MAX_IN_FLIGHT = 10
+SCHEDULER_BUYER_RESERVED = 2  # in-flight slots only the buyer lane may use
+SCHEDULER_BUCKET_IDLE = 300  # seconds before an idle, full route bucket is dropped
+
+# Broadcasts
+BROADCAST_CONCURRENCY = 8  # DMs in flight per broadcast; pacing is left to the scheduler
+BROADCAST_CHECKPOINT_SIZE = 50  # delivery results persisted per write
+BROADCAST_PROGRESS_INTERVAL = 5  # seconds between progress message edits
+BROADCAST_USER_CACHE_SIZE = 5000  # fetched users kept for get_user misses
+
+# Command Analytics
+ANALYTICS_FLUSH_INTERVAL = 60  # seconds between batched writes to SQLite
+ANALYTICS_HLL_PRECISION = 10  # 1024 registers (1KB) per command-hour, ~3% error
+ANALYTICS_RECENT_ERRORS = 50  # errors kept in memory for !cmdstats
+ANALYTICS_PENDING_ERRORS = 1000  # unflushed errors kept; older ones are dropped
+ANALYTICS_RETENTION_DAYS = 90
+ANALYTICS_ERROR_RETENTION_DAYS = 30
+ANALYTICS_MAX_WINDOW_HOURS = 720  # longest range a usage query may cover
+
+# Command Log Shipping
+COMMAND_LOG_BATCH_SIZE = 20  # events per digest message
+COMMAND_LOG_FLUSH_INTERVAL = 10  # seconds before a partial digest is sent
+COMMAND_LOG_MAX_BUFFER = 1000  # hard cap; successes are dropped first past it
+COMMAND_LOG_SAMPLE_THRESHOLD = 200  # buffered events before successes are sampled
+COMMAND_LOG_SAMPLE_RATE = 10  # keep 1 in N successes while sampling
+
 # Logging Settings
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
@@ -128,70 +193,78 @@ class ValidationError(Exception):
     """Custom exception for validation-related errors"""
     pass
 
-# Balance Class dengan Perbaikan
+# Balance: tampilan dari satu angka total WL (users.balance)
 class Balance:
+    """Presentation view of a balance stored as one integer WL amount.
+
+    Balance(total) shows total split into BGL, DL and WL. The legacy
+    Balance(wl, dl, bgl) form is still accepted and folded into the total.
+    """
+    __slots__ = ('total_wls',)
+
     def __init__(self, wl: int = 0, dl: int = 0, bgl: int = 0):
         try:
-            self.wl = int(wl) if wl is not None else 0
-            self.dl = int(dl) if dl is not None else 0
-            self.bgl = int(bgl) if bgl is not None else 0
+            self.total_wls = (
+                int(wl or 0)
+                + int(dl or 0) * CURRENCY_RATES['DL']
+                + int(bgl or 0) * CURRENCY_RATES['BGL']
+            )
         except (ValueError, TypeError):
-            self.wl = 0
-            self.dl = 0
-            self.bgl = 0
-        self.total_wls = self.to_wls()
+            self.total_wls = 0
+
+    @property
+    def bgl(self) -> int:
+        return self.total_wls // CURRENCY_RATES['BGL']
+
+    @property
+    def dl(self) -> int:
+        return self.total_wls % CURRENCY_RATES['BGL'] // CURRENCY_RATES['DL']
+
+    @property
+    def wl(self) -> int:
+        return self.total_wls % CURRENCY_RATES['DL']
     
     def format(self) -> str:
         """Format balance in human readable string"""
-        try:
-            parts = []
-            if self.bgl > 0:
-                parts.append(f"{self.bgl:,} BGL")
-            if self.dl > 0:
-                parts.append(f"{self.dl:,} DL")
-            if self.wl > 0:
-                parts.append(f"{self.wl:,} WL")
-            return " + ".join(parts) if parts else "0 WL"
-        except Exception:
-            # Jika format error, kembalikan format simple
-            return f"{self.to_wls():,} WL"
+        if self.total_wls < 0:
+            return f"{self.total_wls:,} WL"
+        parts = []
+        if self.bgl > 0:
+            parts.append(f"{self.bgl:,} BGL")
+        if self.dl > 0:
+            parts.append(f"{self.dl:,} DL")
+        if self.wl > 0:
+            parts.append(f"{self.wl:,} WL")
+        return " + ".join(parts) if parts else "0 WL"
     
     def to_wls(self) -> int:
         """Convert balance to total WLs"""
-        try:
-            return (self.wl or 0) + ((self.dl or 0) * CURRENCY_RATES['DL']) + ((self.bgl or 0) * CURRENCY_RATES['BGL'])
-        except Exception:
-            return 0
+        return self.total_wls
     
     @classmethod
     def from_wls(cls, total_wls: int) -> 'Balance':
         """Create Balance instance from total WLs"""
-        try:
-            total_wls = int(total_wls) if total_wls is not None else 0
-            bgl = total_wls // CURRENCY_RATES['BGL']
-            remaining = total_wls % CURRENCY_RATES['BGL']
-            dl = remaining // CURRENCY_RATES['DL']
-            wl = remaining % CURRENCY_RATES['DL']
-            return cls(wl=wl, dl=dl, bgl=bgl)
-        except Exception:
-            return cls(wl=0, dl=0, bgl=0)
+        return cls(total_wls)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Balance) and other.total_wls == self.total_wls
+
+    def __hash__(self) -> int:
+        return hash(self.total_wls)
 
     def __str__(self) -> str:
         return self.format()
 
     def __repr__(self) -> str:
-        return f"Balance(wl={self.wl}, dl={self.dl}, bgl={self.bgl})"
+        return f"Balance({self.total_wls})"
         
     def __format__(self, format_spec: str = "") -> str:
         """Format balance when using format() or f-strings"""
-        try:
-            if not format_spec:
-                return self.format()
-            elif format_spec == 'wl':
-                return f"{self.to_wls():,} WL"
-            elif format_spec == 'full':
-                return f"{self.bgl:,} BGL + {self.dl:,} DL + {self.wl:,} WL"
-            else:
-                return self.format()
-        except Exception:
-            return "0 WL"
\ No newline at end of file
+        if format_spec == 'wl':
+            return f"{self.total_wls:,} WL"
+        elif format_spec in (',', 'd'):
+            # f"{balance:,} WL" menampilkan total sebagai angka
+            return format(self.total_wls, format_spec)
+        elif format_spec == 'full':
+            return f"{self.bgl:,} BGL + {self.dl:,} DL + {self.wl:,} WL"
+        return self.format()
\ No newline at end of file
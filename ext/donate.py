@@ -1,7 +1,9 @@
 import discord
 from discord.ext import commands
 from .balance_manager import BalanceManagerService
-from database import get_connection
+from .message_scheduler import MessageScheduler
+from .constants import LANE_LOG, TRANSACTION_DEPOSIT, Balance
+from database import get_db
 import logging
 from datetime import datetime
 
@@ -16,6 +18,7 @@ class Donate(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.balance_service = BalanceManagerService(bot)
+        self.scheduler = MessageScheduler(bot)
         self.logger = logging.getLogger('donate')
 
     @commands.Cog.listener()
@@ -33,20 +36,24 @@ class Donate(commands.Cog):
 
             # Hitung total WL dari deposit
             wl, dl, bgl = self._parse_currency_amount(deposit)
-            total_wl = wl + (dl * 100) + (bgl * 10000)  # Konversi ke WL
+            total_wl = Balance(wl, dl, bgl).total_wls  # Konversi ke WL
 
-            # Dapatkan Discord ID dari GrowID
-            discord_id = await self._get_discord_id(growid)
-            if not discord_id:
+            # Pastikan GrowID terdaftar
+            if not await self._growid_exists(growid):
                 self.logger.warning(f"GrowID tidak terdaftar: {growid}")
                 if hasattr(self.bot, 'donation_log_channel_id'):
                     log_channel = self.bot.get_channel(self.bot.donation_log_channel_id)
                     if log_channel:
-                        await log_channel.send(f"⚠️ [DONASI GAGAL] GrowID '{growid}' tidak terdaftar dalam database.")
+                        await self._send_log(log_channel, content=f"⚠️ [DONASI GAGAL] GrowID '{growid}' tidak terdaftar dalam database.")
                 return
 
             # Proses penambahan balance
-            await self.balance_service.add_balance(discord_id, total_wl)
+            await self.balance_service.update_balance(
+                growid,
+                wl=total_wl,
+                details=f"Donation: {deposit}",
+                transaction_type=TRANSACTION_DEPOSIT
+            )
 
             # Kirim log donasi
             await self._send_donation_log(growid, total_wl, deposit)
@@ -56,7 +63,7 @@ class Donate(commands.Cog):
             if hasattr(self.bot, 'donation_log_channel_id'):
                 log_channel = self.bot.get_channel(self.bot.donation_log_channel_id)
                 if log_channel:
-                    await log_channel.send(f"❌ [ERROR] Gagal memproses donasi: {str(e)}")
+                    await self._send_log(log_channel, content=f"❌ [ERROR] Gagal memproses donasi: {str(e)}")
 
     def _parse_message(self, content: str) -> tuple[str, str]:
         """Parse pesan webhook untuk mendapatkan GrowID dan deposit"""
@@ -88,18 +95,10 @@ class Donate(commands.Cog):
                 
         return wl, dl, bgl
 
-    async def _get_discord_id(self, growid: str) -> int:
-        """Dapatkan Discord ID dari GrowID"""
-        conn = None
-        try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT user_id FROM users WHERE growid = ?", (growid,))
-            row = cur.fetchone()
-            return row[0] if row else None
-        finally:
-            if conn:
-                conn.close()
+    async def _growid_exists(self, growid: str) -> bool:
+        """Cek apakah GrowID terdaftar"""
+        row = await get_db().fetchone("SELECT 1 FROM users WHERE growid = ? COLLATE binary", (growid,))
+        return row is not None
 
     async def _send_donation_log(self, growid: str, total_wl: int, deposit_text: str):
         """Kirim log donasi ke channel yang ditentukan"""
@@ -117,7 +116,11 @@ class Donate(commands.Cog):
             embed.add_field(name="Total", value=f"{total_wl:,} WL", inline=True)
             embed.add_field(name="Deposit", value=deposit_text, inline=False)
             
-            await log_channel.send(embed=embed)
+            await self._send_log(log_channel, embed=embed)
+
+    async def _send_log(self, log_channel, **kwargs):
+        """Kirim ke channel log lewat scheduler, di belakang pesan untuk pembeli"""
+        await self.scheduler.send(LANE_LOG, f"channel:{log_channel.id}", lambda: log_channel.send(**kwargs))
 
 async def setup(bot):  # Diubah menjadi async setup untuk kompatibilitas
     await bot.add_cog(Donate(bot))
\ No newline at end of file
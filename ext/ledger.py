@@ -0,0 +1,73 @@
+from collections import namedtuple
+from typing import Optional
+
+from .constants import Balance, TransactionError
+
+# Hasil satu posting: saldo dalam total WL sebelum dan sesudah
+LedgerEntry = namedtuple('LedgerEntry', ['transaction_id', 'growid', 'amount', 'old_balance', 'new_balance', 'version'])
+
+def post(conn, growid: str, amount: int, transaction_type: str, details: str = "",
+         total_price: Optional[int] = None, product_code: Optional[str] = None,
+         quantity: Optional[int] = None, order_id: Optional[int] = None,
+         related_growid: Optional[str] = None, related_transaction_id: Optional[int] = None,
+         admin_id: Optional[str] = None) -> LedgerEntry:
+    """Add amount WL (negative for a debit) to growid's balance inside the caller's transaction.
+
+    The balance changes in one UPDATE ... RETURNING; a debit only matches
+    while the balance covers it, so balances never go negative whatever
+    the caller's locking. The change is recorded in transactions in the
+    same transaction, with amount_delta and balance_after as integers. A
+    PURCHASE row is its own order (order_id = id); refunds pass the
+    purchase's id. Raises TransactionError (rolling the caller back) if the
+    user does not exist or the balance is insufficient.
+    """
+    amount = int(amount)
+    cursor = conn.cursor()
+    if amount < 0:
+        cursor.execute("""
+            UPDATE users SET balance = balance + ?, balance_version = balance_version + 1
+            WHERE growid = ? COLLATE binary AND balance >= ?
+            RETURNING balance, balance_version
+        """, (amount, growid, -amount))
+    else:
+        cursor.execute("""
+            UPDATE users SET balance = balance + ?, balance_version = balance_version + 1
+            WHERE growid = ? COLLATE binary
+            RETURNING balance, balance_version
+        """, (amount, growid))
+    row = cursor.fetchone()
+    if not row:
+        cursor.execute("SELECT 1 FROM users WHERE growid = ? COLLATE binary", (growid,))
+        if not cursor.fetchone():
+            raise TransactionError(f"User {growid} not found")
+        raise TransactionError("Insufficient balance")
+
+    new_balance = row['balance']
+    old_balance = new_balance - amount
+    columns = {
+        'growid': growid,
+        'type': transaction_type,
+        'details': details,
+        'old_balance': Balance(old_balance).format(),
+        'new_balance': Balance(new_balance).format(),
+        'amount_delta': amount,
+        'balance_after': new_balance,
+        'total_price': total_price,
+        'items_count': quantity,
+        'product_code': product_code,
+        'quantity': quantity,
+        'order_id': order_id,
+        'related_growid': related_growid,
+        'related_transaction_id': related_transaction_id,
+        'admin_id': admin_id
+    }
+    # Kolom kosong dilewati agar default tabel tetap berlaku
+    columns = {name: value for name, value in columns.items() if value is not None}
+    cursor.execute(
+        f"INSERT INTO transactions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) RETURNING id",
+        tuple(columns.values())
+    )
+    transaction_id = cursor.fetchone()['id']
+    if transaction_type == 'PURCHASE' and order_id is None:
+        cursor.execute("UPDATE transactions SET order_id = id WHERE id = ?", (transaction_id,))
+    return LedgerEntry(transaction_id, growid, amount, old_balance, new_balance, row['balance_version'])
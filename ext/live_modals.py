@@ -9,7 +9,6 @@ from .constants import Balance
 from .balance_manager import BalanceManagerService
 from .product_manager import ProductManagerService
 from .trx import TransactionManager
-from database import get_connection
 
 class SetGrowIDModal(ui.Modal, title="Set GrowID"):
     def __init__(self, bot):
@@ -114,26 +113,18 @@ class BuyModal(ui.Modal, title="Buy Product"):
                 await interaction.followup.send("❌ Invalid quantity!", ephemeral=True)
                 return
 
-            # Process purchase
+            # Process purchase; DM and buy-log are queued in the same transaction
             try:
                 result = await self.trx_manager.process_purchase(
                     growid=growid,
                     product_code=self.code.value,
-                    quantity=quantity
+                    quantity=quantity,
+                    discord_id=interaction.user.id
                 )
             except Exception as e:
                 await interaction.followup.send(f"❌ {str(e)}", ephemeral=True)
                 return
 
-            # Log purchase to buy-logs channel
-            await self.trx_manager.log_purchase_to_channel(
-                order_id=result['order_id'],
-                user=interaction.user,
-                product_code=self.code.value,
-                total=quantity,
-                price=result['total_price']
-            )
-
             embed = discord.Embed(
                 title="✅ Purchase Successful",
                 color=discord.Color.green(),
@@ -143,34 +134,15 @@ class BuyModal(ui.Modal, title="Buy Product"):
             embed.add_field(name="Quantity", value=str(quantity), inline=True)
             embed.add_field(name="Total Price", value=f"{result['total_price']:,} WL", inline=True)
             embed.add_field(name="New Balance", value=f"{result['new_balance']:,} WL", inline=False)
-
-            # Send purchase result via DM
-            dm_sent = await self.trx_manager.send_purchase_result(
-                user=interaction.user,
-                items=result['items'],
-                product_name=result['product_name']
+            embed.add_field(
+                name="Purchase Details",
+                value="📎 Your items are attached. ✉️ A copy is on its way to your DM.",
+                inline=False
             )
 
-            if dm_sent:
-                embed.add_field(
-                    name="Purchase Details",
-                    value="✉️ Check your DM for the detailed purchase result!",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="Purchase Details",
-                    value="⚠️ Could not send DM. Please enable DMs from server members to receive purchase details.",
-                    inline=False
-                )
-
-            content_msg = "**Your Items:**\n"
-            for item in result['items']:
-                content_msg += f"```{item['content']}```\n"
-
             await interaction.followup.send(
                 embed=embed,
-                content=content_msg if not dm_sent else None,
+                file=self.trx_manager.build_purchase_file(interaction.user, result['items'], result['product_name']),
                 ephemeral=True
             )
 
@@ -1,11 +1,19 @@
 import discord
+import hashlib
+import json
 import logging
 import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from .product_manager import ProductManagerService
-from .constants import CACHE_TIMEOUT
+from .constants import (
+    CACHE_TIMEOUT,
+    STOCK_BOARD_TITLE,
+    LIVE_STOCK_FIELDS_PER_MESSAGE,
+    LIVE_STOCK_EMBED_CHAR_LIMIT,
+    MAX_EMBED_FIELD_VALUE
+)
 
 class LiveStockService:
     _instance = None
@@ -39,42 +47,64 @@ class LiveStockService:
             'timestamp': time.time()
         }
 
-    async def create_stock_embed(self, products: list) -> discord.Embed:
-        # Nonaktifkan caching untuk memastikan data selalu fresh
+    def _product_field(self, product: Dict) -> Tuple[str, str]:
+        # stock_count berasal dari index in-memory ProductManagerService
+        value = (
+            f"💎 Code: `{product['code']}`\n"
+            f"📦 Stock: `{product['stock_count']}`\n"
+            f"💰 Price: `{product['price']:,} WL`\n"
+        )
+        if product.get('description'):
+            value += f"📝 Info: {product['description']}\n"
+        if len(value) > MAX_EMBED_FIELD_VALUE:
+            value = value[:MAX_EMBED_FIELD_VALUE - 1] + "…"
+        return f"🔸 {product['name']} 🔸", value
+
+    def _new_stock_embed(self) -> discord.Embed:
         embed = discord.Embed(
-            title="🏪 Store Stock Status",
+            title=STOCK_BOARD_TITLE,
             color=discord.Color.blue(),
             timestamp=datetime.utcnow()
         )
-
-        if products:
-            for product in sorted(products, key=lambda x: x['code']):
-                # Force invalidate cache dan ambil data fresh
-                self.product_manager.invalidate_cache(product['code'])
-                stock_count = await self.product_manager.get_stock_count(product['code'])
-                
-                # Tambah logging untuk debugging
-                self.logger.info(f"Live Stock Update - Product: {product['code']}, Stock Count: {stock_count}")
-                
-                value = (
-                    f"💎 Code: `{product['code']}`\n"
-                    f"📦 Stock: `{stock_count}`\n"
-                    f"💰 Price: `{product['price']:,} WL`\n"
-                )
-                if product.get('description'):
-                    value += f"📝 Info: {product['description']}\n"
-                
-                embed.add_field(
-                    name=f"🔸 {product['name']} 🔸",
-                    value=value,
-                    inline=False
-                )
-        else:
-            embed.description = "No products available."
-
         embed.set_footer(text=f"Last Update: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
         return embed
 
+    async def create_stock_embeds(self, products: list) -> List[discord.Embed]:
+        """Render the board as one or more embeds, each within Discord's embed limits.
+
+        Products are ordered by code and packed into shards of at most
+        LIVE_STOCK_FIELDS_PER_MESSAGE fields and LIVE_STOCK_EMBED_CHAR_LIMIT
+        characters, so a product change only alters the shard holding it.
+        """
+        embeds = [self._new_stock_embed()]
+        if not products:
+            embeds[0].description = "No products available."
+            return embeds
+
+        for product in sorted(products, key=lambda x: x['code']):
+            name, value = self._product_field(product)
+            embed = embeds[-1]
+            if embed.fields and (
+                len(embed.fields) >= LIVE_STOCK_FIELDS_PER_MESSAGE
+                or len(embed) + len(name) + len(value) > LIVE_STOCK_EMBED_CHAR_LIMIT
+            ):
+                embed = self._new_stock_embed()
+                embeds.append(embed)
+            embed.add_field(name=name, value=value, inline=False)
+
+        if len(embeds) > 1:
+            for page, embed in enumerate(embeds, 1):
+                embed.title = f"{STOCK_BOARD_TITLE} ({page}/{len(embeds)})"
+        return embeds
+
+    @staticmethod
+    def embed_fingerprint(embed: discord.Embed) -> str:
+        """Hash of the embed content, ignoring the render timestamp and footer"""
+        data = embed.to_dict()
+        data.pop('timestamp', None)
+        data.pop('footer', None)
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
     async def cleanup(self):
         """Cleanup resources"""
         self._cache.clear()
\ No newline at end of file
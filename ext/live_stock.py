@@ -2,26 +2,28 @@ import discord
 from discord.ext import commands, tasks
 import logging
 import asyncio
-import json
 from datetime import datetime
 
 from .live_service import LiveStockService
 from .live_views import StockView
-from .constants import UPDATE_INTERVAL
-
-# Load config
-with open('config.json') as config_file:
-    config = json.load(config_file)
-    LIVE_STOCK_CHANNEL_ID = int(config['id_live_stock'])
+from .message_scheduler import MessageScheduler
+from .constants import UPDATE_INTERVAL, LIVE_STOCK_DEBOUNCE, LIVE_STOCK_MAX_MESSAGES, STOCK_BOARD_TITLE, LANE_BOARD
+from utils.config import ConfigService
 
 class LiveStock(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.message = None
+        self.messages = None  # board messages in channel order, one per shard
         self.service = LiveStockService(bot)
         self.stock_view = StockView(bot)
+        self.scheduler = MessageScheduler(bot)
         self.logger = logging.getLogger("LiveStock")
         self.ready = asyncio.Event()
+        self._fingerprints = []
+        self._refresh_lock = asyncio.Lock()
+        self._pending_refresh = None
+        self.config_service = ConfigService()
+        self.config_service.subscribe(self._on_config_change)
         
         bot.add_view(self.stock_view)
 
@@ -38,53 +40,126 @@ class LiveStock(commands.Cog):
         """Called when cog is being unloaded"""
         if hasattr(self, 'live_stock'):
             self.live_stock.cancel()
+        if self._pending_refresh:
+            self._pending_refresh.cancel()
+        self.config_service.unsubscribe(self._on_config_change)
         self.logger.info("LiveStock cog unloaded")
 
-    async def get_or_create_message(self):
-        """Get existing message or create new one"""
-        channel = self.bot.get_channel(LIVE_STOCK_CHANNEL_ID)
+    async def _on_config_change(self, old, new, changed):
+        if 'id_live_stock' not in changed:
+            return
+        # Board diadopsi ulang dari channel baru; pesan di channel lama dibiarkan
+        async with self._refresh_lock:
+            self.messages = None
+        self.logger.info(f"Live stock channel changed to {new.id_live_stock}")
+        if self.bot.is_ready():
+            await self.refresh()
+
+    async def load_messages(self) -> list:
+        """Adopt the board messages already in the channel, oldest first"""
+        channel_id = self.bot.live_stock_channel_id
+        channel = self.bot.get_channel(channel_id)
         if not channel:
-            self.logger.error(f"Could not find channel with ID {LIVE_STOCK_CHANNEL_ID}")
+            self.logger.error(f"Could not find channel with ID {channel_id}")
             return None
 
-        try:
-            # Get last message from bot
-            async for msg in channel.history(limit=1):
-                if msg.author == self.bot.user:
-                    return msg
-                    
-            # If no message found, create new one
-            products = await self.service.product_manager.get_all_products()
-            embed = await self.service.create_stock_embed(products)
-            return await channel.send(embed=embed, view=self.stock_view)
-            
-        except Exception as e:
-            self.logger.error(f"Error in get_or_create_message: {e}")
-            return None
+        messages = [
+            msg async for msg in channel.history(limit=LIVE_STOCK_MAX_MESSAGES)
+            if msg.author == self.bot.user and msg.embeds
+            and (msg.embeds[0].title or '').startswith(STOCK_BOARD_TITLE)
+        ]
+        messages.reverse()
+        return messages
 
-    @tasks.loop(seconds=UPDATE_INTERVAL)
-    async def live_stock(self):
-        """Update live stock message"""
-        try:
-            if not self.message:
-                self.message = await self.get_or_create_message()
-                if not self.message:
+    async def refresh(self):
+        """Re-render the board and edit only the shards whose content changed.
+
+        Shard i is shown by message i; the last message carries the buttons.
+        Messages are appended or deleted at the end when the shard count changes.
+        Edits are queued on the scheduler's board lane and awaited outside the
+        lock, so while buyer traffic holds them back a newer refresh replaces
+        the queued edit of a shard instead of sending both.
+        """
+        edits = []
+        async with self._refresh_lock:
+            if self.messages is None:
+                self.messages = await self.load_messages()
+                self._fingerprints = [None] * len(self.messages or [])
+                if self.messages is None:
                     return
 
             products = await self.service.product_manager.get_all_products()
-            embed = await self.service.create_stock_embed(products)
+            embeds = await self.service.create_stock_embeds(products)
+            last = len(embeds) - 1
+            channel = self.bot.get_channel(self.bot.live_stock_channel_id)
+            route = f"channel:{channel.id}"
 
             try:
-                await self.message.edit(embed=embed, view=self.stock_view)
-                self.logger.debug(f"Updated message {self.message.id}")
+                while len(self.messages) > len(embeds):
+                    msg = self.messages.pop()
+                    self._fingerprints.pop()
+                    await self.scheduler.send(LANE_BOARD, route, msg.delete)
+
+                for i, embed in enumerate(embeds):
+                    # Posisi view ikut dihitung agar tombol pindah saat jumlah shard berubah
+                    state = (self.service.embed_fingerprint(embed), i == last)
+                    view = self.stock_view if i == last else None
+                    if i >= len(self.messages):
+                        self.messages.append(await self.scheduler.send(
+                            LANE_BOARD, route, lambda embed=embed, view=view: channel.send(embed=embed, view=view)
+                        ))
+                        self._fingerprints.append(state)
+                    elif self._fingerprints[i] != state:
+                        msg = self.messages[i]
+                        edits.append((i, msg, asyncio.ensure_future(self.scheduler.send(
+                            LANE_BOARD, route,
+                            lambda msg=msg, embed=embed, view=view: msg.edit(embed=embed, view=view),
+                            coalesce_key=f"board_edit:{msg.id}"
+                        ))))
+                        self._fingerprints[i] = state
             except discord.NotFound:
-                self.message = await self.get_or_create_message()
-                self.logger.info("Created new message as old one was not found")
-            
+                self.messages = None
+                self.logger.info("Live stock message missing, board will be reloaded")
+
+        results = await asyncio.gather(*(edit for _, _, edit in edits), return_exceptions=True)
+        for (i, msg, _), result in zip(edits, results):
+            if isinstance(result, discord.NotFound):
+                self.messages = None
+                self.logger.info("Live stock message missing, board will be reloaded")
+            elif isinstance(result, Exception):
+                # Shard dikirim ulang di refresh berikutnya
+                if self.messages and i < len(self.messages) and self.messages[i] is msg:
+                    self._fingerprints[i] = None
+                self.logger.error(f"Error updating shard {i + 1} ({msg.id}): {result}")
+            else:
+                self.logger.debug(f"Updated shard {i + 1} ({msg.id})")
+
+    async def _debounced_refresh(self):
+        try:
+            await asyncio.sleep(LIVE_STOCK_DEBOUNCE)
+            self._pending_refresh = None
+            await self.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in live_stock event update: {e}")
+            self.messages = None
+
+    @commands.Cog.listener()
+    async def on_stock_change(self, product_codes: list):
+        """Coalesce stock-change events into one board refresh per debounce window"""
+        if self._pending_refresh is None and self.bot.is_ready():
+            self._pending_refresh = asyncio.create_task(self._debounced_refresh())
+
+    @tasks.loop(seconds=UPDATE_INTERVAL)
+    async def live_stock(self):
+        """Periodic safety-net refresh; unchanged boards are not re-sent"""
+        try:
+            await self.refresh()
         except Exception as e:
             self.logger.error(f"Error in live_stock update: {e}")
-            # Reset message if error occurs
-            self.message = None
+            # Reset messages if error occurs
+            self.messages = None
 
     @live_stock.before_loop
     async def before_live_stock(self):
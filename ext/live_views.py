@@ -1,8 +1,6 @@
 import discord
 from discord import ui
-from discord.ext import tasks
 import logging
-import time
 import asyncio
 from datetime import datetime
 
@@ -11,6 +9,7 @@ from .product_manager import ProductManagerService
 from .trx import TransactionManager
 from .live_modals import BuyModal, SetGrowIDModal
 from .constants import COOLDOWN_SECONDS
+from utils.expiring_map import ExpiringMap
 
 class StockView(ui.View):
     def __init__(self, bot):
@@ -26,42 +25,23 @@ class StockView(ui.View):
             self.logger.error(f"Error initializing services: {e}")
             raise
             
-        self._cooldowns = {}
-        self._interaction_locks = {}
-        self._cache_cleanup.start()
-
-    @tasks.loop(minutes=5)
-    async def _cache_cleanup(self):
-        """Cleanup expired cache entries"""
-        try:
-            current_time = time.time()
-            self._cooldowns = {
-                k: v for k, v in self._cooldowns.items()
-                if current_time - v < COOLDOWN_SECONDS
-            }
-            self._interaction_locks = {
-                k: v for k, v in self._interaction_locks.items()
-                if current_time - v < 1.0
-            }
-        except Exception as e:
-            self.logger.error(f"Error in cache cleanup: {e}")
+        self._cooldowns = ExpiringMap(COOLDOWN_SECONDS)
+        self._interaction_locks = ExpiringMap(1.0, resolution=0.25)
 
     async def _check_cooldown(self, interaction: discord.Interaction) -> bool:
         try:
             user_id = interaction.user.id
-            current_time = time.time()
             
-            if user_id in self._cooldowns:
-                remaining = COOLDOWN_SECONDS - (current_time - self._cooldowns[user_id])
-                if remaining > 0:
-                    await self._safe_interaction_response(
-                        interaction,
-                        content=f"⏳ Please wait {remaining:.1f} seconds...",
-                        ephemeral=True
-                    )
-                    return False
+            remaining = self._cooldowns.expires_in(user_id)
+            if remaining > 0:
+                await self._safe_interaction_response(
+                    interaction,
+                    content=f"⏳ Please wait {remaining:.1f} seconds...",
+                    ephemeral=True
+                )
+                return False
             
-            self._cooldowns[user_id] = current_time
+            self._cooldowns.set(user_id)
             return True
         except Exception as e:
             self.logger.error(f"Error checking cooldown: {e}")
@@ -70,13 +50,11 @@ class StockView(ui.View):
     async def _check_interaction_lock(self, interaction: discord.Interaction) -> bool:
         try:
             user_id = interaction.user.id
-            current_time = time.time()
             
             if user_id in self._interaction_locks:
-                if current_time - self._interaction_locks[user_id] < 1.0:
-                    return False
+                return False
             
-            self._interaction_locks[user_id] = current_time
+            self._interaction_locks.set(user_id)
             return True
         except Exception as e:
             self.logger.error(f"Error checking interaction lock: {e}")
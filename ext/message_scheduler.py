@@ -0,0 +1,252 @@
+import logging
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .constants import (
+    SCHEDULER_LANE_NAMES,
+    SCHEDULER_GLOBAL_RATE,
+    SCHEDULER_ROUTE_RATE,
+    SCHEDULER_ROUTE_BURST,
+    SCHEDULER_MAX_IN_FLIGHT,
+    SCHEDULER_BUYER_RESERVED,
+    SCHEDULER_BUCKET_IDLE,
+    LANE_BUYER
+)
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity; one token per request"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Job:
+    __slots__ = ('lane', 'route', 'send', 'future', 'coalesce_key', 'enqueued')
+
+    def __init__(self, lane: int, route: str, send: Callable[[], Awaitable[Any]],
+                 future: asyncio.Future, coalesce_key: Optional[str]):
+        self.lane = lane
+        self.route = route
+        self.send = send
+        self.future = future
+        self.coalesce_key = coalesce_key
+        self.enqueued = time.monotonic()
+
+class MessageScheduler:
+    """Single gate for outbound Discord requests, ordered by priority lane.
+
+    Jobs are queued per lane and per route (a channel or a DM). The
+    dispatcher always starts the oldest job of the highest-priority lane
+    whose route bucket and the global bucket both have a token, so a burst
+    of log or board traffic can never hold a buyer's DM behind it. Queueing
+    a job with the coalesce_key of one still waiting replaces its send
+    function instead (e.g. repeated edits of one message): only the newest
+    content is sent and every waiter gets that result.
+
+    Lanes are strict priorities; lower lanes only get the capacity the
+    higher ones leave unused. SCHEDULER_BUYER_RESERVED of the in-flight
+    slots are kept for the buyer lane, so slow broadcast or log sends
+    filling the rest cannot make a buyer's DM wait for one to finish.
+    discord.py still handles any 429 on its own, the buckets just keep us
+    from hitting them.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("MessageScheduler")
+            self._lanes: List[OrderedDict] = [OrderedDict() for _ in SCHEDULER_LANE_NAMES]
+            self._coalesce: Dict[str, _Job] = {}
+            self._buckets: Dict[str, TokenBucket] = {}
+            self._global = TokenBucket(SCHEDULER_GLOBAL_RATE, SCHEDULER_GLOBAL_RATE)
+            self._wakeup = asyncio.Event()
+            self._in_flight = 0
+            self._task = None
+            self._last_prune = time.monotonic()
+            self._stats = [
+                {'submitted': 0, 'coalesced': 0, 'dispatched': 0, 'sent': 0, 'failed': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+                for _ in SCHEDULER_LANE_NAMES
+            ]
+            self.initialized = True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self.logger.info("Message scheduler started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def send(self, lane: int, route: str, send: Callable[[], Awaitable[Any]],
+                   coalesce_key: Optional[str] = None) -> Any:
+        """Run send() when lane and route allow it and return its result.
+
+        route names the rate-limit bucket, e.g. f"channel:{channel.id}" or
+        f"dm:{user.id}". send must build its request when called (files
+        included), since a coalesced job may never call it. Exceptions
+        raised by send propagate to every waiter.
+        """
+        self.start()
+        stats = self._stats[lane]
+
+        job = self._coalesce.get(coalesce_key) if coalesce_key else None
+        if job is not None:
+            job.send = send
+            stats['coalesced'] += 1
+        else:
+            job = _Job(lane, route, send, asyncio.get_running_loop().create_future(), coalesce_key)
+            self._lanes[lane].setdefault(route, deque()).append(job)
+            if coalesce_key:
+                self._coalesce[coalesce_key] = job
+            stats['submitted'] += 1
+            self._wakeup.set()
+
+        # Shield agar waiter yang dibatalkan tidak membatalkan job milik waiter lain
+        return await asyncio.shield(job.future)
+
+    def _bucket(self, route: str) -> TokenBucket:
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = TokenBucket(SCHEDULER_ROUTE_RATE, SCHEDULER_ROUTE_BURST)
+        return bucket
+
+    def _next_job(self, now: float, buyer_only: bool = False):
+        """Pop the first sendable job in priority order, or report how long until one is"""
+        soonest = None
+        global_wait = self._global.wait_time(now)
+        lanes = self._lanes[LANE_BUYER:LANE_BUYER + 1] if buyer_only else self._lanes
+        for lane in lanes:
+            for route, jobs in lane.items():
+                bucket = self._bucket(route)
+                wait = max(bucket.wait_time(now), global_wait)
+                if wait <= 0:
+                    job = jobs.popleft()
+                    if not jobs:
+                        del lane[route]
+                    else:
+                        # Round-robin antar route dalam satu lane
+                        lane.move_to_end(route)
+                    bucket.take()
+                    self._global.take()
+                    return job, 0.0
+                soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    def _dispatch(self) -> Optional[float]:
+        """Start every job that may go now; returns seconds until the next one could"""
+        while self._in_flight < SCHEDULER_MAX_IN_FLIGHT:
+            now = time.monotonic()
+            # Slot cadangan hanya untuk lane buyer
+            buyer_only = self._in_flight >= SCHEDULER_MAX_IN_FLIGHT - SCHEDULER_BUYER_RESERVED
+            job, wait = self._next_job(now, buyer_only)
+            if job is None:
+                # Lane lain menunggu slot kosong; _execute membangunkan dispatcher
+                return wait
+
+            if job.coalesce_key:
+                # Edit baru setelah titik ini harus jadi job baru, bukan menimpa yang sedang jalan
+                self._coalesce.pop(job.coalesce_key, None)
+            waited = now - job.enqueued
+            stats = self._stats[job.lane]
+            stats['dispatched'] += 1
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+
+            self._in_flight += 1
+            asyncio.create_task(self._execute(job))
+        return None
+
+    async def _execute(self, job: _Job):
+        stats = self._stats[job.lane]
+        try:
+            result = await job.send()
+        except Exception as e:
+            stats['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+                # Tandai sudah diambil agar waiter yang dibatalkan tidak memicu warning
+                job.future.exception()
+        else:
+            stats['sent'] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            self._wakeup.set()
+
+    def _prune_buckets(self):
+        now = time.monotonic()
+        if now - self._last_prune < SCHEDULER_BUCKET_IDLE:
+            return
+        self._last_prune = now
+        queued = {route for lane in self._lanes for route in lane}
+        for route in [r for r, b in self._buckets.items() if r not in queued and b.is_full(now)]:
+            del self._buckets[route]
+
+    async def _run(self):
+        while True:
+            # Clear before dispatching so a send() during the pass is not lost
+            self._wakeup.clear()
+            try:
+                delay = self._dispatch()
+                self._prune_buckets()
+            except Exception as e:
+                self.logger.error(f"Error dispatching messages: {e}")
+                delay = 1.0
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> Dict:
+        lanes = {}
+        for name, lane, stats in zip(SCHEDULER_LANE_NAMES, self._lanes, self._stats):
+            lanes[name] = {
+                'depth': sum(len(jobs) for jobs in lane.values()),
+                'submitted': stats['submitted'],
+                'coalesced': stats['coalesced'],
+                'sent': stats['sent'],
+                'failed': stats['failed'],
+                'avg_wait_ms': stats['wait_total'] / stats['dispatched'] * 1000 if stats['dispatched'] else 0.0,
+                'max_wait_ms': stats['wait_max'] * 1000
+            }
+        return {
+            'in_flight': self._in_flight,
+            'routes': len(self._buckets),
+            'lanes': lanes
+        }
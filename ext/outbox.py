@@ -0,0 +1,149 @@
+import logging
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict
+
+from .constants import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETENTION_DAYS
+)
+from database import get_db
+
+def enqueue(conn, kind: str, payload: Dict):
+    """Queue a message inside the caller's write transaction.
+
+    The row only becomes visible to the delivery worker if that transaction
+    commits, so a message is sent if and only if its purchase happened.
+    """
+    conn.execute(
+        "INSERT INTO outbox (kind, payload) VALUES (?, ?)",
+        (kind, json.dumps(payload))
+    )
+
+class OutboxService:
+    """Delivers outbox rows through handlers registered per kind.
+
+    A handler receives the decoded payload and returns True when delivered
+    or False when delivery can never succeed (e.g. DMs closed); an exception
+    schedules a retry with exponential backoff. Delivery is at-least-once:
+    a crash between sending and marking the row re-sends it on restart.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("OutboxService")
+            self._handlers: Dict[str, Callable[[Dict], Awaitable[bool]]] = {}
+            self._wakeup = asyncio.Event()
+            self._task = None
+            self._last_prune = 0.0
+            self._stats = {'sent': 0, 'failed': 0, 'retried': 0}
+            self.initialized = True
+
+    def register_handler(self, kind: str, handler: Callable[[Dict], Awaitable[bool]]):
+        self._handlers[kind] = handler
+
+    def wake(self):
+        """Tell the worker new rows were committed"""
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self.logger.info("Outbox worker started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # Clear before draining so a wake() during the pass is not lost
+            self._wakeup.clear()
+            try:
+                delivered = await self.drain()
+                await self._prune()
+            except Exception as e:
+                self.logger.error(f"Error draining outbox: {e}")
+                delivered = 0
+
+            if not delivered:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self) -> int:
+        """Attempt every due message once; returns how many were attempted"""
+        rows = await get_db().fetchall("""
+            SELECT id, kind, payload, attempts
+            FROM outbox
+            WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+            ORDER BY id
+            LIMIT ?
+        """, (OUTBOX_BATCH_SIZE,))
+
+        for row in rows:
+            await self._deliver(row)
+        return len(rows)
+
+    async def _deliver(self, row):
+        handler = self._handlers.get(row['kind'])
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for {row['kind']}")
+            delivered = await handler(json.loads(row['payload']))
+        except Exception as e:
+            attempts = row['attempts'] + 1
+            delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+            status = 'failed' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending'
+            await get_db().execute("""
+                UPDATE outbox
+                SET attempts = ?, status = ?, last_error = ?, next_attempt_at = datetime('now', ?)
+                WHERE id = ?
+            """, (attempts, status, str(e), f"+{delay} seconds", row['id']))
+            self._stats['failed' if status == 'failed' else 'retried'] += 1
+            self.logger.warning(
+                f"Outbox {row['kind']} #{row['id']} attempt {attempts} failed: {e}"
+                + (" (giving up)" if status == 'failed' else f" (retry in {delay}s)")
+            )
+            return
+
+        await get_db().execute("""
+            UPDATE outbox
+            SET attempts = attempts + 1, status = ?, sent_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, ('sent' if delivered else 'failed', row['id']))
+        self._stats['sent' if delivered else 'failed'] += 1
+
+    async def _prune(self):
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        removed = await get_db().execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < datetime('now', ?)",
+            (f"-{OUTBOX_RETENTION_DAYS} days",)
+        )
+        if removed:
+            self.logger.info(f"Pruned {removed} delivered outbox messages")
+
+    async def get_stats(self) -> Dict:
+        rows = await get_db().fetchall("SELECT status, COUNT(*) as count FROM outbox GROUP BY status")
+        return {**self._stats, 'queued': {row['status']: row['count'] for row in rows}}
@@ -0,0 +1,91 @@
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import discord
+from discord import ui
+
+from .constants import PAGINATION_TIMEOUT
+from utils.pagination import Page
+
+# Tombol paginator dilewati oleh ButtonHandler global
+PAGINATOR_ID_PREFIX = "page:"
+
+class PaginatedView(ui.View):
+    """Prev/Next buttons over a keyset-paginated query, fetched one page at a time.
+
+    fetch(cursor) returns a Page and render(page, number) builds its embed.
+    Only the page being shown is held; the cursors of earlier pages are
+    kept so Prev can fetch them again. Only the invoking user can press
+    the buttons, and they are disabled after PAGINATION_TIMEOUT seconds.
+    """
+
+    def __init__(self, author_id: int, fetch: Callable[[Optional[str]], Awaitable[Page]],
+                 render: Callable[[Page, int], discord.Embed], timeout: float = PAGINATION_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.fetch = fetch
+        self.render = render
+        self.logger = logging.getLogger("PaginatedView")
+        self.message: Optional[discord.Message] = None
+        self.page: Optional[Page] = None
+        self._cursors: List[Optional[str]] = [None]  # cursor of each visited page
+
+    @property
+    def number(self) -> int:
+        return len(self._cursors)
+
+    async def start(self, ctx) -> Optional[discord.Message]:
+        """Send the first page; returns None (nothing sent) if it is empty"""
+        self.page = await self.fetch(None)
+        if not self.page.items:
+            return None
+        self._update_buttons()
+        self.message = await ctx.send(embed=self.render(self.page, 1), view=self)
+        return self.message
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.number == 1
+        self.next_page.disabled = self.page.next_cursor is None
+
+    async def _show(self, interaction: discord.Interaction):
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.render(self.page, self.number), view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ This menu is not yours", ephemeral=True)
+            return False
+        return True
+
+    @ui.button(label="Prev", emoji="◀️", style=discord.ButtonStyle.secondary, custom_id=f"{PAGINATOR_ID_PREFIX}prev")
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        if self.number == 1:
+            await interaction.response.defer()
+            return
+        self.page = await self.fetch(self._cursors[-2])
+        self._cursors.pop()
+        await self._show(interaction)
+
+    @ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary, custom_id=f"{PAGINATOR_ID_PREFIX}next")
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        cursor = self.page.next_cursor
+        if cursor is None:
+            await interaction.response.defer()
+            return
+        page = await self.fetch(cursor)
+        if not page.items:
+            # Baris berikutnya sudah hilang sejak halaman ini diambil
+            self.page = Page(self.page.items, None)
+        else:
+            self.page = page
+            self._cursors.append(cursor)
+        await self._show(interaction)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException as e:
+                self.logger.debug(f"Could not disable paginator buttons: {e}")
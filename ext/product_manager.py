@@ -1,14 +1,21 @@
 import logging
-import asyncio
+import sqlite3
 import time
 from typing import Dict, List, Optional
 from datetime import datetime
 
-import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from .constants import STATUS_AVAILABLE, TransactionError
-from database import get_connection
+from .constants import (
+    STATUS_AVAILABLE,
+    STOCK_IMPORT_CHUNK_SIZE,
+    STOCK_RECONCILE_INTERVAL,
+    DEFAULT_PAGE_SIZE,
+    TransactionError
+)
+from database import get_db
+from utils.lock_manager import get_lock_manager
+from utils.pagination import Page, fetch_page
 
 class ProductManagerService:
     _instance = None
@@ -25,14 +32,14 @@ class ProductManagerService:
             self.logger = logging.getLogger("ProductManagerService")
             self._cache = {}
             self._cache_timeout = 60
-            self._locks = {}
+            self._locks = get_lock_manager("product")
+            # Available-stock count per product, adjusted after every stock write
+            self._stock_counts = {}
+            self._stock_counts_loaded = False
+            self._stock_writes = 0
+            self._stock_writes_inflight = 0
             self.initialized = True
 
-    async def _get_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
-
     def _get_cached(self, key: str):
         if key in self._cache:
             data = self._cache[key]
@@ -47,31 +54,100 @@ class ProductManagerService:
             'timestamp': time.time()
         }
 
+    async def _load_stock_counts(self) -> Dict[str, int]:
+        rows = await get_db().fetchall("""
+            SELECT p.code, COUNT(s.id) as count
+            FROM products p
+            LEFT JOIN stock s ON s.product_code = p.code AND s.status = ?
+            GROUP BY p.code
+        """, (STATUS_AVAILABLE,))
+        return {row['code']: row['count'] for row in rows}
+
+    def _apply_stock_deltas(self, deltas: Dict[str, int]):
+        if not self._stock_counts_loaded:
+            return
+        for code, delta in deltas.items():
+            self._stock_counts[code] = max(0, self._stock_counts.get(code, 0) + delta)
+
+    def _notify_stock_change(self, codes: List[str]):
+        """Dispatch on_stock_change so the live stock board can refresh"""
+        if codes:
+            self.bot.dispatch('stock_change', codes)
+
+    async def run_stock_write(self, fn, *args):
+        """Run a write job that changes available stock and keep the count index in step.
+
+        fn(conn, *args) returns (result, deltas) where deltas maps product
+        codes to the change in available items; the deltas are applied once
+        the write has committed and result is returned.
+        """
+        self._stock_writes += 1
+        self._stock_writes_inflight += 1
+        try:
+            result, deltas = await get_db().write(fn, *args)
+            self._apply_stock_deltas(deltas)
+            self._notify_stock_change([code for code, delta in deltas.items() if delta])
+            return result
+        finally:
+            self._stock_writes_inflight -= 1
+
+    async def reconcile_stock_counts(self) -> bool:
+        """Replace the count index with a fresh count from the database.
+
+        A snapshot taken while a stock write is in flight may or may not
+        include that write, so it is discarded and False is returned.
+        """
+        if self._stock_writes_inflight:
+            return False
+        started = self._stock_writes
+        counts = await self._load_stock_counts()
+        if self._stock_writes_inflight or self._stock_writes != started:
+            self.logger.debug("Stock count reconcile skipped, writes in flight")
+            return False
+
+        if self._stock_counts_loaded:
+            drift = {
+                code: (self._stock_counts.get(code, 0), count)
+                for code, count in counts.items()
+                if self._stock_counts.get(code, 0) != count
+            }
+            if drift:
+                self.logger.warning(f"Stock count index corrected (index, db): {drift}")
+        self._stock_counts = counts
+        self._stock_counts_loaded = True
+        return True
+
+    async def get_stock_counts(self) -> Dict[str, int]:
+        """Available stock per product code, served from the in-memory index"""
+        if self._stock_counts_loaded or await self.reconcile_stock_counts():
+            return dict(self._stock_counts)
+        # Index not loaded yet and writes are running; answer from the DB this time
+        return await self._load_stock_counts()
+
     async def create_product(self, code: str, name: str, price: int, description: str = None) -> Dict:
         # Validate input
         if not code or not name or price <= 0:
             raise ValueError("Invalid product details")
+
+        def _create(conn):
+            cursor = conn.cursor()
+            
+            # Check if product code already exists
+            cursor.execute("SELECT code FROM products WHERE code = ?", (code,))
+            if cursor.fetchone():
+                raise ValueError(f"Product code {code} already exists")
+            
+            cursor.execute(
+                """
+                INSERT INTO products (code, name, price, description, created_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                (code, name, price, description)
+            )
             
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        async with self._locks.acquire(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check if product code already exists
-                cursor.execute("SELECT code FROM products WHERE code = ?", (code,))
-                if cursor.fetchone():
-                    raise ValueError(f"Product code {code} already exists")
-                
-                cursor.execute(
-                    """
-                    INSERT INTO products (code, name, price, description, created_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (code, name, price, description)
-                )
-                
-                conn.commit()
+                await get_db().write(_create)
                 
                 result = {
                     'code': code,
@@ -84,96 +160,82 @@ class ProductManagerService:
                 # Update cache
                 self._set_cached(f"product_{code}", result)
                 self._cache.pop("all_products", None)  # Invalidate all products cache
+                self._notify_stock_change([code])
                 
                 self.logger.info(f"Created new product: {code} - {name} at {price} WLs")
                 return result
 
             except Exception as e:
                 self.logger.error(f"Error creating product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def edit_product(self, code: str, field: str, value: any) -> bool:
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        # Validate field
+        valid_fields = ['name', 'price', 'description']
+        if field not in valid_fields:
+            raise ValueError(f"Invalid field. Must be one of: {', '.join(valid_fields)}")
+
+        # Validate value based on field
+        if field == 'price' and (not isinstance(value, int) or value <= 0):
+            raise ValueError("Price must be a positive number")
+
+        def _edit(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE products SET {field} = ?, updated_at = CURRENT_TIMESTAMP WHERE code = ?",
+                (value, code)
+            )
+            
+            if cursor.rowcount == 0:
+                raise ValueError(f"Product {code} not found")
+
+        async with self._locks.acquire(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Validate field
-                valid_fields = ['name', 'price', 'description']
-                if field not in valid_fields:
-                    raise ValueError(f"Invalid field. Must be one of: {', '.join(valid_fields)}")
-
-                # Validate value based on field
-                if field == 'price' and (not isinstance(value, int) or value <= 0):
-                    raise ValueError("Price must be a positive number")
-                
-                cursor.execute(
-                    f"UPDATE products SET {field} = ?, updated_at = CURRENT_TIMESTAMP WHERE code = ?",
-                    (value, code)
-                )
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Product {code} not found")
-                    
-                conn.commit()
+                await get_db().write(_edit)
                 
                 # Invalidate cache
                 self.invalidate_cache(code)
+                self._notify_stock_change([code])
                 
                 self.logger.info(f"Updated product {code}: {field} = {value}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error editing product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def delete_product(self, code: str) -> bool:
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        def _delete(conn):
+            cursor = conn.cursor()
+            
+            # Check if product has stock
+            cursor.execute(
+                "SELECT COUNT(*) as count FROM stock WHERE product_code = ? AND status = ?",
+                (code, STATUS_AVAILABLE)
+            )
+            if cursor.fetchone()['count'] > 0:
+                raise ValueError("Cannot delete product with existing stock")
+            
+            cursor.execute("DELETE FROM products WHERE code = ?", (code,))
+            
+            if cursor.rowcount == 0:
+                raise ValueError(f"Product {code} not found")
+
+        async with self._locks.acquire(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check if product has stock
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM stock WHERE product_code = ? AND status = ?",
-                    (code, STATUS_AVAILABLE)
-                )
-                if cursor.fetchone()['count'] > 0:
-                    raise ValueError("Cannot delete product with existing stock")
-                
-                cursor.execute("DELETE FROM products WHERE code = ?", (code,))
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Product {code} not found")
-                    
-                conn.commit()
+                await get_db().write(_delete)
                 
                 # Invalidate cache
                 self.invalidate_cache(code)
+                self._stock_counts.pop(code, None)
+                self._notify_stock_change([code])
                 
                 self.logger.info(f"Deleted product: {code}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error deleting product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def get_product(self, code: str) -> Optional[Dict]:
         cached = self._get_cached(f"product_{code}")
@@ -181,15 +243,11 @@ class ProductManagerService:
             return cached
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
+            result = await get_db().fetchone(
                 "SELECT * FROM products WHERE code = ?",
                 (code,)
             )
             
-            result = cursor.fetchone()
             if result:
                 product = dict(result)
                 self._set_cached(f"product_{code}", product)
@@ -199,91 +257,160 @@ class ProductManagerService:
         except Exception as e:
             self.logger.error(f"Error getting product: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     async def get_all_products(self) -> List[Dict]:
-        cached = self._get_cached("all_products")
-        if cached:
-            return cached
-
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.*, 
-                       (SELECT COUNT(*) FROM stock WHERE product_code = p.code AND status = ?) as stock_count
-                FROM products p 
-                ORDER BY p.code
-            """, (STATUS_AVAILABLE,))
+            products = self._get_cached("all_products")
+            if not products:
+                rows = await get_db().fetchall("SELECT * FROM products ORDER BY code")
+                products = [dict(row) for row in rows]
+                self._set_cached("all_products", products)
             
-            products = [dict(row) for row in cursor.fetchall()]
-            self._set_cached("all_products", products)
-            return products
+            counts = await self.get_stock_counts()
+            return [
+                {**product, 'stock_count': counts.get(product['code'], 0)}
+                for product in products
+            ]
 
         except Exception as e:
             self.logger.error(f"Error getting all products: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def add_stock_item(self, product_code: str, content: str, added_by: str) -> bool:
         if not content.strip():
             raise ValueError("Stock content cannot be empty")
+
+        def _add(conn):
+            cursor = conn.cursor()
+            
+            # Verify product exists
+            cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+            if not cursor.fetchone():
+                raise ValueError(f"Product {product_code} not found")
+            
+            # Check if content already exists
+            cursor.execute("SELECT id FROM stock WHERE content = ? AND status = ?", 
+                         (content.strip(), STATUS_AVAILABLE))
+            if cursor.fetchone():
+                return False, {}
             
-        async with await self._get_lock(f"stock_{product_code}"):
-            conn = None
+            cursor.execute(
+                """
+                INSERT INTO stock (product_code, content, added_by, status, added_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                (product_code, content.strip(), added_by, STATUS_AVAILABLE)
+            )
+            return True, {product_code: 1}
+            
+        async with self._locks.acquire(f"stock_{product_code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Verify product exists
-                cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Product {product_code} not found")
-                
-                # Check if content already exists
-                cursor.execute("SELECT id FROM stock WHERE content = ? AND status = ?", 
-                             (content.strip(), STATUS_AVAILABLE))
-                if cursor.fetchone():
+                if not await self.run_stock_write(_add):
                     self.logger.warning(f"Stock content already exists and available: {content}")
                     return False
                 
-                cursor.execute(
-                    """
-                    INSERT INTO stock (product_code, content, added_by, status, added_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (product_code, content.strip(), added_by, STATUS_AVAILABLE)
-                )
-                
-                conn.commit()
-                
-                # Force invalidate cache
-                self._cache.pop(f"stock_count_{product_code}", None)
-                self._cache.pop("all_products", None)
-                
                 self.logger.info(f"Added stock item to {product_code} by {added_by}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error adding stock item: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
 
-    async def get_available_stock(self, product_code: str, quantity: int = 1) -> List[Dict]:
+    @staticmethod
+    def _import_stock_chunk(cursor, product_code: str, chunk: List[tuple], added_by: str, report: Dict):
+        """Insert one chunk of (line_no, content) pairs, recording the outcome per line.
+
+        Duplicates are resolved with a single IN lookup against the UNIQUE
+        content index, which inside the import transaction also sees rows
+        written by earlier chunks of the same file.
+        """
+        fresh = {}
+        for line_no, content in chunk:
+            if content in fresh:
+                report['duplicates'].append((line_no, content))
+            else:
+                fresh[content] = line_no
+
+        placeholders = ','.join('?' * len(fresh))
+        cursor.execute(f"SELECT content FROM stock WHERE content IN ({placeholders})", list(fresh))
+        for row in cursor.fetchall():
+            report['duplicates'].append((fresh.pop(row['content']), row['content']))
+
+        if not fresh:
+            return
+
+        insert = """
+            INSERT INTO stock (product_code, content, added_by, status, added_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """
+        cursor.execute("SAVEPOINT stock_chunk")
         try:
-            conn = get_connection()
+            cursor.executemany(
+                insert,
+                [(product_code, content, added_by, STATUS_AVAILABLE) for content in fresh]
+            )
+            cursor.execute("RELEASE stock_chunk")
+            report['added'] += len(fresh)
+        except sqlite3.Error:
+            # Satu baris gagal membatalkan seluruh executemany; ulangi per baris
+            cursor.execute("ROLLBACK TO stock_chunk")
+            cursor.execute("RELEASE stock_chunk")
+            for content, line_no in fresh.items():
+                try:
+                    cursor.execute(insert, (product_code, content, added_by, STATUS_AVAILABLE))
+                    report['added'] += 1
+                except sqlite3.Error as e:
+                    report['failed'].append((line_no, content, str(e)))
+
+    async def add_stock_bulk(self, product_code: str, lines: List[str], added_by: str,
+                             progress: Optional[Dict] = None, start_line: int = 1) -> Dict:
+        """Import many stock lines in one transaction.
+
+        lines are the raw lines of the uploaded file; blank lines are skipped
+        and report entries carry line numbers counted from start_line, so a
+        streamed file can be imported batch by batch. If progress is given,
+        progress['processed'] is advanced after every chunk so the caller can
+        poll it while the import runs.
+        """
+        entries = [(i, line.strip()) for i, line in enumerate(lines, start_line) if line.strip()]
+        if progress is not None:
+            progress.update(processed=0, total=len(entries))
+
+        def _import(conn):
             cursor = conn.cursor()
             
-            cursor.execute("""
+            # Verify product exists
+            cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+            if not cursor.fetchone():
+                raise ValueError(f"Product {product_code} not found")
+            
+            report = {'total': len(entries), 'added': 0, 'duplicates': [], 'failed': []}
+            for start in range(0, len(entries), STOCK_IMPORT_CHUNK_SIZE):
+                chunk = entries[start:start + STOCK_IMPORT_CHUNK_SIZE]
+                self._import_stock_chunk(cursor, product_code, chunk, added_by, report)
+                if progress is not None:
+                    progress['processed'] = start + len(chunk)
+            
+            report['duplicates'].sort()
+            return report, {product_code: report['added']}
+
+        async with self._locks.acquire(f"stock_{product_code}"):
+            try:
+                report = await self.run_stock_write(_import)
+                
+                self.logger.info(
+                    f"Imported stock for {product_code} by {added_by}: {report['added']} added, "
+                    f"{len(report['duplicates'])} duplicates, {len(report['failed'])} failed"
+                )
+                return report
+
+            except Exception as e:
+                self.logger.error(f"Error importing stock: {e}")
+                raise
+
+    async def get_available_stock(self, product_code: str, quantity: int = 1) -> List[Dict]:
+        try:
+            rows = await get_db().fetchall("""
                 SELECT id, content, added_at, added_by
                 FROM stock
                 WHERE product_code = ? AND status = ?
@@ -296,107 +423,82 @@ class ProductManagerService:
                 'content': row['content'],
                 'added_at': row['added_at'],
                 'added_by': row['added_by']
-            } for row in cursor.fetchall()]
+            } for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting available stock: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     async def get_stock_count(self, product_code: str) -> int:
-        cache_key = f"stock_count_{product_code}"
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            if self._stock_counts_loaded or await self.reconcile_stock_counts():
+                return self._stock_counts.get(product_code, 0)
+            
+            row = await get_db().fetchone("""
                 SELECT COUNT(*) as count 
                 FROM stock 
                 WHERE product_code = ? AND status = ?
             """, (product_code, STATUS_AVAILABLE))
-            
-            result = cursor.fetchone()['count']
-            self._set_cached(cache_key, result)
-            return result
+            return row['count']
 
         except Exception as e:
             self.logger.error(f"Error getting stock count: {e}")
             return 0
-        finally:
-            if conn:
-                conn.close()
 
     async def update_stock_status(self, stock_id: int, status: str, buyer_id: str = None) -> bool:
-        async with await self._get_lock(f"stock_{stock_id}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                update_query = """
-                    UPDATE stock 
-                    SET status = ?, updated_at = CURRENT_TIMESTAMP
-                """
-                params = [status]
+        def _update(conn):
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT product_code, status FROM stock WHERE id = ?", (stock_id,))
+            current = cursor.fetchone()
+            if not current:
+                raise TransactionError(f"Stock item {stock_id} not found")
+            
+            update_query = """
+                UPDATE stock 
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+            """
+            params = [status]
 
-                if buyer_id:
-                    update_query += ", buyer_id = ?"
-                    params.append(buyer_id)
+            if buyer_id:
+                update_query += ", buyer_id = ?"
+                params.append(buyer_id)
 
-                update_query += " WHERE id = ?"
-                params.append(stock_id)
+            update_query += " WHERE id = ?"
+            params.append(stock_id)
 
-                cursor.execute(update_query, params)
-                
-                if cursor.rowcount == 0:
-                    raise TransactionError(f"Stock item {stock_id} not found")
-                
-                conn.commit()
-                
-                # Invalidate related caches
-                cursor.execute("SELECT product_code FROM stock WHERE id = ?", (stock_id,))
-                result = cursor.fetchone()
-                if result:
-                    self._cache.pop(f"stock_count_{result['product_code']}", None)
-                    self._cache.pop("all_products", None)
+            cursor.execute(update_query, params)
+            
+            delta = (status == STATUS_AVAILABLE) - (current['status'] == STATUS_AVAILABLE)
+            return current['product_code'], {current['product_code']: delta}
+
+        async with self._locks.acquire(f"stock_{stock_id}"):
+            try:
+                await self.run_stock_write(_update)
                 
                 self.logger.info(f"Updated stock {stock_id} status to {status}" + (f" for {buyer_id}" if buyer_id else ""))
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error updating stock status: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
 
-    async def get_stock_history(self, product_code: str, limit: int = 10) -> List[Dict]:
+    async def get_stock_history(self, product_code: str, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> Page:
+        """One page of product_code's stock rows, newest first"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM stock 
-                WHERE product_code = ?
-                ORDER BY updated_at DESC
-                LIMIT ?
-            """, (product_code, limit))
-            
-            return [dict(row) for row in cursor.fetchall()]
+            return await fetch_page(
+                "SELECT * FROM stock",
+                "product_code = ?",
+                (product_code,),
+                limit,
+                cursor,
+                sort_column="added_at"
+            )
 
         except Exception as e:
             self.logger.error(f"Error getting stock history: {e}")
-            return []
-        finally:
-            if conn:
-                conn.close()
+            return Page([], None)
 
     async def get_world_info(self) -> Optional[Dict]:
         cached = self._get_cached("world_info")
@@ -404,11 +506,7 @@ class ProductManagerService:
             return cached
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM world_info WHERE id = 1")
-            result = cursor.fetchone()
+            result = await get_db().fetchone("SELECT * FROM world_info WHERE id = 1")
             
             if result:
                 info = dict(result)
@@ -419,27 +517,18 @@ class ProductManagerService:
         except Exception as e:
             self.logger.error(f"Error getting world info: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     async def update_world_info(self, world: str, owner: str, bot: str) -> bool:
         if not world or not owner or not bot:
             raise ValueError("World info fields cannot be empty")
             
-        async with await self._get_lock("world_info"):
-            conn = None
+        async with self._locks.acquire("world_info"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await get_db().execute("""
                     INSERT OR REPLACE INTO world_info (id, world, owner, bot, updated_at)
                     VALUES (1, ?, ?, ?, CURRENT_TIMESTAMP)
                 """, (world, owner, bot))
                 
-                conn.commit()
-                
                 # Invalidate cache
                 self._cache.pop("world_info", None)
                 
@@ -448,12 +537,7 @@ class ProductManagerService:
 
             except Exception as e:
                 self.logger.error(f"Error updating world info: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
                     
     async def reduce_stock(self, product_code: str, quantity: int, admin_id: str, reason: str = None) -> bool:
         """
@@ -461,74 +545,65 @@ class ProductManagerService:
         """
         if quantity <= 0:
             raise ValueError("Quantity must be positive")
-                
-        async with await self._get_lock(f"stock_{product_code}"):
-            conn = None
+
+        def _reduce(conn):
+            cursor = conn.cursor()
+            
+            # Check available stock first
+            cursor.execute("""
+                SELECT COUNT(*) as count 
+                FROM stock 
+                WHERE product_code = ? AND status = ?
+            """, (product_code, STATUS_AVAILABLE))
+            
+            available = cursor.fetchone()['count']
+            if available < quantity:
+                raise ValueError(f"Insufficient stock. Only {available} available.")
+            
+            # Get stock items to be reduced
+            cursor.execute("""
+                SELECT id 
+                FROM stock 
+                WHERE product_code = ? AND status = ?
+                ORDER BY added_at ASC
+                LIMIT ?
+            """, (product_code, STATUS_AVAILABLE, quantity))
+            
+            stock_items = cursor.fetchall()
+            if len(stock_items) < quantity:
+                raise ValueError(f"Could not get {quantity} items. Only found {len(stock_items)}.")
+            
+            # Update stock status to sold
+            stock_ids = [item['id'] for item in stock_items]
+            cursor.execute(f"""
+                UPDATE stock 
+                SET status = 'sold',
+                    updated_at = CURRENT_TIMESTAMP,
+                    seller_id = ?
+                WHERE id IN ({','.join('?' * len(stock_ids))})
+            """, [admin_id] + stock_ids)
+            
+            # Log admin action
+            cursor.execute("""
+                INSERT INTO admin_logs (admin_id, action, target, details)
+                VALUES (?, 'REDUCE_STOCK', ?, ?)
+            """, (
+                admin_id,
+                product_code,
+                f"Reduced {quantity} stock(s). Reason: {reason if reason else 'Not specified'}"
+            ))
+            return None, {product_code: -quantity}
+                
+        async with self._locks.acquire(f"stock_{product_code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check available stock first
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                """, (product_code, STATUS_AVAILABLE))
-                
-                available = cursor.fetchone()['count']
-                if available < quantity:
-                    raise ValueError(f"Insufficient stock. Only {available} available.")
-                
-                # Get stock items to be reduced
-                cursor.execute("""
-                    SELECT id 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                    ORDER BY added_at ASC
-                    LIMIT ?
-                """, (product_code, STATUS_AVAILABLE, quantity))
-                
-                stock_items = cursor.fetchall()
-                if len(stock_items) < quantity:
-                    raise ValueError(f"Could not get {quantity} items. Only found {len(stock_items)}.")
-                
-                # Update stock status to sold
-                stock_ids = [item['id'] for item in stock_items]
-                cursor.execute(f"""
-                    UPDATE stock 
-                    SET status = 'sold',
-                        updated_at = CURRENT_TIMESTAMP,
-                        seller_id = ?
-                    WHERE id IN ({','.join('?' * len(stock_ids))})
-                """, [admin_id] + stock_ids)
-                
-                # Log admin action
-                cursor.execute("""
-                    INSERT INTO admin_logs (admin_id, action, target, details)
-                    VALUES (?, 'REDUCE_STOCK', ?, ?)
-                """, (
-                    admin_id,
-                    product_code,
-                    f"Reduced {quantity} stock(s). Reason: {reason if reason else 'Not specified'}"
-                ))
-                
-                conn.commit()
-                
-                # Invalidate cache
-                self._cache.pop(f"stock_count_{product_code}", None)
-                self._cache.pop("all_products", None)
+                await self.run_stock_write(_reduce)
                 
                 self.logger.info(f"Admin {admin_id} reduced {quantity} stock(s) from {product_code}")
                 return True
     
             except Exception as e:
                 self.logger.error(f"Error reducing stock: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
                     
     def invalidate_cache(self, product_code: str = None):
         """Invalidate cache for specific product or all products"""
@@ -536,13 +611,15 @@ class ProductManagerService:
             keys_to_delete = [k for k in self._cache if product_code in k]
             for key in keys_to_delete:
                 del self._cache[key]
+            self._cache.pop("all_products", None)
         else:
             self._cache.clear()
 
     async def cleanup(self):
         """Cleanup resources"""
         self._cache.clear()
-        self._locks.clear()
+        self._stock_counts.clear()
+        self._stock_counts_loaded = False
 
 class ProductManagerCog(commands.Cog):
     def __init__(self, bot):
@@ -553,12 +630,22 @@ class ProductManagerCog(commands.Cog):
     async def cog_load(self):
         """Called when the cog is loaded"""
         self.logger.info("ProductManagerCog loading...")
+        self.reconcile_stock.start()
 
     async def cog_unload(self):
         """Called when the cog is unloaded"""
+        self.reconcile_stock.cancel()
         await self.product_service.cleanup()
         self.logger.info("ProductManagerCog unloaded")
 
+    @tasks.loop(seconds=STOCK_RECONCILE_INTERVAL)
+    async def reconcile_stock(self):
+        """Periodically re-sync the in-memory stock counts with the database"""
+        try:
+            await self.product_service.reconcile_stock_counts()
+        except Exception as e:
+            self.logger.error(f"Error reconciling stock counts: {e}")
+
 async def setup(bot):
     """Setup the ProductManager cog"""
     try:
@@ -1,6 +1,4 @@
 import logging
-import asyncio
-import time
 import io
 from typing import Dict, List, Optional
 from datetime import datetime
@@ -8,8 +6,126 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 
-from .constants import STATUS_AVAILABLE, STATUS_SOLD, TransactionError
-from database import get_connection
+from .constants import (
+    STATUS_AVAILABLE,
+    STATUS_SOLD,
+    LANE_BUYER,
+    LANE_LOG,
+    DEFAULT_PAGE_SIZE,
+    Balance,
+    TransactionError
+)
+from .product_manager import ProductManagerService
+from .outbox import OutboxService, enqueue
+from .message_scheduler import MessageScheduler
+from . import ledger
+from database import get_db
+from utils.lock_manager import get_lock_manager
+from utils.balance_cache import get_balance_cache
+from utils.pagination import Page, fetch_page
+
+def claim_purchase(conn, growid: str, product_code: str, quantity: int) -> Dict:
+    """Purchase quantity items of product_code for growid inside the caller's transaction.
+
+    Stock rows are claimed and the balance debited (ledger.post) with
+    conditional UPDATE ... RETURNING statements, so two buyers can never
+    receive the same row and a balance can never go negative, whatever the
+    caller's locking. The claim is the first statement, taking the write lock before
+    anything is read. Raises TransactionError (rolling the caller back) on
+    insufficient stock or balance.
+    """
+    cursor = conn.cursor()
+    
+    # Claim the oldest available rows; rows taken concurrently fail the status check
+    cursor.execute("""
+        UPDATE stock 
+        SET status = ?, buyer_id = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM stock
+            WHERE product_code = ? AND status = ?
+            ORDER BY added_at ASC
+            LIMIT ?
+        ) AND status = ?
+        RETURNING id, content
+    """, (STATUS_SOLD, growid, product_code, STATUS_AVAILABLE, quantity, STATUS_AVAILABLE))
+    stock_items = sorted(cursor.fetchall(), key=lambda item: item['id'])
+    if len(stock_items) < quantity:
+        raise TransactionError(f"Insufficient stock for {product_code}")
+    
+    # Get product details
+    cursor.execute(
+        "SELECT price, name FROM products WHERE code = ?",
+        (product_code,)
+    )
+    product = cursor.fetchone()
+    if not product:
+        raise TransactionError(f"Product {product_code} not found")
+    
+    total_price = product['price'] * quantity
+    
+    # Debit only if the balance covers the price; records the transaction
+    entry = ledger.post(
+        conn, growid, -total_price, 'PURCHASE', f"Purchased {quantity} {product_code}",
+        total_price=total_price, product_code=product_code, quantity=quantity
+    )
+    
+    return {
+        'success': True,
+        'order_id': entry.transaction_id,
+        'items': [dict(item) for item in stock_items],
+        'total_price': total_price,
+        'new_balance': entry.new_balance,
+        'balance': Balance(entry.new_balance),
+        'balance_version': entry.version,
+        'product_name': product['name']
+    }
+
+def refund_purchase(conn, transaction_id: int, admin_id: str):
+    """Cancel PURCHASE transaction_id inside the caller's transaction.
+
+    Refunds total_price through ledger.post and puts up to the order's
+    quantity of the buyer's sold rows of the order's product back on sale,
+    newest sale first. Product and quantity come from the purchase row
+    itself. Returns ((growid, LedgerEntry), {product_code: restored rows})
+    for ProductManagerService.run_stock_write; raises ValueError if there
+    is no such purchase.
+    """
+    cursor = conn.cursor()
+    
+    # Get transaction details
+    cursor.execute(
+        "SELECT * FROM transactions WHERE id = ? AND type = 'PURCHASE'",
+        (transaction_id,)
+    )
+    
+    trx = cursor.fetchone()
+    if not trx:
+        raise ValueError(f"Transaction {transaction_id} not found")
+    
+    product_code = trx['product_code']
+    quantity = trx['quantity'] or trx['items_count'] or 1
+    
+    # Restore the buyer's most recently sold rows of this order's product
+    cursor.execute("""
+        UPDATE stock SET status = ?, buyer_id = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM stock
+            WHERE product_code = ? AND buyer_id = ? AND status = ?
+            ORDER BY updated_at DESC, id DESC
+            LIMIT ?
+        )
+        RETURNING id
+    """, (STATUS_AVAILABLE, product_code, trx['growid'], STATUS_SOLD, quantity))
+    restored = len(cursor.fetchall())
+    
+    # Restore user balance and record the refund
+    refunded = ledger.post(
+        conn, trx['growid'], trx['total_price'], 'REFUND', f"Refund for transaction #{transaction_id}",
+        product_code=product_code, quantity=quantity, order_id=transaction_id,
+        related_transaction_id=transaction_id, admin_id=admin_id
+    )
+    
+    return (trx['growid'], refunded), {product_code: restored}
 
 class TransactionManager:
     _instance = None
@@ -24,305 +140,205 @@ class TransactionManager:
         if not self.initialized:
             self.bot = bot
             self.logger = logging.getLogger("TransactionManager")
+            self.product_manager = ProductManagerService(bot)
+            self.outbox = OutboxService(bot)
+            self.scheduler = MessageScheduler(bot)
+            self.outbox.register_handler('purchase_dm', self._deliver_purchase_dm)
+            self.outbox.register_handler('purchase_log', self._deliver_purchase_log)
             self._cache = {}
             self._cache_timeout = 30
-            self._locks = {}
+            self._locks = get_lock_manager("transaction")
             self.initialized = True
 
-    async def _get_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
+    def build_purchase_file(self, user: discord.User, items: list, product_name: str) -> discord.File:
+        # Create txt file content
+        content = f"Purchase Result for {user.name}\n"
+        content += f"Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n"
+        content += f"Product: {product_name}\n"
+        content += "-" * 50 + "\n\n"
+        
+        # Add all purchased items
+        for idx, item in enumerate(items, 1):
+            content += f"Item {idx}:\n{item['content']}\n\n"
+        
+        return discord.File(
+            io.BytesIO(content.encode('utf-8')),
+            filename=f"result_{user.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
+        )
 
     async def send_purchase_result(self, user: discord.User, items: list, product_name: str) -> bool:
+        """DM the purchase result; False if the user does not accept DMs, other errors propagate"""
         try:
-            # Create txt file content
-            content = f"Purchase Result for {user.name}\n"
-            content += f"Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n"
-            content += f"Product: {product_name}\n"
-            content += "-" * 50 + "\n\n"
-            
-            # Add all purchased items
-            for idx, item in enumerate(items, 1):
-                content += f"Item {idx}:\n{item['content']}\n\n"
-            
-            # Create txt file
-            file = discord.File(
-                io.StringIO(content),
-                filename=f"result_{user.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
-            )
-            
-            # Send DM to user
-            await user.send(
+            await self.scheduler.send(LANE_BUYER, f"dm:{user.id}", lambda: user.send(
                 "Here is your purchase result:",
-                file=file
-            )
+                file=self.build_purchase_file(user, items, product_name)
+            ))
             self.logger.info(f"Purchase result sent to user {user.name} ({user.id})")
             return True
             
         except discord.Forbidden:
             self.logger.warning(f"Cannot send DM to user {user.name} ({user.id})")
             return False
-        except Exception as e:
-            self.logger.error(f"Error sending purchase result to {user.name} ({user.id}): {e}")
-            return False
 
-    async def process_purchase(self, growid: str, product_code: str, quantity: int = 1) -> Optional[Dict]:
-        async with await self._get_lock(f"purchase_{growid}_{product_code}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Get product details
-                cursor.execute(
-                    "SELECT price, name FROM products WHERE code = ?",
-                    (product_code,)  # Removed ()
-                )
-                product = cursor.fetchone()
-                if not product:
-                    raise TransactionError(f"Product {product_code} not found")
-                
-                total_price = product['price'] * quantity
-                
-                # Get available stock
-                cursor.execute("""
-                    SELECT id, content 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                    ORDER BY added_at ASC
-                    LIMIT ?
-                """, (product_code, STATUS_AVAILABLE, quantity))
-                
-                stock_items = cursor.fetchall()
-                if len(stock_items) < quantity:
-                    raise TransactionError(f"Insufficient stock for {product_code}")
-                
-                # Get user balance - case-sensitive
-                cursor.execute(
-                    "SELECT balance_wl FROM users WHERE growid = ? COLLATE binary",
-                    (growid,)
-                )
-                user = cursor.fetchone()
-                if not user:
-                    raise TransactionError(f"User {growid} not found")
-                
-                if user['balance_wl'] < total_price:
-                    raise TransactionError("Insufficient balance")
-                
-                # Update stock status
-                stock_ids = [item['id'] for item in stock_items]
-                cursor.execute(f"""
-                    UPDATE stock 
-                    SET status = ?, buyer_id = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id IN ({','.join('?' * len(stock_ids))})
-                """, [STATUS_SOLD, growid] + stock_ids)
-                
-                # Update user balance
-                new_balance = user['balance_wl'] - total_price
-                cursor.execute(
-                    "UPDATE users SET balance_wl = ? WHERE growid = ? COLLATE binary",
-                    (new_balance, growid)
-                )
-                
-                # Record transaction and get order_id
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, items_count, total_price)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    RETURNING id
-                    """,
-                    (
-                        growid,
-                        'PURCHASE',
-                        f"Purchased {quantity} {product_code}",
-                        str(user['balance_wl']) + " WL",
-                        str(new_balance) + " WL",
-                        quantity,
-                        total_price
-                    )
-                )
-                
-                order_id = cursor.fetchone()['id']
-                conn.commit()
-                
-                return {
-                    'success': True,
-                    'order_id': order_id,  # Added order_id
-                    'items': [dict(item) for item in stock_items],
-                    'total_price': total_price,
-                    'new_balance': new_balance,
-                    'product_name': product['name']
-                }
+    async def _get_user(self, discord_id: int) -> discord.User:
+        return self.bot.get_user(discord_id) or await self.bot.fetch_user(discord_id)
 
-            except Exception as e:
-                self.logger.error(f"Error processing purchase: {e}")
-                if conn:
-                    conn.rollback()
-                raise
-            finally:
-                if conn:
-                    conn.close()
+    async def _deliver_purchase_dm(self, payload: Dict) -> bool:
+        user = await self._get_user(payload['discord_id'])
+        return await self.send_purchase_result(user, payload['items'], payload['product_name'])
 
-    async def log_purchase_to_channel(self, order_id: int, user: discord.User, product_code: str, total: int, price: float) -> bool:
-        """Log purchase to buy-logs channel"""
+    async def _deliver_purchase_log(self, payload: Dict) -> bool:
+        user = await self._get_user(payload['discord_id'])
+        return await self.log_purchase_to_channel(
+            order_id=payload['order_id'],
+            user=user,
+            product_code=payload['product_code'],
+            total=payload['quantity'],
+            price=payload['total_price']
+        )
+
+    async def process_purchase(self, growid: str, product_code: str, quantity: int = 1,
+                               discord_id: Optional[int] = None) -> Optional[Dict]:
+        def _purchase(conn):
+            result = claim_purchase(conn, growid, product_code, quantity)
+            
+            # DM dan log pembelian masuk outbox dalam transaksi yang sama
+            if discord_id:
+                enqueue(conn, 'purchase_dm', {
+                    'discord_id': int(discord_id),
+                    'order_id': result['order_id'],
+                    'product_name': result['product_name'],
+                    'items': [{'content': item['content']} for item in result['items']]
+                })
+                enqueue(conn, 'purchase_log', {
+                    'discord_id': int(discord_id),
+                    'order_id': result['order_id'],
+                    'product_code': product_code,
+                    'quantity': quantity,
+                    'total_price': result['total_price']
+                })
+            return result, {product_code: -quantity}
+
+        # Klaim stock dan debit saldo bersyarat di SQL, jadi tidak perlu lock per pembeli
         try:
-            # Get buy-logs channel
-            channel = self.bot.get_channel(self.bot.log_purchase_channel_id)
-            if not channel:
-                self.logger.error(f"Could not find buy-logs channel with ID {self.bot.log_purchase_channel_id}")
-                return False
-                
-            # Create message content
-            content = "Purchase History\n"
-            content += f"Order ID: # {order_id}\n"
-            content += f"➜ Buyer: @{user.name}\n"
-            content += f"➜ Product ID: {product_code}\n"
-            content += f"➜ Total: {total}\n"
-            content += f"➜ Price: {price} 💎"
-
-            await channel.send(content)
-            self.logger.info(f"Purchase log sent for order #{order_id}")
-            return True
+            result = await self.product_manager.run_stock_write(_purchase)
+            get_balance_cache().put(growid, result['balance'], result['balance_version'])
+            if discord_id:
+                self.outbox.wake()
+            return result
 
         except Exception as e:
-            self.logger.error(f"Error sending purchase log: {e}")
+            self.logger.error(f"Error processing purchase: {e}")
+            raise
+
+    async def log_purchase_to_channel(self, order_id: int, user: discord.User, product_code: str, total: int, price: float) -> bool:
+        """Log purchase to buy-logs channel; False if the channel is missing, send errors propagate"""
+        # Get buy-logs channel
+        channel = self.bot.get_channel(self.bot.log_purchase_channel_id)
+        if not channel:
+            self.logger.error(f"Could not find buy-logs channel with ID {self.bot.log_purchase_channel_id}")
             return False
+            
+        # Create message content
+        content = "Purchase History\n"
+        content += f"Order ID: # {order_id}\n"
+        content += f"➜ Buyer: @{user.name}\n"
+        content += f"➜ Product ID: {product_code}\n"
+        content += f"➜ Total: {total}\n"
+        content += f"➜ Price: {price} 💎"
+
+        await self.scheduler.send(LANE_LOG, f"channel:{channel.id}", lambda: channel.send(content))
+        self.logger.info(f"Purchase log sent for order #{order_id}")
+        return True
 
     # [Rest of existing methods remain unchanged]
-    async def get_user_purchases(self, growid: str, limit: int = 10) -> List[Dict]:
+    async def get_user_purchases(self, growid: str, limit: int = DEFAULT_PAGE_SIZE,
+                                 cursor: Optional[str] = None) -> Page:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT t.*, s.content, p.name as product_name
-                FROM transactions t
-                JOIN stock s ON s.buyer_id = t.growid
-                JOIN products p ON p.code = s.product_code
-                WHERE t.growid = ? AND t.type = 'PURCHASE'
-                ORDER BY t.created_at DESC
-                LIMIT ?
-            """, (growid, limit))
-            
-            return [dict(row) for row in cursor.fetchall()]
+            return await fetch_page(
+                """SELECT t.*, p.name as product_name
+                   FROM transactions t
+                   LEFT JOIN products p ON p.code = t.product_code""",
+                "t.growid = ? COLLATE binary AND t.type = 'PURCHASE'",
+                (growid,),
+                limit,
+                cursor,
+                sort_column="t.created_at",
+                id_column="t.id"
+            )
 
         except Exception as e:
             self.logger.error(f"Error getting user purchases: {e}")
-            return []
-        finally:
-            if conn:
-                conn.close()
+            return Page([], None)
 
     async def cancel_transaction(self, transaction_id: int, admin_id: str) -> bool:
-        async with await self._get_lock(f"cancel_transaction_{transaction_id}"):
-            conn = None
+        async with self._locks.acquire(f"cancel_transaction_{transaction_id}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Get transaction details
-                cursor.execute("""
-                    SELECT t.*, s.id as stock_id
-                    FROM transactions t
-                    JOIN stock s ON s.buyer_id = t.growid
-                    WHERE t.id = ? AND t.type = 'PURCHASE'
-                """, (transaction_id,))
-                
-                trx = cursor.fetchone()
-                if not trx:
-                    raise ValueError(f"Transaction {transaction_id} not found")
-                
-                # Restore stock status
-                cursor.execute(
-                    "UPDATE stock SET status = ?, buyer_id = NULL WHERE id = ?",
-                    (STATUS_AVAILABLE, trx['stock_id'])
-                )
-                
-                # Restore user balance
-                cursor.execute(
-                    "UPDATE users SET balance_wl = balance_wl + ? WHERE growid = ?",
-                    (trx['total_price'], trx['growid'])
-                )
-                
-                # Record refund transaction
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, related_transaction_id, admin_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        trx['growid'],
-                        'REFUND',
-                        f"Refund for transaction #{transaction_id}",
-                        f"{trx['new_balance']} WL",
-                        f"{trx['new_balance'] + trx['total_price']} WL",
-                        transaction_id,
-                        admin_id
-                    )
-                )
-                
-                conn.commit()
+                growid, refunded = await self.product_manager.run_stock_write(refund_purchase, transaction_id, admin_id)
+                if refunded:
+                    get_balance_cache().put(growid, Balance(refunded.new_balance), refunded.version)
                 self.logger.info(f"Transaction {transaction_id} cancelled by admin {admin_id}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error cancelling transaction: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
-    async def get_transaction_history(self, growid: str, limit: int = 10) -> List[Dict]:
+    async def get_transaction_history(self, growid: str, limit: int = DEFAULT_PAGE_SIZE,
+                                      cursor: Optional[str] = None) -> Page:
+        """One page of growid's transactions, newest first; pass page.next_cursor for the next"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM transactions 
-                WHERE growid = ? COLLATE binary
-                ORDER BY created_at DESC
-                LIMIT ?
-            """, (growid, limit))
-            
-            return [dict(row) for row in cursor.fetchall()]
+            return await fetch_page(
+                "SELECT * FROM transactions",
+                "growid = ? COLLATE binary",
+                (growid,),
+                limit,
+                cursor
+            )
 
         except Exception as e:
             self.logger.error(f"Error getting transaction history: {e}")
-            return []
-        finally:
-            if conn:
-                conn.close()
+            return Page([], None)
+
+    async def get_stock_history(self, product_code: str, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> Page:
+        return await self.product_manager.get_stock_history(product_code, limit, cursor)
+
+    async def get_sales_report(self, hours: int = 24, product_code: Optional[str] = None) -> List[Dict]:
+        """Per-product sales over the last hours from the typed ledger columns, best selling first.
+
+        Revenue is net of refunds (amount_delta is negative for purchases).
+        """
+        query = """
+            SELECT product_code,
+                   SUM(CASE WHEN type = 'PURCHASE' THEN 1 ELSE 0 END) as orders,
+                   SUM(CASE WHEN type = 'PURCHASE' THEN quantity ELSE -quantity END) as items,
+                   -SUM(amount_delta) as revenue,
+                   SUM(CASE WHEN type = 'REFUND' THEN 1 ELSE 0 END) as refunds
+            FROM transactions
+        """
+        since = f"-{max(1, hours)} hours"
+        if product_code:
+            # Range scan on idx_transactions_product
+            query += "WHERE product_code = ? AND created_at >= datetime('now', ?) AND type IN ('PURCHASE', 'REFUND')"
+            params = (product_code, since)
+        else:
+            # Range scans on idx_transactions_type_created
+            query += "WHERE type IN ('PURCHASE', 'REFUND') AND created_at >= datetime('now', ?) AND product_code IS NOT NULL"
+            params = (since,)
+        query += " GROUP BY product_code ORDER BY items DESC"
 
-    async def get_stock_history(self, product_code: str, limit: int = 10) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM stock 
-                WHERE product_code = ?
-                ORDER BY updated_at DESC
-                LIMIT ?
-            """, (product_code, limit))
-            
-            return [dict(row) for row in cursor.fetchall()]
+            rows = await get_db().fetchall(query, params)
+            return [dict(row) for row in rows]
 
         except Exception as e:
-            self.logger.error(f"Error getting stock history: {e}")
+            self.logger.error(f"Error getting sales report: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def cleanup(self):
         """Cleanup resources"""
         self._cache.clear()
-        self._locks.clear()
 
 class TransactionCog(commands.Cog):
     def __init__(self, bot):
@@ -330,6 +346,13 @@ class TransactionCog(commands.Cog):
         self.trx_manager = TransactionManager(bot)
         self.logger = logging.getLogger("TransactionCog")
 
+    async def cog_load(self):
+        """Start delivering queued purchase DMs and logs, including ones left from before a restart"""
+        self.trx_manager.outbox.start()
+
+    async def cog_unload(self):
+        await self.trx_manager.outbox.stop()
+
     @commands.Cog.listener()
     async def on_ready(self):
         self.logger.info(f"TransactionCog is ready at {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
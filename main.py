@@ -1,13 +1,12 @@
 import discord
 from discord.ext import commands
 import os
-import json
 import logging
 import asyncio
 import aiohttp
 import sqlite3
 from pathlib import Path
-from database import setup_database, get_connection
+from database import setup_database, init_pool, close_pool, run_online_migrations, DEFAULT_POOL_SIZE
 from datetime import datetime
 from utils.command_handler import AdvancedCommandHandler
 from utils.button_handler import ButtonHandler
@@ -17,6 +16,9 @@ from threading import Thread
 from api.routes import router as api_router
 from api.middleware import setup_middleware
 from api.dependencies import get_bot_instance
+from ext.message_scheduler import MessageScheduler
+from ext.broadcast import BroadcastService
+from utils.config import ConfigService, ConfigError
 
 # Setup logging dengan file handler
 log_dir = Path('logs')
@@ -34,60 +36,12 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Load config dengan validasi
-def load_config():
-    required_keys = {
-        'token': str,
-        'guild_id': (int, str),
-        'admin_id': (int, str),
-        'id_live_stock': (int, str),
-        'id_log_purch': (int, str),
-        'id_donation_log': (int, str),
-        'id_history_buy': (int, str),
-        'channels': dict,
-        'roles': dict,
-        'cooldowns': dict,
-        'permissions': dict,
-        'rate_limits': dict
-    }
-    
-    try:
-        with open('config.json', 'r') as config_file:
-            config = json.load(config_file)
-
-        # Validate and convert types
-        for key, expected_type in required_keys.items():
-            if key not in config:
-                raise KeyError(f"Missing required key: {key}")
-            
-            # Handle multiple allowed types
-            if isinstance(expected_type, tuple):
-                if not isinstance(config[key], expected_type):
-                    config[key] = expected_type[0](config[key])
-            else:
-                if not isinstance(config[key], expected_type):
-                    config[key] = expected_type(config[key])
-
-        return config
-
-    except FileNotFoundError:
-        logger.error("config.json file not found!")
-        raise
-    except json.JSONDecodeError:
-        logger.error("config.json is not valid JSON!")
-        raise
-    except (KeyError, ValueError) as e:
-        logger.error(f"Configuration error: {e}")
-        raise
-
-# Load config
-config = load_config()
-TOKEN = config['token']
-GUILD_ID = int(config['guild_id'])
-ADMIN_ID = int(config['admin_id'])
-LIVE_STOCK_CHANNEL_ID = int(config['id_live_stock'])
-LOG_PURCHASE_CHANNEL_ID = int(config['id_log_purch'])
-DONATION_LOG_CHANNEL_ID = int(config['id_donation_log'])
-HISTORY_BUY_CHANNEL_ID = int(config['id_history_buy'])
+try:
+    config = ConfigService().load()
+except ConfigError as e:
+    logger.error(f"Configuration error: {e}")
+    raise
+TOKEN = config.token
 
 # Inisialisasi FastAPI
 app = FastAPI(
@@ -123,15 +77,38 @@ class MyBot(commands.Bot):
         self._command_handler_ready = False
         self.button_handler = ButtonHandler(self)  # Initialize button handler
         self.session = None
-        self.admin_id = ADMIN_ID
-        self.guild_id = GUILD_ID
-        self.live_stock_channel_id = LIVE_STOCK_CHANNEL_ID
-        self.log_purchase_channel_id = LOG_PURCHASE_CHANNEL_ID
-        self.donation_log_channel_id = DONATION_LOG_CHANNEL_ID
-        self.history_buy_channel_id = HISTORY_BUY_CHANNEL_ID
-        self.config = config
+        self.config_service = ConfigService()
         self.startup_time = datetime.utcnow()
 
+    # Dibaca dari config aktif agar perubahan config.json langsung berlaku
+    @property
+    def config(self):
+        return self.config_service.config
+
+    @property
+    def admin_id(self) -> int:
+        return self.config.admin_id
+
+    @property
+    def guild_id(self) -> int:
+        return self.config.guild_id
+
+    @property
+    def live_stock_channel_id(self) -> int:
+        return self.config.id_live_stock
+
+    @property
+    def log_purchase_channel_id(self) -> int:
+        return self.config.id_log_purch
+
+    @property
+    def donation_log_channel_id(self) -> int:
+        return self.config.id_donation_log
+
+    @property
+    def history_buy_channel_id(self) -> int:
+        return self.config.id_history_buy
+
     async def setup_hook(self):
         """Initialize bot components"""
         try:
@@ -140,6 +117,7 @@ class MyBot(commands.Bot):
                 self._command_handler_ready = True
                 
             self.session = aiohttp.ClientSession()
+            self.config_service.start()
             
             # Load extensions with proper error handling
             extensions = [
@@ -163,6 +141,9 @@ class MyBot(commands.Bot):
                     logger.error(f'❌ Failed to load {ext}: {e}')
                     logger.exception(f"Detailed error loading {ext}:")
                     continue
+            
+            # Index builds and backfills run in the background once the bot is up
+            self.migration_task = asyncio.create_task(run_online_migrations())
                     
         except Exception as e:
             logger.error(f"Fatal error in setup_hook: {e}")
@@ -172,6 +153,14 @@ class MyBot(commands.Bot):
         """Cleanup when bot shuts down"""
         logger.info("Bot shutting down...")
         try:
+            # Broadcast menyimpan checkpoint terakhir sebelum scheduler berhenti
+            await self.config_service.stop()
+            await BroadcastService(self).stop()
+            if self._command_handler_ready:
+                # Digest terakhir dikirim sebelum scheduler berhenti
+                await self.command_handler.log_shipper.stop()
+                await self.command_handler.analytics.stop()
+            await MessageScheduler(self).stop()
             if self.session:
                 await self.session.close()
         except Exception as e:
@@ -198,8 +187,8 @@ class MyBot(commands.Bot):
                 'Purchase Log': self.log_purchase_channel_id,
                 'Donation Log': self.donation_log_channel_id,
                 'History Buy': self.history_buy_channel_id,
-                'Music': int(self.config['channels']['music']),
-                'Logs': int(self.config['channels']['logs'])
+                'Music': self.config.channels['music'],
+                'Logs': self.config.channels['logs']
             }
 
             for name, channel_id in channels.items():
@@ -283,6 +272,7 @@ def run_bot():
     try:
         # Setup database
         setup_database()
+        init_pool(config.db_pool_size or DEFAULT_POOL_SIZE)
         
         # Create bot instance
         bot = MyBot()
@@ -304,11 +294,9 @@ def run_bot():
     finally:
         # Cleanup
         try:
-            conn = get_connection()
-            if conn:
-                conn.close()
+            close_pool()
         except Exception as e:
-            logger.error(f"Error closing database connection: {e}")
+            logger.error(f"Error closing database connection pool: {e}")
 
 if __name__ == '__main__':
     run_bot()
\ No newline at end of file
@@ -0,0 +1,601 @@
+"""Ordered schema migrations for shop.db.
+
+Every migration runs once and is recorded in the schema_version table.
+Applied migrations must never be edited; schema changes are made by
+appending a new entry to MIGRATIONS.
+
+Blocking migrations are applied by database.setup_database() before the
+bot starts, each in its own transaction. Online migrations (index builds,
+backfills) are applied by database.run_online_migrations() once the bot is
+running, through the write queue, so live writes queue behind them instead
+of failing with "database is locked". An online migration's apply(conn) is
+called repeatedly, one write job per call, for as long as it returns True,
+which lets long backfills work in short batches. Blocking migrations must
+not depend on online ones.
+
+Running this module regenerates schema.sql from a scratch database.
+"""
+import re
+from collections import namedtuple
+from typing import Optional
+
+Migration = namedtuple('Migration', ['version', 'name', 'apply', 'online'])
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row['name'] == column for row in cursor.fetchall())
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    # Databases patched by hand may already have the column
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _initial_schema(conn):
+    """Schema as created by setup_database before versioning"""
+    cursor = conn.cursor()
+
+    # Create users table first (parent table)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            growid TEXT PRIMARY KEY,
+            balance_wl INTEGER DEFAULT 0,
+            balance_dl INTEGER DEFAULT 0,
+            balance_bgl INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create user_discord mapping table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_growid (
+            discord_id TEXT PRIMARY KEY,
+            growid TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    # Create products table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create stock table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code TEXT NOT NULL,
+            content TEXT NOT NULL UNIQUE,
+            status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+            added_by TEXT NOT NULL,
+            buyer_id TEXT,
+            seller_id TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+        )
+    """)
+
+    # Create transactions table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            growid TEXT NOT NULL,
+            type TEXT NOT NULL,
+            details TEXT NOT NULL,
+            old_balance TEXT,
+            new_balance TEXT,
+            items_count INTEGER DEFAULT 0,
+            total_price INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    # Create world_info table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS world_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            world TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            bot TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create bot_settings table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bot_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create blacklist table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            growid TEXT PRIMARY KEY,
+            added_by TEXT NOT NULL,
+            reason TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    # Create admin_logs table (NEW)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create role_permissions table (NEW)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            role_id TEXT PRIMARY KEY,
+            permissions TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create user_activity table (NEW)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (discord_id) REFERENCES user_growid(discord_id)
+        )
+    """)
+
+    # Create cache_table (NEW)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_table (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create triggers
+    triggers = [
+        ("""
+        CREATE TRIGGER IF NOT EXISTS update_users_timestamp 
+        AFTER UPDATE ON users
+        BEGIN
+            UPDATE users SET updated_at = CURRENT_TIMESTAMP
+            WHERE growid = NEW.growid;
+        END;
+        """),
+        ("""
+        CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
+        AFTER UPDATE ON products
+        BEGIN
+            UPDATE products SET updated_at = CURRENT_TIMESTAMP
+            WHERE code = NEW.code;
+        END;
+        """),
+        ("""
+        CREATE TRIGGER IF NOT EXISTS update_stock_timestamp 
+        AFTER UPDATE ON stock
+        BEGIN
+            UPDATE stock SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.id;
+        END;
+        """),
+        ("""
+        CREATE TRIGGER IF NOT EXISTS update_bot_settings_timestamp 
+        AFTER UPDATE ON bot_settings
+        BEGIN
+            UPDATE bot_settings SET updated_at = CURRENT_TIMESTAMP
+            WHERE key = NEW.key;
+        END;
+        """),
+        # New trigger for role_permissions
+        ("""
+        CREATE TRIGGER IF NOT EXISTS update_role_permissions_timestamp 
+        AFTER UPDATE ON role_permissions
+        BEGIN
+            UPDATE role_permissions SET updated_at = CURRENT_TIMESTAMP
+            WHERE role_id = NEW.role_id;
+        END;
+        """)
+    ]
+
+    for trigger in triggers:
+        cursor.execute(trigger)
+
+    # Create indexes
+    indexes = [
+        ("idx_user_growid_discord", "user_growid(discord_id)"),
+        ("idx_user_growid_growid", "user_growid(growid)"),
+        ("idx_stock_product_code", "stock(product_code)"),
+        ("idx_stock_status", "stock(status)"),
+        ("idx_stock_content", "stock(content)"),
+        ("idx_transactions_growid", "transactions(growid)"),
+        ("idx_transactions_created", "transactions(created_at)"),
+        ("idx_blacklist_growid", "blacklist(growid)"),
+        # New indexes
+        ("idx_admin_logs_admin", "admin_logs(admin_id)"),
+        ("idx_admin_logs_created", "admin_logs(created_at)"),
+        ("idx_user_activity_discord", "user_activity(discord_id)"),
+        ("idx_user_activity_type", "user_activity(activity_type)"),
+        ("idx_role_permissions_role", "role_permissions(role_id)"),
+        ("idx_cache_expires", "cache_table(expires_at)")
+    ]
+
+    for idx_name, idx_cols in indexes:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_cols}")
+
+    # Insert default world info if not exists
+    cursor.execute("""
+        INSERT OR IGNORE INTO world_info (id, world, owner, bot)
+        VALUES (1, 'YOURWORLD', 'OWNER', 'BOT')
+    """)
+
+    # Insert default role permissions if not exists
+    cursor.execute("""
+        INSERT OR IGNORE INTO role_permissions (role_id, permissions)
+        VALUES ('admin', 'all')
+    """)
+
+def _transaction_references(conn):
+    """Columns written by transfer_balance and cancel_transaction"""
+    cursor = conn.cursor()
+    _add_column(cursor, "transactions", "related_growid", "TEXT")
+    _add_column(cursor, "transactions", "related_transaction_id", "INTEGER")
+    _add_column(cursor, "transactions", "admin_id", "TEXT")
+
+def _admins_table(conn):
+    """Dashboard logins read by api.admin AdminService.verify_admin"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            username TEXT PRIMARY KEY,
+            password_hash BLOB NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _stock_available_index(conn):
+    """Partial index for the stock hot path: available items per product in FIFO order.
+    Only unsold rows are indexed, so it stays small as sales accumulate."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_available
+        ON stock(product_code, status, added_at)
+        WHERE status = 'available'
+    """)
+
+def _outbox_table(conn):
+    """Durable queue of purchase DMs and log posts, written in the purchase transaction"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+        ON outbox(next_attempt_at)
+        WHERE status = 'pending'
+    """)
+
+def _broadcast_tables(conn):
+    """Checkpointed DM broadcasts (announcements, maintenance notices)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_by TEXT,
+            channel_id INTEGER,
+            progress_message_id INTEGER,
+            status TEXT DEFAULT 'running' CHECK (status IN ('running', 'done', 'cancelled')),
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            broadcast_id INTEGER NOT NULL,
+            discord_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+            error TEXT,
+            PRIMARY KEY (broadcast_id, discord_id),
+            FOREIGN KEY (broadcast_id) REFERENCES broadcasts(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+
+def _command_analytics_tables(conn):
+    """Hourly command usage with HyperLogLog sketches, and logged command errors"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS command_usage_hourly (
+            command TEXT NOT NULL,
+            hour TIMESTAMP NOT NULL,
+            uses INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            users_hll BLOB,
+            channels_hll BLOB,
+            PRIMARY KEY (command, hour)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_command_usage_hour ON command_usage_hourly(hour)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS command_errors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            command TEXT NOT NULL,
+            error_type TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_command_errors_created ON command_errors(created_at)")
+
+def _balance_version(conn):
+    """Row version bumped by every balance write, used by the balance cache"""
+    cursor = conn.cursor()
+    _add_column(cursor, "users", "balance_version", "INTEGER NOT NULL DEFAULT 0")
+
+def _single_balance(conn):
+    """Fold balance_wl/dl/bgl into one integer WL amount (1 DL = 100 WL, 1 BGL = 10,000 WL)"""
+    cursor = conn.cursor()
+    # Nilai non-integer akan dibaca 0 oleh aritmatika SQL; batalkan daripada kehilangan saldo
+    cursor.execute("""
+        SELECT growid FROM users
+        WHERE typeof(balance_wl) NOT IN ('integer', 'null')
+           OR typeof(balance_dl) NOT IN ('integer', 'null')
+           OR typeof(balance_bgl) NOT IN ('integer', 'null')
+    """)
+    invalid = [row['growid'] for row in cursor.fetchall()]
+    if invalid:
+        raise ValueError(f"Non-integer balances, fix before migrating: {', '.join(invalid[:10])}")
+
+    cursor.execute("""
+        SELECT COUNT(*) AS users,
+               COALESCE(SUM(COALESCE(balance_wl, 0) + COALESCE(balance_dl, 0) * 100
+                            + COALESCE(balance_bgl, 0) * 10000), 0) AS total
+        FROM users
+    """)
+    before = cursor.fetchone()
+
+    _add_column(cursor, "users", "balance", "INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        UPDATE users SET balance = COALESCE(balance_wl, 0) + COALESCE(balance_dl, 0) * 100
+                                   + COALESCE(balance_bgl, 0) * 10000
+    """)
+
+    cursor.execute("SELECT COUNT(*) AS users, COALESCE(SUM(balance), 0) AS total FROM users")
+    after = cursor.fetchone()
+    if (after['users'], after['total']) != (before['users'], before['total']):
+        raise ValueError(f"Balance conversion mismatch: {tuple(before)} -> {tuple(after)}")
+
+    for column in ("balance_wl", "balance_dl", "balance_bgl"):
+        cursor.execute(f"ALTER TABLE users DROP COLUMN {column}")
+
+def _transaction_ledger_columns(conn):
+    """Typed ledger columns, so reports no longer parse old_balance/new_balance/details text"""
+    cursor = conn.cursor()
+    _add_column(cursor, "transactions", "amount_delta", "INTEGER")  # WL, negative for debits
+    _add_column(cursor, "transactions", "balance_after", "INTEGER")  # WL
+    _add_column(cursor, "transactions", "product_code", "TEXT")
+    _add_column(cursor, "transactions", "quantity", "INTEGER")
+    _add_column(cursor, "transactions", "order_id", "INTEGER")  # id of the PURCHASE row
+    # related_growid ada sejak migrasi 2
+
+LEDGER_BACKFILL_BATCH = 500
+_BALANCE_PART = re.compile(r"(\d[\d,]*)\s*(BGL|DL|WL)\b")
+_PURCHASE_DETAILS = re.compile(r"^Purchased (\d+) (\S+)$")
+_LOCK_VALUES = {'WL': 1, 'DL': 100, 'BGL': 10000}
+
+def _parse_balance_text(text: Optional[str]) -> Optional[int]:
+    """Total WL of a historical balance string: "1,200 WL", "1 BGL + 2 DL" or "wl|dl|bgl" """
+    if not text:
+        return None
+    if text.count('|') == 2:
+        try:
+            wl, dl, bgl = (int(part) for part in text.split('|'))
+        except ValueError:
+            return None
+        return wl + dl * 100 + bgl * 10000
+    parts = _BALANCE_PART.findall(text)
+    if not parts:
+        return None
+    # Refund lama menulis "N WL WL"; tiap satuan dihitung sekali
+    seen = {}
+    for amount, unit in parts:
+        seen.setdefault(unit, int(amount.replace(',', '')))
+    return sum(amount * _LOCK_VALUES[unit] for unit, amount in seen.items())
+
+def _backfill_transaction_ledger(conn) -> bool:
+    """Fill the typed ledger columns of rows written before migration 10, one batch per call.
+
+    Rows are walked in id order from a checkpoint in bot_settings, so rows
+    whose text cannot be parsed are left NULL and skipped instead of being
+    read again. Returns False once every row has been visited.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM bot_settings WHERE key = 'ledger_backfill_id'")
+    checkpoint = cursor.fetchone()
+    last_id = int(checkpoint['value']) if checkpoint else 0
+
+    cursor.execute("""
+        SELECT id, type, details, old_balance, new_balance, items_count, total_price, related_transaction_id
+        FROM transactions
+        WHERE id > ? AND amount_delta IS NULL
+        ORDER BY id
+        LIMIT ?
+    """, (last_id, LEDGER_BACKFILL_BATCH))
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.execute("DELETE FROM bot_settings WHERE key = 'ledger_backfill_id'")
+        return False
+
+    updates = []
+    for row in rows:
+        old = _parse_balance_text(row['old_balance'])
+        new = _parse_balance_text(row['new_balance'])
+        amount = new - old if old is not None and new is not None else None
+        product_code = quantity = order_id = None
+        if row['type'] == 'PURCHASE':
+            purchased = _PURCHASE_DETAILS.match(row['details'] or '')
+            if purchased:
+                quantity, product_code = int(purchased.group(1)), purchased.group(2)
+            quantity = quantity or row['items_count'] or None
+            if row['total_price']:
+                amount = -row['total_price']
+            order_id = row['id']
+        elif row['type'] == 'REFUND':
+            order_id = row['related_transaction_id']
+        updates.append((amount, new, product_code, quantity, order_id, row['id']))
+
+    cursor.executemany("""
+        UPDATE transactions
+        SET amount_delta = ?, balance_after = ?, product_code = ?, quantity = ?, order_id = ?
+        WHERE id = ?
+    """, updates)
+    # Refund mewarisi produk dari pembeliannya, yang id-nya selalu lebih kecil
+    cursor.execute("""
+        UPDATE transactions
+        SET product_code = purchase.product_code, quantity = purchase.quantity
+        FROM transactions AS purchase
+        WHERE purchase.id = transactions.order_id
+          AND transactions.type = 'REFUND'
+          AND transactions.id BETWEEN ? AND ?
+    """, (rows[0]['id'], rows[-1]['id']))
+    cursor.execute("""
+        INSERT INTO bot_settings (key, value) VALUES ('ledger_backfill_id', ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (str(rows[-1]['id']),))
+    return True
+
+def _transaction_ledger_indexes(conn):
+    """Indexes for revenue, per-product, per-order and transfer reports on the typed columns"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_type_created
+        ON transactions(type, created_at, amount_delta)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_product
+        ON transactions(product_code, created_at)
+        WHERE product_code IS NOT NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_order
+        ON transactions(order_id)
+        WHERE order_id IS NOT NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_related_growid
+        ON transactions(related_growid)
+        WHERE related_growid IS NOT NULL
+    """)
+
+def _history_page_indexes(conn):
+    """Indexes for keyset-paginated history: each page is one range scan ending at the cursor.
+    The rowid tie-breaker is implicit in every index, so (col, created_at) also orders by id."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_growid_created
+        ON transactions(growid, created_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_purchases
+        ON transactions(growid, created_at)
+        WHERE type = 'PURCHASE'
+    """)
+    # Prefix dari idx_transactions_growid_created
+    cursor.execute("DROP INDEX IF EXISTS idx_transactions_growid")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_product_updated
+        ON stock(product_code, updated_at)
+    """)
+
+def _stock_history_index(conn):
+    """Stock history pages on added_at, which never changes; updated_at moves on every sale"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_product_added
+        ON stock(product_code, added_at)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_stock_product_updated")
+
+MIGRATIONS = [
+    Migration(1, "initial schema", _initial_schema, False),
+    Migration(2, "transaction reference columns", _transaction_references, False),
+    Migration(3, "admins table", _admins_table, False),
+    Migration(4, "stock available index", _stock_available_index, True),
+    Migration(5, "outbox table", _outbox_table, False),
+    Migration(6, "broadcast tables", _broadcast_tables, False),
+    Migration(7, "command analytics tables", _command_analytics_tables, False),
+    Migration(8, "balance version", _balance_version, False),
+    Migration(9, "single integer balance", _single_balance, False),
+    Migration(10, "transaction ledger columns", _transaction_ledger_columns, False),
+    Migration(11, "transaction ledger backfill", _backfill_transaction_ledger, True),
+    Migration(12, "transaction ledger indexes", _transaction_ledger_indexes, True),
+    Migration(13, "history page indexes", _history_page_indexes, True),
+    Migration(14, "stock history index", _stock_history_index, True),
+]
+
+def dump_schema(path: str):
+    """Write the fully migrated schema to path"""
+    import os
+    import tempfile
+    import database
+
+    path = os.path.abspath(path)
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="schema_dump_"))
+    try:
+        database.setup_database(include_online=True)
+        conn = database.get_connection()
+        rows = conn.execute("""
+            SELECT sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, name
+        """).fetchall()
+        conn.close()
+    finally:
+        os.chdir(cwd)
+
+    with open(path, 'w') as f:
+        f.write(f"-- Generated by `python migrations.py` at schema version {MIGRATIONS[-1].version}.\n")
+        f.write("-- Do not edit; add a migration to migrations.py instead.\n\n")
+        for row in rows:
+            f.write(f"{row['sql']};\n\n")
+
+if __name__ == "__main__":
+    import os
+    dump_schema(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql'))
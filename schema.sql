@@ -1,39 +1,281 @@
--- Table for products
-CREATE TABLE IF NOT EXISTS products (
-    code TEXT PRIMARY KEY,
-    name TEXT NOT NULL,
-    price INTEGER NOT NULL,
-    description TEXT
-);
-
--- Table for stock
-CREATE TABLE IF NOT EXISTS stock (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_code TEXT NOT NULL,
-    content TEXT NOT NULL,
-    status TEXT NOT NULL DEFAULT 'AVAILABLE',
-    buyer_id TEXT,
-    seller_id TEXT,
-    added_by TEXT,
-    added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    used_at DATETIME,
-    FOREIGN KEY (product_code) REFERENCES products(code)
-);
-
--- Table for transactions
-CREATE TABLE IF NOT EXISTS transactions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    growid TEXT NOT NULL,
-    type TEXT NOT NULL,
-    details TEXT,
-    old_balance TEXT,
-    new_balance TEXT,
-    items_count INTEGER,
-    total_price INTEGER,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-
--- Indices
-CREATE INDEX IF NOT EXISTS idx_stock_product_code ON stock(product_code);
-CREATE INDEX IF NOT EXISTS idx_stock_status ON stock(status);
-CREATE INDEX IF NOT EXISTS idx_transactions_growid ON transactions(growid);
\ No newline at end of file
+-- Generated by `python migrations.py` at schema version 14.
+-- Do not edit; add a migration to migrations.py instead.
+
+CREATE TABLE admin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE admins (
+            username TEXT PRIMARY KEY,
+            password_hash BLOB NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE blacklist (
+            growid TEXT PRIMARY KEY,
+            added_by TEXT NOT NULL,
+            reason TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        );
+
+CREATE TABLE bot_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE broadcast_recipients (
+            broadcast_id INTEGER NOT NULL,
+            discord_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+            error TEXT,
+            PRIMARY KEY (broadcast_id, discord_id),
+            FOREIGN KEY (broadcast_id) REFERENCES broadcasts(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ;
+
+CREATE TABLE broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_by TEXT,
+            channel_id INTEGER,
+            progress_message_id INTEGER,
+            status TEXT DEFAULT 'running' CHECK (status IN ('running', 'done', 'cancelled')),
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+
+CREATE TABLE cache_table (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE command_errors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            command TEXT NOT NULL,
+            error_type TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE command_usage_hourly (
+            command TEXT NOT NULL,
+            hour TIMESTAMP NOT NULL,
+            uses INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            users_hll BLOB,
+            channels_hll BLOB,
+            PRIMARY KEY (command, hour)
+        ) WITHOUT ROWID
+    ;
+
+CREATE TABLE outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        );
+
+CREATE TABLE products (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE role_permissions (
+            role_id TEXT PRIMARY KEY,
+            permissions TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE TABLE schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+CREATE TABLE stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code TEXT NOT NULL,
+            content TEXT NOT NULL UNIQUE,
+            status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+            added_by TEXT NOT NULL,
+            buyer_id TEXT,
+            seller_id TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+        );
+
+CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            growid TEXT NOT NULL,
+            type TEXT NOT NULL,
+            details TEXT NOT NULL,
+            old_balance TEXT,
+            new_balance TEXT,
+            items_count INTEGER DEFAULT 0,
+            total_price INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, related_growid TEXT, related_transaction_id INTEGER, admin_id TEXT, amount_delta INTEGER, balance_after INTEGER, product_code TEXT, quantity INTEGER, order_id INTEGER,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        );
+
+CREATE TABLE user_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (discord_id) REFERENCES user_growid(discord_id)
+        );
+
+CREATE TABLE user_growid (
+            discord_id TEXT PRIMARY KEY,
+            growid TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        );
+
+CREATE TABLE users (
+            growid TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        , balance_version INTEGER NOT NULL DEFAULT 0, balance INTEGER NOT NULL DEFAULT 0);
+
+CREATE TABLE world_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            world TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            bot TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+CREATE INDEX idx_admin_logs_admin ON admin_logs(admin_id);
+
+CREATE INDEX idx_admin_logs_created ON admin_logs(created_at);
+
+CREATE INDEX idx_blacklist_growid ON blacklist(growid);
+
+CREATE INDEX idx_cache_expires ON cache_table(expires_at);
+
+CREATE INDEX idx_command_errors_created ON command_errors(created_at);
+
+CREATE INDEX idx_command_usage_hour ON command_usage_hourly(hour);
+
+CREATE INDEX idx_outbox_due
+        ON outbox(next_attempt_at)
+        WHERE status = 'pending'
+    ;
+
+CREATE INDEX idx_role_permissions_role ON role_permissions(role_id);
+
+CREATE INDEX idx_stock_available
+        ON stock(product_code, status, added_at)
+        WHERE status = 'available'
+    ;
+
+CREATE INDEX idx_stock_content ON stock(content);
+
+CREATE INDEX idx_stock_product_added
+        ON stock(product_code, added_at)
+    ;
+
+CREATE INDEX idx_stock_product_code ON stock(product_code);
+
+CREATE INDEX idx_stock_status ON stock(status);
+
+CREATE INDEX idx_transactions_created ON transactions(created_at);
+
+CREATE INDEX idx_transactions_growid_created
+        ON transactions(growid, created_at)
+    ;
+
+CREATE INDEX idx_transactions_order
+        ON transactions(order_id)
+        WHERE order_id IS NOT NULL
+    ;
+
+CREATE INDEX idx_transactions_product
+        ON transactions(product_code, created_at)
+        WHERE product_code IS NOT NULL
+    ;
+
+CREATE INDEX idx_transactions_purchases
+        ON transactions(growid, created_at)
+        WHERE type = 'PURCHASE'
+    ;
+
+CREATE INDEX idx_transactions_related_growid
+        ON transactions(related_growid)
+        WHERE related_growid IS NOT NULL
+    ;
+
+CREATE INDEX idx_transactions_type_created
+        ON transactions(type, created_at, amount_delta)
+    ;
+
+CREATE INDEX idx_user_activity_discord ON user_activity(discord_id);
+
+CREATE INDEX idx_user_activity_type ON user_activity(activity_type);
+
+CREATE INDEX idx_user_growid_discord ON user_growid(discord_id);
+
+CREATE INDEX idx_user_growid_growid ON user_growid(growid);
+
+CREATE TRIGGER update_bot_settings_timestamp 
+        AFTER UPDATE ON bot_settings
+        BEGIN
+            UPDATE bot_settings SET updated_at = CURRENT_TIMESTAMP
+            WHERE key = NEW.key;
+        END;
+
+CREATE TRIGGER update_products_timestamp 
+        AFTER UPDATE ON products
+        BEGIN
+            UPDATE products SET updated_at = CURRENT_TIMESTAMP
+            WHERE code = NEW.code;
+        END;
+
+CREATE TRIGGER update_role_permissions_timestamp 
+        AFTER UPDATE ON role_permissions
+        BEGIN
+            UPDATE role_permissions SET updated_at = CURRENT_TIMESTAMP
+            WHERE role_id = NEW.role_id;
+        END;
+
+CREATE TRIGGER update_stock_timestamp 
+        AFTER UPDATE ON stock
+        BEGIN
+            UPDATE stock SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.id;
+        END;
+
+CREATE TRIGGER update_users_timestamp 
+        AFTER UPDATE ON users
+        BEGIN
+            UPDATE users SET updated_at = CURRENT_TIMESTAMP
+            WHERE growid = NEW.growid;
+        END;
+
@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import logging
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ext.constants import (
+    ANALYTICS_FLUSH_INTERVAL,
+    ANALYTICS_HLL_PRECISION,
+    ANALYTICS_RECENT_ERRORS,
+    ANALYTICS_PENDING_ERRORS,
+    ANALYTICS_RETENTION_DAYS,
+    ANALYTICS_ERROR_RETENTION_DAYS,
+    ANALYTICS_MAX_WINDOW_HOURS
+)
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+class HyperLogLog:
+    """Fixed-size distinct counter: 2**precision one-byte registers.
+
+    Sketches of the same precision merge by taking the register-wise
+    maximum, so hourly sketches stored in SQLite combine into distinct
+    counts over any range of hours.
+    """
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = ANALYTICS_HLL_PRECISION, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.registers = bytearray(registers) if registers else bytearray(1 << precision)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Koreksi rentang kecil (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> 'HyperLogLog':
+        if not data:
+            return cls()
+        return cls(int(math.log2(len(data))), data)
+
+def _hour_key(now: datetime) -> str:
+    # Format sama dengan CURRENT_TIMESTAMP agar bisa dibandingkan di SQL
+    return now.strftime('%Y-%m-%d %H:00:00')
+
+class CommandAnalytics:
+    """Command usage counters with fixed memory, flushed to SQLite in batches.
+
+    Uses and errors are counted per command and hour; distinct users and
+    channels are HyperLogLog sketches instead of sets. Every
+    ANALYTICS_FLUSH_INTERVAL seconds the pending hours are merged into
+    command_usage_hourly in one write, so memory only holds what happened
+    since the last flush. The latest errors are kept in a ring buffer.
+
+    Pending state belongs to the bot loop: track_*, flush() and the flush
+    task run there only. The get_* reads touch nothing but SQLite, so the
+    API thread may call them; they lag by up to one flush interval.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], Dict] = {}
+        self._pending_errors = deque(maxlen=ANALYTICS_PENDING_ERRORS)
+        self.recent_errors = deque(maxlen=ANALYTICS_RECENT_ERRORS)
+        self._task = None
+        self._last_prune = None
+        self._stats = {'flushes': 0, 'flushed_rows': 0, 'dropped_errors': 0}
+
+    def _bucket(self, command: str, now: datetime) -> Dict:
+        key = (command, _hour_key(now))
+        bucket = self._pending.get(key)
+        if bucket is None:
+            bucket = self._pending[key] = {
+                'uses': 0,
+                'errors': 0,
+                'users': HyperLogLog(),
+                'channels': HyperLogLog()
+            }
+        return bucket
+
+    async def track_command(self, ctx, command: str):
+        bucket = self._bucket(command, datetime.utcnow())
+        bucket['uses'] += 1
+        bucket['users'].add(ctx.author.id)
+        bucket['channels'].add(ctx.channel.id)
+
+    async def track_error(self, command: str, error: Exception):
+        now = datetime.utcnow()
+        self._bucket(command, now)['errors'] += 1
+
+        entry = {
+            'time': now,
+            'command': command,
+            'error': str(error)[:500],
+            'type': type(error).__name__
+        }
+        self.recent_errors.append(entry)
+        if len(self._pending_errors) == self._pending_errors.maxlen:
+            self._stats['dropped_errors'] += 1
+        self._pending_errors.append(entry)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing command analytics: {e}")
+
+    async def flush(self):
+        """Write pending counters and errors to SQLite in one transaction"""
+        pending, self._pending = self._pending, {}
+        errors = list(self._pending_errors)
+        self._pending_errors.clear()
+        prune = self._last_prune is None or (datetime.utcnow() - self._last_prune).total_seconds() >= 3600
+        if not pending and not errors and not prune:
+            return
+
+        def _flush(conn):
+            cursor = conn.cursor()
+            for (command, hour), bucket in pending.items():
+                cursor.execute(
+                    "SELECT users_hll, channels_hll FROM command_usage_hourly WHERE command = ? AND hour = ?",
+                    (command, hour)
+                )
+                row = cursor.fetchone()
+                if row:
+                    bucket['users'].merge(HyperLogLog.from_bytes(row['users_hll']))
+                    bucket['channels'].merge(HyperLogLog.from_bytes(row['channels_hll']))
+                cursor.execute("""
+                    INSERT INTO command_usage_hourly (command, hour, uses, errors, users_hll, channels_hll)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(command, hour) DO UPDATE SET
+                        uses = uses + excluded.uses,
+                        errors = errors + excluded.errors,
+                        users_hll = excluded.users_hll,
+                        channels_hll = excluded.channels_hll
+                """, (
+                    command, hour, bucket['uses'], bucket['errors'],
+                    bucket['users'].to_bytes(), bucket['channels'].to_bytes()
+                ))
+
+            cursor.executemany(
+                "INSERT INTO command_errors (command, error_type, error, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (e['command'], e['type'], e['error'], e['time'].strftime('%Y-%m-%d %H:%M:%S'))
+                    for e in errors
+                ]
+            )
+
+            if prune:
+                cursor.execute(
+                    "DELETE FROM command_usage_hourly WHERE hour < datetime('now', ?)",
+                    (f"-{ANALYTICS_RETENTION_DAYS} days",)
+                )
+                cursor.execute(
+                    "DELETE FROM command_errors WHERE created_at < datetime('now', ?)",
+                    (f"-{ANALYTICS_ERROR_RETENTION_DAYS} days",)
+                )
+
+        try:
+            await get_db().write(_flush)
+        except Exception:
+            # Kembalikan agar tidak hilang; flush berikutnya mencoba lagi
+            for key, bucket in pending.items():
+                current = self._pending.get(key)
+                if current is not None:
+                    bucket['uses'] += current['uses']
+                    bucket['errors'] += current['errors']
+                    bucket['users'].merge(current['users'])
+                    bucket['channels'].merge(current['channels'])
+                self._pending[key] = bucket
+            self._pending_errors.extendleft(reversed(errors))
+            raise
+
+        if prune:
+            self._last_prune = datetime.utcnow()
+        self._stats['flushes'] += 1
+        self._stats['flushed_rows'] += len(pending)
+
+    async def get_usage(self, hours: int = 24, command: Optional[str] = None) -> List[Dict]:
+        """Per-command totals over the last hours, busiest first; flushed counters only"""
+        hours = max(1, min(hours, ANALYTICS_MAX_WINDOW_HOURS))
+
+        def _usage(conn):
+            totals = {}
+            query = """
+                SELECT command, uses, errors, users_hll, channels_hll FROM command_usage_hourly
+                WHERE hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+            """
+            params = [f"-{hours - 1} hours"]
+            if command:
+                query += " AND command = ?"
+                params.append(command)
+            # Iterasi cursor: sketch digabung satu per satu, tidak dimuat sekaligus
+            for row in conn.execute(query, params):
+                total = totals.get(row['command'])
+                if total is None:
+                    total = totals[row['command']] = {
+                        'uses': 0, 'errors': 0, 'users': HyperLogLog(), 'channels': HyperLogLog()
+                    }
+                total['uses'] += row['uses']
+                total['errors'] += row['errors']
+                total['users'].merge(HyperLogLog.from_bytes(row['users_hll']))
+                total['channels'].merge(HyperLogLog.from_bytes(row['channels_hll']))
+            return totals
+
+        totals = await get_db().read(_usage)
+        usage = [
+            {
+                'command': name,
+                'uses': total['uses'],
+                'errors': total['errors'],
+                'unique_users': total['users'].count(),
+                'unique_channels': total['channels'].count()
+            }
+            for name, total in totals.items()
+        ]
+        return sorted(usage, key=lambda item: item['uses'], reverse=True)
+
+    async def get_timeline(self, hours: int = 24, command: Optional[str] = None) -> List[Dict]:
+        """Uses and errors per hour over the last hours, oldest first; flushed counters only"""
+        hours = max(1, min(hours, ANALYTICS_MAX_WINDOW_HOURS))
+
+        query = """
+            SELECT hour, SUM(uses) as uses, SUM(errors) as errors FROM command_usage_hourly
+            WHERE hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+        """
+        params = [f"-{hours - 1} hours"]
+        if command:
+            query += " AND command = ?"
+            params.append(command)
+        query += " GROUP BY hour ORDER BY hour"
+        rows = await get_db().fetchall(query, params)
+        return [{'hour': row['hour'], 'uses': row['uses'], 'errors': row['errors']} for row in rows]
+
+    async def get_errors(self, limit: int = 20, command: Optional[str] = None) -> List[Dict]:
+        """Most recent flushed errors, newest first"""
+        query = "SELECT command, error_type, error, created_at FROM command_errors"
+        params = []
+        if command:
+            query += " WHERE command = ?"
+            params.append(command)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        rows = await get_db().fetchall(query, params)
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict:
+        return {
+            **self._stats,
+            'pending_rows': len(self._pending),
+            'pending_errors': len(self._pending_errors)
+        }
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from ext.constants import BALANCE_CACHE_SIZE, BALANCE_CACHE_MAX_AGE, Balance
+
+class BalanceCache:
+    """Balances by growid, stamped with the row's balance_version.
+
+    Every code path that changes users.balance bumps balance_version in
+    the same statement and writes the result through with put(), so reads
+    after a purchase, refund or top-up see the new balance without a query.
+    put() refuses a version older than the cached one: a read that started
+    before a write and finishes after it cannot overwrite the newer balance
+    (counted as stale). Entries are evicted least recently used first past
+    max_size; max_age only bounds how long a change made outside the bot
+    (manual SQL, a restore) can go unseen. The bot loop and the API
+    server's thread share one instance, so every access holds a lock.
+    """
+
+    def __init__(self, max_size: int = BALANCE_CACHE_SIZE, max_age: float = BALANCE_CACHE_MAX_AGE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.clock = clock
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # growid -> (balance, version, stored_at)
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+
+    def get(self, growid: str) -> Optional[Balance]:
+        with self._lock:
+            entry = self._entries.get(growid)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if self.clock() - entry[2] > self.max_age:
+                del self._entries[growid]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(growid)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, growid: str, balance: Balance, version: int) -> bool:
+        """Cache balance at version; False if a newer version is already cached"""
+        with self._lock:
+            entry = self._entries.get(growid)
+            if entry is not None and entry[1] > version:
+                self._stats['stale'] += 1
+                return False
+            self._entries[growid] = (balance, version, self.clock())
+            self._entries.move_to_end(growid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+            return True
+
+    def invalidate(self, growid: str):
+        with self._lock:
+            self._entries.pop(growid, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'size': len(self._entries),
+                **self._stats,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0
+            }
+
+_cache: Optional[BalanceCache] = None
+_cache_lock = threading.Lock()
+
+def get_balance_cache() -> BalanceCache:
+    """Process-wide balance cache shared by every balance writer"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = BalanceCache()
+    return _cache
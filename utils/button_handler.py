@@ -4,14 +4,15 @@ from datetime import datetime
 import discord
 from ext.balance_manager import BalanceManagerService
 from ext.product_manager import ProductManagerService
+from ext.paginator import PAGINATOR_ID_PREFIX
+from utils.expiring_map import ExpiringMap
 
 logger = logging.getLogger(__name__)
 
 class ButtonHandler:
     def __init__(self, bot):
         self.bot = bot
-        self._handled_interactions = set()
-        self._locks = {}
+        self._handled_interactions = ExpiringMap(300)  # interaction tidak bisa dijawab lagi setelah ini
         
         try:
             self.balance_manager = BalanceManagerService(bot)
@@ -22,13 +23,15 @@ class ButtonHandler:
 
     async def handle_button(self, interaction: discord.Interaction):
         """Handle button interactions"""
+        if interaction.data.get('custom_id', '').startswith(PAGINATOR_ID_PREFIX):
+            return  # Dijawab oleh PaginatedView
         if interaction.id in self._handled_interactions:
             logger.debug(f"Skipping already handled interaction: {interaction.id}")
             return
             
         try:
             async with asyncio.timeout(5.0):  # 5 detik timeout
-                self._handled_interactions.add(interaction.id)
+                self._handled_interactions.set(interaction.id)
                 button_id = interaction.data.get('custom_id', '')
 
                 # Fungsi helper untuk mengirim respons dengan aman
@@ -111,8 +114,6 @@ class ButtonHandler:
             logger.error(f"Error handling button {button_id}: {e}")
             if not interaction.response.is_done():
                 await safe_response("❌ An error occurred", ephemeral=True)
-        finally:
-            self._clean_old_interactions()
             
     async def handle_balance(self, interaction: discord.Interaction) -> bool:
         try:
@@ -185,15 +186,3 @@ class ButtonHandler:
         except Exception as e:
             logger.error(f"Error in handle_check_growid: {e}")
             return False
-
-    def _clean_old_interactions(self):
-        """Bersihkan interaksi yang sudah lama (>5 menit)"""
-        try:
-            now = datetime.utcnow().timestamp()
-            to_remove = {
-                interaction_id for interaction_id in self._handled_interactions
-                if now - int(str(interaction_id)[:19]) / 1000000 >= 300
-            }
-            self._handled_interactions -= to_remove
-        except Exception as e:
-            logger.error(f"Error cleaning old interactions: {e}")
\ No newline at end of file
@@ -1,116 +1,76 @@
-import discord
 from discord.ext import commands
 import logging
-import json
-from datetime import datetime
-from typing import Optional, Dict, List, Tuple
+from typing import Dict, List, Tuple
 
-logger = logging.getLogger(__name__)
+from utils.rate_limiter import acquire_all, limiters_from_config
+from utils.expiring_map import ExpiringMap
+from utils.analytics import CommandAnalytics
+from utils.log_shipper import CommandLogShipper
+from utils.config import ConfigService, get_config
 
-class CommandAnalytics:
-    def __init__(self):
-        self.usage_stats = {}
-        self.error_stats = {}
-        
-    async def track_command(self, ctx, command: str):
-        now = datetime.utcnow()
-        
-        if command not in self.usage_stats:
-            self.usage_stats[command] = {
-                'total_uses': 0,
-                'users': set(),
-                'channels': set(),
-                'last_used': None,
-                'peak_hour_usage': [0] * 24
-            }
-        
-        stats = self.usage_stats[command]
-        stats['total_uses'] += 1
-        stats['users'].add(ctx.author.id)
-        stats['channels'].add(ctx.channel.id)
-        stats['last_used'] = now
-        stats['peak_hour_usage'][now.hour] += 1
-
-    async def track_error(self, command: str, error: Exception):
-        if command not in self.error_stats:
-            self.error_stats[command] = []
-        
-        self.error_stats[command].append({
-            'time': datetime.utcnow(),
-            'error': str(error),
-            'type': type(error).__name__
-        })
+logger = logging.getLogger(__name__)
 
 class AdvancedCommandHandler:
     def __init__(self, bot):
         self.bot = bot
         self.analytics = CommandAnalytics()
+        self.analytics.start()
         
-        # Load config
-        with open('config.json', 'r') as f:
-            self.config = json.load(f)
-        
-        self.cooldowns = {}
-        self.custom_cooldowns = self.config.get('cooldowns', {})
-        self.permissions = self.config.get('permissions', {})
-        self.rate_limits = self.config.get('rate_limits', {
-            'global': [5, 5],
-            'user': [3, 5],
-            'channel': [10, 5]
-        })
+        config = get_config()
+        self.cooldowns = ExpiringMap(config.cooldowns.get('default', 3))
         
-        # Rate limit tracking
-        self.rate_usage = {
-            'global': [],
-            'user': {},
-            'channel': {}
-        }
+        # Rate limit tracking: satu limiter GCRA per scope (global, user, channel)
+        self.limiters = limiters_from_config(config.rate_limits)
         
         # Setup logging channel
-        self.log_channel_id = int(self.config['channels']['logs'])
+        self.log_shipper = CommandLogShipper(bot, config.channels['logs'])
+        self.log_shipper.start()
+        
+        # Cooldown, rate limit dan channel log bisa diubah tanpa restart
+        ConfigService().subscribe(self._on_config_change)
+
+    def _on_config_change(self, old, new, changed):
+        if 'rate_limits' in changed:
+            # Limiter yang batasnya tidak berubah tetap menyimpan state-nya
+            rebuilt = limiters_from_config({
+                scope: limit for scope, limit in new.rate_limits.items()
+                if old.rate_limits.get(scope) != limit
+            })
+            self.limiters = {
+                scope: rebuilt[scope] if scope in rebuilt else self.limiters[scope]
+                for scope in new.rate_limits
+            }
+        if 'cooldowns' in changed:
+            # Cooldown yang sedang berjalan tetap memakai durasi lamanya
+            self.cooldowns.ttl = new.cooldowns.get('default', 3)
+        if 'channels' in changed:
+            self.log_shipper.channel_id = new.channels['logs']
 
     async def check_rate_limit(self, ctx) -> bool:
-        now = datetime.utcnow()
-        
-        # Global limit
-        self.rate_usage['global'] = [t for t in self.rate_usage['global'] 
-                                   if (now - t).total_seconds() <= self.rate_limits['global'][1]]
-        if len(self.rate_usage['global']) >= self.rate_limits['global'][0]:
-            return False
-            
-        # User limit
-        user_id = str(ctx.author.id)
-        if user_id not in self.rate_usage['user']:
-            self.rate_usage['user'][user_id] = []
-            
-        self.rate_usage['user'][user_id] = [t for t in self.rate_usage['user'][user_id] 
-                                          if (now - t).total_seconds() <= self.rate_limits['user'][1]]
-        if len(self.rate_usage['user'][user_id]) >= self.rate_limits['user'][0]:
-            return False
-            
-        # Update usage
-        self.rate_usage['global'].append(now)
-        self.rate_usage['user'][user_id].append(now)
-        return True
+        # Hit hanya dicatat jika semua scope mengizinkan
+        keys = {'global': 'global', 'user': ctx.author.id, 'channel': ctx.channel.id}
+        allowed, _ = acquire_all(
+            (limiter, keys[scope]) for scope, limiter in self.limiters.items() if scope in keys
+        )
+        return allowed
 
     async def check_cooldown(self, user_id: int, command: str) -> Tuple[bool, float]:
         key = f"{user_id}:{command}"
-        now = datetime.utcnow()
         
-        if key in self.cooldowns:
-            cooldown_time = self.custom_cooldowns.get(command, 
-                                                    self.custom_cooldowns.get('default', 3))
-            elapsed = (now - self.cooldowns[key]).total_seconds()
+        remaining = self.cooldowns.expires_in(key)
+        if remaining > 0:
+            return False, remaining
             
-            if elapsed < cooldown_time:
-                return False, cooldown_time - elapsed
-                
-        self.cooldowns[key] = now
+        cooldowns = get_config().cooldowns
+        cooldown_time = cooldowns.get(command, cooldowns.get('default', 3))
+        self.cooldowns.set(key, ttl=cooldown_time)
         return True, 0
 
     async def check_permissions(self, ctx, command: str) -> bool:
+        config = get_config()
+        
         # Admin bypass
-        if str(ctx.author.id) == self.config['admin_id']:
+        if ctx.author.id == config.admin_id:
             return True
             
         # Get user roles
@@ -119,33 +79,13 @@ class AdvancedCommandHandler:
         # Check role permissions
         for role_id in user_roles:
             role_id = str(role_id)
-            if role_id in self.permissions:
-                perms = self.permissions[role_id]
+            if role_id in config.permissions:
+                perms = config.permissions[role_id]
                 if 'all' in perms or command in perms:
                     return True
                     
         return False
 
-    async def log_command(self, ctx, command: str, success: bool, error: Optional[Exception] = None):
-        channel = self.bot.get_channel(self.log_channel_id)
-        if not channel:
-            return
-            
-        embed = discord.Embed(
-            title="Command Log",
-            timestamp=datetime.utcnow(),
-            color=discord.Color.green() if success else discord.Color.red()
-        )
-        
-        embed.add_field(name="Command", value=command, inline=True)
-        embed.add_field(name="User", value=f"{ctx.author} ({ctx.author.id})", inline=True)
-        embed.add_field(name="Channel", value=f"{ctx.channel} ({ctx.channel.id})", inline=True)
-        
-        if error:
-            embed.add_field(name="Error", value=str(error), inline=False)
-            
-        await channel.send(embed=embed)
-
     async def handle_command(self, ctx, command_name: str, *args, **kwargs):
         """Handle command execution with all features"""
         # Skip jika pesan sudah diproses
@@ -179,8 +119,9 @@ class AdvancedCommandHandler:
                 )
                 return
                 
-            # 4. Track Analytics
-            await self.analytics.track_command(ctx, command_name)
+            # 4. Track Analytics (hanya command yang ada, agar jumlah baris tetap terbatas)
+            if self.bot.get_command(command_name):
+                await self.analytics.track_command(ctx, command_name)
                 
             # 5. Execute Command dengan try-except terpisah
             try:
@@ -190,20 +131,21 @@ class AdvancedCommandHandler:
                         await command.callback(command.cog, ctx, *args, **kwargs)
                     else:
                         await command.callback(ctx, *args, **kwargs)
-                    await self.log_command(ctx, command_name, True)
+                    self.log_shipper.record(ctx, command_name, True)
                 else:
                     await ctx.send(f"❌ Command '{command_name}' not found!", delete_after=5)
                     
             except Exception as cmd_error:
                 logger.error(f"Error executing command {command_name}: {cmd_error}")
+                await self.analytics.track_error(command_name, cmd_error)
                 await ctx.send("❌ An error occurred while executing the command!", delete_after=5)
-                await self.log_command(ctx, command_name, False, cmd_error)
+                self.log_shipper.record(ctx, command_name, False, cmd_error)
                 return
                 
         except Exception as e:
             # 6. Error Handling & Tracking
             await self.analytics.track_error(command_name, e)
-            await self.log_command(ctx, command_name, False, e)
+            self.log_shipper.record(ctx, command_name, False, e)
             
             logger.error(f"Error in command handler: {e}")
             await ctx.send("❌ An unexpected error occurred!", delete_after=5)
\ No newline at end of file
@@ -0,0 +1,212 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from ext.constants import CONFIG_FILE, CONFIG_WATCH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Dipakai saat startup saja; perubahan hanya berlaku setelah restart
+RESTART_REQUIRED = ('token', 'guild_id', 'db_pool_size')
+
+class ConfigError(ValueError):
+    pass
+
+class BotConfig(NamedTuple):
+    """Validated, read-only view of config.json"""
+    token: str
+    guild_id: int
+    admin_id: int
+    id_live_stock: int
+    id_log_purch: int
+    id_donation_log: int
+    id_history_buy: int
+    db_pool_size: Optional[int]
+    channels: Mapping[str, int]
+    roles: Mapping[str, int]
+    cooldowns: Mapping[str, float]
+    permissions: Mapping[str, Tuple[str, ...]]
+    rate_limits: Mapping[str, Tuple[int, float]]
+
+def _id(data: Dict, key: str) -> int:
+    try:
+        return int(data[key])
+    except KeyError:
+        raise ConfigError(f"Missing required key: {key}")
+    except (TypeError, ValueError):
+        raise ConfigError(f"{key} must be a Discord ID, got {data[key]!r}")
+
+def _section(data: Dict, key: str) -> Dict:
+    value = data.get(key)
+    if not isinstance(value, dict):
+        raise ConfigError(f"{key} must be an object")
+    return value
+
+def parse_config(data: Dict) -> BotConfig:
+    """Validate raw config.json data; raises ConfigError on the first problem"""
+    if not isinstance(data, dict):
+        raise ConfigError("config.json must contain an object")
+    if not isinstance(data.get('token'), str) or not data['token']:
+        raise ConfigError("token must be a non-empty string")
+
+    cooldowns = {}
+    for command, seconds in _section(data, 'cooldowns').items():
+        if not isinstance(seconds, (int, float)) or seconds < 0:
+            raise ConfigError(f"cooldowns.{command} must be a non-negative number")
+        cooldowns[command] = float(seconds)
+
+    rate_limits = {}
+    for scope, value in _section(data, 'rate_limits').items():
+        if (not isinstance(value, (list, tuple)) or len(value) != 2
+                or not all(isinstance(v, (int, float)) and v > 0 for v in value)):
+            raise ConfigError(f"rate_limits.{scope} must be [limit, period_seconds] with positive values")
+        rate_limits[scope] = (int(value[0]), float(value[1]))
+
+    permissions = {}
+    for role, allowed in _section(data, 'permissions').items():
+        if not isinstance(allowed, list) or not all(isinstance(p, str) for p in allowed):
+            raise ConfigError(f"permissions.{role} must be a list of command names")
+        permissions[role] = tuple(allowed)
+
+    pool_size = data.get('db_pool_size')
+    if pool_size is not None and (not isinstance(pool_size, int) or pool_size < 1):
+        raise ConfigError("db_pool_size must be a positive integer")
+
+    channels = _section(data, 'channels')
+    roles = _section(data, 'roles')
+    return BotConfig(
+        token=data['token'],
+        guild_id=_id(data, 'guild_id'),
+        admin_id=_id(data, 'admin_id'),
+        id_live_stock=_id(data, 'id_live_stock'),
+        id_log_purch=_id(data, 'id_log_purch'),
+        id_donation_log=_id(data, 'id_donation_log'),
+        id_history_buy=_id(data, 'id_history_buy'),
+        db_pool_size=pool_size,
+        channels=MappingProxyType({name: _id(channels, name) for name in channels}),
+        roles=MappingProxyType({name: _id(roles, name) for name in roles}),
+        cooldowns=MappingProxyType(cooldowns),
+        permissions=MappingProxyType(permissions),
+        rate_limits=MappingProxyType(rate_limits)
+    )
+
+def load_config(path: str = CONFIG_FILE) -> BotConfig:
+    try:
+        with open(path, 'r') as config_file:
+            data = json.load(config_file)
+    except FileNotFoundError:
+        raise ConfigError(f"{path} file not found!")
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path} is not valid JSON: {e}")
+    return parse_config(data)
+
+class ConfigService:
+    """Single source of config.json for the bot.
+
+    The file is parsed and validated once into an immutable BotConfig.
+    While running, the file's mtime is polled every CONFIG_WATCH_INTERVAL
+    seconds; a changed file is validated in full and swapped in as one new
+    object, so readers see either the old config or the new one, never a
+    mix. An invalid file is logged and the current config kept.
+    Subscribers get (old, new, changed_fields) after every swap.
+    """
+    _instance = None
+
+    def __new__(cls, path: str = CONFIG_FILE):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, path: str = CONFIG_FILE):
+        if not self.initialized:
+            self.path = path
+            self._config: Optional[BotConfig] = None
+            self._mtime = None
+            self._subscribers: List[Callable] = []
+            self._task = None
+            self.initialized = True
+
+    @property
+    def config(self) -> BotConfig:
+        if self._config is None:
+            self.load()
+        return self._config
+
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> BotConfig:
+        """Read and validate the file; raises ConfigError if it is invalid"""
+        mtime = self._stat_mtime()
+        self._config = load_config(self.path)
+        self._mtime = mtime
+        return self._config
+
+    def subscribe(self, callback: Callable):
+        """Call callback(old, new, changed_fields) after each reload; may be async"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    async def reload(self) -> List[str]:
+        """Reload now; returns the changed fields (empty if unchanged or invalid)"""
+        old = self.config
+        try:
+            new = self.load()
+        except (ConfigError, OSError) as e:
+            # Dicatat sebagai sudah dibaca agar tidak dicoba ulang sampai file berubah lagi
+            self._mtime = self._stat_mtime()
+            logger.error(f"Config reload rejected, keeping current config: {e}")
+            return []
+
+        changed = [field for field in BotConfig._fields if getattr(old, field) != getattr(new, field)]
+        if not changed:
+            return []
+
+        logger.info(f"Config reloaded, changed: {', '.join(changed)}")
+        pending_restart = [field for field in changed if field in RESTART_REQUIRED]
+        if pending_restart:
+            logger.warning(f"Config changes need a restart to take effect: {', '.join(pending_restart)}")
+
+        for callback in list(self._subscribers):
+            try:
+                result = callback(old, new, changed)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error in config subscriber {getattr(callback, '__qualname__', callback)}: {e}")
+        return changed
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+            mtime = self._stat_mtime()
+            if mtime is not None and mtime != self._mtime:
+                await self.reload()
+
+def get_config() -> BotConfig:
+    """Current config; hold on to the result only for the duration of one operation"""
+    return ConfigService().config
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+DEFAULT_MAX_SIZE = 100_000
+
+class ExpiringMap:
+    """Dict whose entries expire ttl seconds after they were last set.
+
+    Expiry uses a timing wheel: each entry is filed under the tick
+    (resolution seconds wide) in which it expires, and every operation
+    first clears the ticks that have passed, so insert and expiry are both
+    amortised O(1) and nothing has to scan the whole map. Lookups check the
+    exact expiry time, so an entry is never returned late; the wheel only
+    decides when its memory is released (at most one tick after expiry).
+    Past max_size the least recently set entries are evicted.
+    """
+
+    def __init__(self, ttl: float, max_size: int = DEFAULT_MAX_SIZE, resolution: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if ttl <= 0 or resolution <= 0:
+            raise ValueError("ttl and resolution must be positive")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.resolution = resolution
+        self.clock = clock
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (value, expires_at)
+        self._wheel: Dict[int, Set[Hashable]] = {}
+        self._swept_tick = int(clock() // resolution)
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def _sweep(self, now: float):
+        current = int(now // self.resolution)
+        if current <= self._swept_tick:
+            return
+        # Setelah idle lama, lebih murah memeriksa tick yang terisi daripada setiap tick yang terlewat
+        if current - self._swept_tick > len(self._wheel):
+            ticks = sorted(tick for tick in self._wheel if tick <= current)
+        else:
+            ticks = range(self._swept_tick + 1, current + 1)
+        self._swept_tick = current
+
+        for tick in ticks:
+            for key in self._wheel.pop(tick, ()):
+                entry = self._data.get(key)
+                # Key yang di-set ulang sudah terdaftar di tick lain
+                if entry is not None and entry[1] <= now:
+                    del self._data[key]
+                    self._stats['expired'] += 1
+
+    def _entry(self, key: Hashable, now: float) -> Optional[tuple]:
+        self._sweep(now)
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            self._stats['misses'] += 1
+            return None
+        self._stats['hits'] += 1
+        return entry
+
+    def set(self, key: Hashable, value: Any = True, ttl: Optional[float] = None):
+        now = self.clock()
+        self._sweep(now)
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._data.pop(key, None)
+        self._data[key] = (value, expires_at)
+        # Tick dibulatkan ke atas agar sweep tidak pernah mendahului waktu expire
+        self._wheel.setdefault(int(expires_at // self.resolution) + 1, set()).add(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._stats['evicted'] += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entry(key, self.clock())
+        return default if entry is None else entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._entry(key, self.clock()) is not None
+
+    def expires_in(self, key: Hashable) -> float:
+        """Seconds until key expires, 0 if it is not set"""
+        now = self.clock()
+        entry = self._entry(key, now)
+        return 0.0 if entry is None else entry[1] - now
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None or entry[1] <= self.clock() else entry[0]
+
+    def clear(self):
+        self._data.clear()
+        self._wheel.clear()
+
+    def __len__(self) -> int:
+        """Entries held, including expired ones not yet swept"""
+        return len(self._data)
+
+    def get_stats(self) -> Dict:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            'size': len(self._data),
+            **self._stats,
+            'hit_rate': self._stats['hits'] / lookups if lookups else 0.0
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable
+
+class _Entry:
+    __slots__ = ('lock', 'refs')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0  # holder plus waiters
+
+class LockManager:
+    """Per-key asyncio locks that exist only while someone holds or waits for them.
+
+    Each key's lock is reference counted: acquire() takes a reference
+    before waiting and drops it on release, and the lock is discarded when
+    the count reaches zero, so the table is bounded by the number of tasks
+    currently inside a critical section instead of by every key ever used.
+    acquire() with several keys takes them in sorted order, so two tasks
+    locking the same pair in opposite argument order cannot deadlock.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._holders = 0
+        self._waiting = 0
+        self._stats = {'acquired': 0, 'contended': 0, 'wait_total': 0.0, 'max_wait': 0.0}
+
+    def _unref(self, key: Hashable, entry: _Entry):
+        entry.refs -= 1
+        if entry.refs == 0 and self._entries.get(key) is entry:
+            del self._entries[key]
+
+    @asynccontextmanager
+    async def acquire(self, *keys: Hashable):
+        """Hold the locks for all keys; keys of one call must be mutually comparable"""
+        ordered = sorted(set(keys))
+        referenced = []
+        held = []
+        started = time.monotonic()
+        contended = False
+        self._waiting += 1
+        try:
+            for key in ordered:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry()
+                entry.refs += 1
+                referenced.append((key, entry))
+                if entry.lock.locked():
+                    contended = True
+                await entry.lock.acquire()
+                held.append(entry)
+        except BaseException:
+            self._waiting -= 1
+            for entry in reversed(held):
+                entry.lock.release()
+            for key, entry in referenced:
+                self._unref(key, entry)
+            raise
+
+        self._waiting -= 1
+        wait = time.monotonic() - started
+        self._stats['acquired'] += 1
+        if contended:
+            self._stats['contended'] += 1
+            self._stats['wait_total'] += wait
+            self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+
+        self._holders += 1
+        try:
+            yield
+        finally:
+            self._holders -= 1
+            for entry in reversed(held):
+                entry.lock.release()
+            for key, entry in referenced:
+                self._unref(key, entry)
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        contended = self._stats['contended']
+        return {
+            'locks': len(self._entries),
+            'holders': self._holders,
+            'waiting': self._waiting,
+            'acquired': self._stats['acquired'],
+            'contended': contended,
+            'contention_rate': contended / self._stats['acquired'] if self._stats['acquired'] else 0.0,
+            'avg_wait_ms': self._stats['wait_total'] / contended * 1000 if contended else 0.0,
+            'max_wait_ms': self._stats['max_wait'] * 1000
+        }
+
+_managers: Dict[str, LockManager] = {}
+
+def get_lock_manager(name: str) -> LockManager:
+    """The named lock manager, one per service so contention is reported separately"""
+    manager = _managers.get(name)
+    if manager is None:
+        manager = _managers[name] = LockManager(name)
+    return manager
+
+def get_lock_stats() -> Dict[str, Dict]:
+    return {name: manager.get_stats() for name, manager in _managers.items()}
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+import discord
+
+from ext.constants import (
+    LANE_LOG,
+    COMMAND_LOG_BATCH_SIZE,
+    COMMAND_LOG_FLUSH_INTERVAL,
+    COMMAND_LOG_MAX_BUFFER,
+    COMMAND_LOG_SAMPLE_THRESHOLD,
+    COMMAND_LOG_SAMPLE_RATE
+)
+from ext.message_scheduler import MessageScheduler
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_LENGTH = 190  # 20 lines stay well under the 4096 char embed description
+
+class CommandLogShipper:
+    """Ships command log events to the logs channel as digest messages.
+
+    record() only appends to an in-memory buffer, so logging never waits on
+    Discord. A background task sends a digest of up to
+    COMMAND_LOG_BATCH_SIZE events when that many are buffered or
+    COMMAND_LOG_FLUSH_INTERVAL seconds have passed, one digest at a time.
+    If digests cannot keep up the buffer grows, and past
+    COMMAND_LOG_SAMPLE_THRESHOLD only 1 in COMMAND_LOG_SAMPLE_RATE successes
+    is kept; at COMMAND_LOG_MAX_BUFFER successes are dropped and failures
+    replace the oldest events. Every digest reports how many were dropped.
+    """
+
+    def __init__(self, bot, channel_id: int):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.scheduler = MessageScheduler(bot)
+        self._buffer = deque()
+        self._dropped = 0  # sejak digest terakhir
+        self._sample_counter = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self._stats = {'recorded': 0, 'shipped': 0, 'dropped': 0, 'digests': 0, 'failed': 0}
+
+    def record(self, ctx, command: str, success: bool, error: Optional[Exception] = None):
+        """Buffer one command event; never blocks"""
+        self._stats['recorded'] += 1
+        buffered = len(self._buffer)
+
+        if buffered >= COMMAND_LOG_MAX_BUFFER:
+            if success:
+                self._drop()
+                return
+            # Error lebih penting dari event tertua
+            self._buffer.popleft()
+            self._drop()
+        elif success and buffered >= COMMAND_LOG_SAMPLE_THRESHOLD:
+            self._sample_counter += 1
+            if self._sample_counter % COMMAND_LOG_SAMPLE_RATE:
+                self._drop()
+                return
+
+        self._buffer.append((
+            datetime.utcnow(),
+            command,
+            success,
+            f"{ctx.author} ({ctx.author.id})",
+            ctx.channel.id,
+            str(error) if error else None
+        ))
+        if len(self._buffer) >= COMMAND_LOG_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _drop(self):
+        self._dropped += 1
+        self._stats['dropped'] += 1
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Ship what is buffered, then stop; a digest being sent is not cancelled"""
+        if self._task:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=COMMAND_LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error shipping command logs: {e}")
+
+    async def flush(self):
+        """Send everything buffered as digests, one at a time"""
+        while self._buffer or self._dropped:
+            channel = self.bot.get_channel(self.channel_id)
+            if not channel:
+                self._stats['dropped'] += len(self._buffer)
+                self._buffer.clear()
+                self._dropped = 0
+                return
+
+            batch = [self._buffer.popleft() for _ in range(min(COMMAND_LOG_BATCH_SIZE, len(self._buffer)))]
+            dropped, self._dropped = self._dropped, 0
+            embed = self._build_digest(batch, dropped)
+            try:
+                await self.scheduler.send(LANE_LOG, f"channel:{channel.id}", lambda: channel.send(embed=embed))
+            except Exception as e:
+                # Log bersifat best-effort: digest yang gagal tidak diantrikan ulang
+                self._stats['failed'] += 1
+                logger.error(f"Error sending command log digest: {e}")
+                continue
+            self._stats['digests'] += 1
+            self._stats['shipped'] += len(batch)
+
+    def _build_digest(self, batch, dropped: int) -> discord.Embed:
+        failures = sum(1 for event in batch if not event[2])
+        lines = []
+        for created_at, command, success, user, channel_id, error in batch:
+            line = f"`{created_at.strftime('%H:%M:%S')}` {'✅' if success else '❌'} **{command}** · {user} · <#{channel_id}>"
+            if error:
+                line += f" · {error}"
+            if len(line) > MAX_LINE_LENGTH:
+                line = line[:MAX_LINE_LENGTH - 3] + "..."
+            lines.append(line)
+        if dropped:
+            lines.append(f"⚠️ {dropped:,} events not shown (log backpressure)")
+
+        embed = discord.Embed(
+            title="Command Log",
+            description="\n".join(lines),
+            timestamp=datetime.utcnow(),
+            color=discord.Color.red() if failures else discord.Color.green()
+        )
+        embed.set_footer(text=f"{len(batch) - failures} ok · {failures} failed")
+        return embed
+
+    def get_stats(self) -> Dict:
+        return {**self._stats, 'buffered': len(self._buffer)}
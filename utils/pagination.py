@@ -0,0 +1,54 @@
+import base64
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from database import get_db
+from ext.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+class Page(NamedTuple):
+    items: List[Dict]
+    next_cursor: Optional[str]  # None on the last page
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{sort_value}|{row_id}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(sort value, id) of a cursor from encode_cursor(); ValueError if it is not one"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        sort_value, row_id = raw.rsplit('|', 1)
+        return sort_value, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid page cursor")
+
+async def fetch_page(select: str, where: str = "1", params: Sequence = (),
+                     limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                     sort_column: str = "created_at", id_column: str = "id",
+                     max_limit: int = MAX_PAGE_SIZE) -> Page:
+    """One page of rows newest first, continuing after cursor.
+
+    Rows are ordered by (sort_column, id_column) descending and the page
+    starts strictly after the cursor's pair, so with an index on
+    (<where equality columns>, sort_column) every page is one index range
+    scan however deep it is, unlike OFFSET, which walks every skipped row.
+    Rows inserted while paging show up on a fresh first page and never
+    shift or repeat rows on later ones, provided sort_column is never
+    updated after insert (created_at, added_at; not updated_at). select
+    is "SELECT ... FROM ..." and the selected rows must include both
+    order columns.
+    """
+    limit = max(1, min(limit, max_limit))
+    query = f"{select} WHERE ({where})"
+    params = list(params)
+    if cursor:
+        query += f" AND ({sort_column}, {id_column}) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    # Satu baris ekstra untuk tahu apakah masih ada halaman berikutnya
+    query += f" ORDER BY {sort_column} DESC, {id_column} DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = [dict(row) for row in await get_db().fetchall(query, tuple(params))]
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    last = rows[-1]
+    return Page(rows, encode_cursor(last[sort_column.split('.')[-1]], last[id_column.split('.')[-1]]))
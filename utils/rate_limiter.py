@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Tuple
+
+DEFAULT_MAX_KEYS = 100_000
+
+class RateLimiter:
+    """GCRA limiter: at most limit hits per period seconds for every key.
+
+    The only state per key is its theoretical arrival time (TAT), a float
+    on the monotonic clock, so a check is O(1) whatever the limit. A key
+    whose TAT has passed is indistinguishable from a new one and is
+    dropped; keys are kept in last-hit order, so keys idle for a full
+    period are always at the front and eviction is amortised O(1). max_keys is a hard cap
+    for floods of distinct keys; evicting a live key only forgives its
+    remaining wait.
+    """
+    __slots__ = ('limit', 'period', 'emission', 'max_keys', 'clock', '_tat', 'evictions')
+
+    def __init__(self, limit: int, period: float, max_keys: int = DEFAULT_MAX_KEYS,
+                 clock: Callable[[], float] = time.monotonic):
+        if limit < 1 or period <= 0:
+            raise ValueError("limit must be at least 1 and period positive")
+        self.limit = limit
+        self.period = period
+        self.emission = period / limit
+        self.max_keys = max_keys
+        self.clock = clock
+        self._tat: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self.evictions = 0
+
+    def retry_after(self, key: Hashable, now: float = None) -> float:
+        """Seconds until key may be hit again, 0 if it may be hit now"""
+        if now is None:
+            now = self.clock()
+        tat = self._tat.get(key)
+        if tat is None:
+            return 0.0
+        # Hit diizinkan selama TAT baru tidak lebih dari period di depan now
+        return max(0.0, tat + self.emission - self.period - now)
+
+    def hit(self, key: Hashable, now: float = None):
+        """Record a hit for key; callers check retry_after() first"""
+        if now is None:
+            now = self.clock()
+        tat = self._tat
+        previous = tat.pop(key, now)
+        tat[key] = (previous if previous > now else now) + self.emission
+
+        # Paling banyak dua key per hit: cukup untuk mengimbangi insert, tetap O(1)
+        for _ in range(2):
+            oldest = next(iter(tat))
+            if tat[oldest] > now and len(tat) <= self.max_keys:
+                break
+            del tat[oldest]
+            self.evictions += 1
+
+    def acquire(self, key: Hashable, now: float = None) -> Tuple[bool, float]:
+        """Hit key if allowed; returns (allowed, retry_after)"""
+        if now is None:
+            now = self.clock()
+        wait = self.retry_after(key, now)
+        if wait > 0:
+            return False, wait
+        self.hit(key, now)
+        return True, 0.0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+def acquire_all(checks: Iterable[Tuple[RateLimiter, Hashable]], now: float = None) -> Tuple[bool, float]:
+    """Hit every (limiter, key) pair only if all of them allow it.
+
+    Returns (allowed, retry_after) where retry_after is the longest wait
+    among the limiters that refused.
+    """
+    checks = list(checks)
+    if now is None:
+        now = time.monotonic()
+    wait = max((limiter.retry_after(key, now) for limiter, key in checks), default=0.0)
+    if wait > 0:
+        return False, wait
+    for limiter, key in checks:
+        limiter.hit(key, now)
+    return True, 0.0
+
+def limiters_from_config(rate_limits: Dict[str, list], max_keys: int = DEFAULT_MAX_KEYS) -> Dict[str, RateLimiter]:
+    """Build limiters from config.json's rate_limits: {scope: [limit, period_seconds]}"""
+    return {
+        scope: RateLimiter(int(limit), float(period), max_keys=max_keys)
+        for scope, (limit, period) in rate_limits.items()
+    }